@@ -14,8 +14,11 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -50,6 +53,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'summarizer.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -83,12 +87,63 @@ WSGI_APPLICATION = 'smartsum.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE=sqlite (default) is tuned for concurrent writers: WAL journal
+# (readers don't block the writer), synchronous=NORMAL (no fsync per commit
+# in WAL mode), memory-mapped reads and a busy timeout, all set on every new
+# connection. Transactions start with BEGIN IMMEDIATE so a writer waits for
+# the lock up front instead of failing with "database is locked" when it
+# upgrades from reading to writing.
+#
+# DB_ENGINE=postgres (needs psycopg 3) keeps connections open for
+# DB_CONN_MAX_AGE seconds and checks them before reuse. With DB_POOL=true
+# each process uses a psycopg_pool connection pool instead.
+DB_ENGINE = os.getenv("DB_ENGINE", "sqlite")
+
+if DB_ENGINE == "postgres":
+    DB_POOL = os.getenv("DB_POOL", "false").lower() == "true"
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv("DB_NAME", "smartsum"),
+            'USER': os.getenv("DB_USER", ""),
+            'PASSWORD': os.getenv("DB_PASSWORD", ""),
+            'HOST': os.getenv("DB_HOST", ""),
+            'PORT': os.getenv("DB_PORT", ""),
+            # Pooled connections are returned to the pool after each request
+            'CONN_MAX_AGE': 0 if DB_POOL else int(os.getenv("DB_CONN_MAX_AGE", 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'connect_timeout': int(os.getenv("DB_CONNECT_TIMEOUT", 5)),
+            },
+        }
     }
-}
+    if DB_POOL:
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.getenv("DB_POOL_MIN_SIZE", 2)),
+            'max_size': int(os.getenv("DB_POOL_MAX_SIZE", 10)),
+            'timeout': float(os.getenv("DB_POOL_TIMEOUT", 10)),
+        }
+elif DB_ENGINE == "sqlite":
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+        'synchronous': os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+        'mmap_size': int(os.getenv("SQLITE_MMAP_BYTES", 256 * 1024 * 1024)),
+        'cache_size': -int(os.getenv("SQLITE_CACHE_KB", 20000)),  # negative: KiB
+    }
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv("SQLITE_PATH", BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # Seconds a connection waits on a locked database (busy timeout)
+                'timeout': float(os.getenv("SQLITE_BUSY_TIMEOUT_SECONDS", 20)),
+                'transaction_mode': os.getenv("SQLITE_TRANSACTION_MODE", "IMMEDIATE") or None,
+                'init_command': ';'.join(f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items()),
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"Unknown DB_ENGINE: {DB_ENGINE} (use 'sqlite' or 'postgres')")
 
 
 # Password validation
@@ -131,14 +186,178 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 REST_FRAMEWORK = {
+    # Clients send JWTs, so that scheme is tried first
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'summarizer.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.TokenAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-
     ],
 }
-import os
+SIMPLE_JWT = {
+    'TOKEN_OBTAIN_SERIALIZER': 'summarizer.authentication.ClaimsTokenObtainPairSerializer',
+}
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 CORS_ALLOW_ALL_ORIGINS = True
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-
+# Alternative Gemini API base URL, e.g. the local mock from `manage.py mock_gemini`
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT", "")
+
+# Summary cache: 'local' (in-process LRU), 'django' (CACHES alias) or 'database'
+SUMMARY_CACHE_BACKEND = os.getenv("SUMMARY_CACHE_BACKEND", "local")
+SUMMARY_CACHE_ALIAS = os.getenv("SUMMARY_CACHE_ALIAS", "default")
+SUMMARY_CACHE_TTL = int(os.getenv("SUMMARY_CACHE_TTL", 24 * 3600))
+SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", 2048))
+# How often each process rereads the 'django' backend's generation (see clear())
+SUMMARY_CACHE_GENERATION_CHECK_SECONDS = float(os.getenv("SUMMARY_CACHE_GENERATION_CHECK_SECONDS", 5))
+
+# Async summarization jobs: 'inprocess' runs them on a thread pool inside the
+# web process, 'external' leaves them for `manage.py run_summary_worker`
+SUMMARY_JOB_MODE = os.getenv("SUMMARY_JOB_MODE", "inprocess")
+SUMMARY_JOB_WORKERS = int(os.getenv("SUMMARY_JOB_WORKERS", 4))
+# Jobs running for longer are taken to be orphaned by a worker that died and
+# are queued again; keep it above the longest job (map-reduce of a long text)
+SUMMARY_JOB_STALE_SECONDS = int(os.getenv("SUMMARY_JOB_STALE_SECONDS", 900))
+
+# Long documents: text above SUMMARY_SINGLE_PASS_CHARS (or above the input
+# budget of its summary type, see summarizer/prompts.py) is split into chunks
+# of SUMMARY_CHUNK_CHARS, summarized on SUMMARY_CHUNK_WORKERS threads and reduced
+SUMMARY_MAX_CONTENT_CHARS = int(os.getenv("SUMMARY_MAX_CONTENT_CHARS", 500000))
+SUMMARY_SINGLE_PASS_CHARS = int(os.getenv("SUMMARY_SINGLE_PASS_CHARS", 15000))
+SUMMARY_CHUNK_CHARS = int(os.getenv("SUMMARY_CHUNK_CHARS", 12000))
+SUMMARY_CHUNK_WORKERS = int(os.getenv("SUMMARY_CHUNK_WORKERS", 8))
+
+# Outbound page fetching: one connection pool per process, up to
+# FETCH_POOL_PER_HOST keep-alive connections for each of FETCH_POOL_HOSTS hosts
+FETCH_POOL_HOSTS = int(os.getenv("FETCH_POOL_HOSTS", 50))
+FETCH_POOL_PER_HOST = int(os.getenv("FETCH_POOL_PER_HOST", 10))
+FETCH_POOL_BLOCK = os.getenv("FETCH_POOL_BLOCK", "false").lower() == "true"
+FETCH_KEEPALIVE_SECONDS = float(os.getenv("FETCH_KEEPALIVE_SECONDS", 30))
+
+# Batch summarization: items per request and items processed concurrently
+SUMMARY_BATCH_MAX_ITEMS = int(os.getenv("SUMMARY_BATCH_MAX_ITEMS", 50))
+SUMMARY_BATCH_CONCURRENCY = int(os.getenv("SUMMARY_BATCH_CONCURRENCY", 8))
+
+# Main-content extraction engine for fetched pages: 'density' (single-pass,
+# lxml when installed) or 'soup' (the original BeautifulSoup selectors)
+CONTENT_EXTRACTOR = os.getenv("CONTENT_EXTRACTOR", "density")
+
+# Extracted page text cached per canonical URL: served without a request for
+# PAGE_CACHE_TTL seconds, then revalidated with ETag/Last-Modified
+PAGE_CACHE_TTL = int(os.getenv("PAGE_CACHE_TTL", 600))
+PAGE_CACHE_MAX_CHARS = int(os.getenv("PAGE_CACHE_MAX_CHARS", 50_000_000))
+
+# Page downloads are streamed: bodies over FETCH_MAX_BYTES (after
+# decompression) are cut off, and a larger Content-Length is rejected up front
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", 5 * 1024 * 1024))
+FETCH_CHUNK_BYTES = int(os.getenv("FETCH_CHUNK_BYTES", 64 * 1024))
+
+# DNS cache shared by URL validation and page connections (seconds)
+DNS_CACHE_TTL = int(os.getenv("DNS_CACHE_TTL", 300))
+DNS_NEGATIVE_TTL = int(os.getenv("DNS_NEGATIVE_TTL", 30))
+DNS_CACHE_MAX_ENTRIES = int(os.getenv("DNS_CACHE_MAX_ENTRIES", 1024))
+
+# Admission control for Gemini calls: token buckets of input characters per
+# user and for the whole deployment ('database' is shared by all workers,
+# 'local' is per process). A rate of 0 disables that bucket. On SQLite every
+# 'database' charge would take the single write lock, so buckets are only
+# kept in the database on PostgreSQL unless asked for.
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "database" if DB_ENGINE == "postgres" else "local")
+RATE_LIMIT_USER_CHARS_PER_MINUTE = int(os.getenv("RATE_LIMIT_USER_CHARS_PER_MINUTE", 200000))
+RATE_LIMIT_USER_BURST_CHARS = int(os.getenv("RATE_LIMIT_USER_BURST_CHARS", 500000))
+RATE_LIMIT_GLOBAL_CHARS_PER_MINUTE = int(os.getenv("RATE_LIMIT_GLOBAL_CHARS_PER_MINUTE", 2000000))
+RATE_LIMIT_GLOBAL_BURST_CHARS = int(os.getenv("RATE_LIMIT_GLOBAL_BURST_CHARS", 2000000))
+
+# Gemini call protection: per-request timeout, circuit breaker (opens after
+# GEMINI_BREAKER_FAILURES consecutive failures for GEMINI_BREAKER_RESET_SECONDS)
+# and an AIMD concurrency limit that shrinks when calls exceed the latency target
+GEMINI_REQUEST_TIMEOUT_SECONDS = float(os.getenv("GEMINI_REQUEST_TIMEOUT_SECONDS", 60))
+GEMINI_BREAKER_FAILURES = int(os.getenv("GEMINI_BREAKER_FAILURES", 5))
+GEMINI_BREAKER_RESET_SECONDS = float(os.getenv("GEMINI_BREAKER_RESET_SECONDS", 30))
+GEMINI_CONCURRENCY_INITIAL = int(os.getenv("GEMINI_CONCURRENCY_INITIAL", 8))
+GEMINI_CONCURRENCY_MAX = int(os.getenv("GEMINI_CONCURRENCY_MAX", 64))
+GEMINI_LATENCY_TARGET_SECONDS = float(os.getenv("GEMINI_LATENCY_TARGET_SECONDS", 20))
+GEMINI_QUEUE_TIMEOUT_SECONDS = float(os.getenv("GEMINI_QUEUE_TIMEOUT_SECONDS", 2))
+
+# Summarizer backend routing: 'auto' sends SUMMARIZER_LOCAL_TYPES summaries of
+# texts up to SUMMARIZER_LOCAL_MAX_CHARS to the local extractive backend and
+# the rest to Gemini; 'gemini' or 'extractive' force one backend. With
+# SUMMARIZER_LOCAL_FALLBACK, requests are answered locally when Gemini is down.
+SUMMARIZER_BACKEND = os.getenv("SUMMARIZER_BACKEND", "auto")
+SUMMARIZER_LOCAL_TYPES = [t.strip() for t in os.getenv("SUMMARIZER_LOCAL_TYPES", "short").split(",") if t.strip()]
+SUMMARIZER_LOCAL_MAX_CHARS = int(os.getenv("SUMMARIZER_LOCAL_MAX_CHARS", 4000))
+SUMMARIZER_LOCAL_FALLBACK = os.getenv("SUMMARIZER_LOCAL_FALLBACK", "true").lower() == "true"
+
+# Prometheus metrics at /metrics (per process). Set METRICS_TOKEN to require
+# "Authorization: Bearer <token>"; without one, /metrics is only served with
+# DEBUG on. METRICS_SERVER_TIMING adds a Server-Timing header with the stages
+# timed for each request.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+METRICS_SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "false").lower() == "true"
+
+# Completed summaries are saved in the background: 'behind' buffers them and
+# bulk-inserts every SUMMARY_WRITE_BATCH rows or SUMMARY_WRITE_INTERVAL_SECONDS,
+# 'sync' saves during the request. Rows that can't be written are kept in the
+# SUMMARY_SPOOL_PATH file until the database accepts them.
+SUMMARY_WRITE_MODE = os.getenv("SUMMARY_WRITE_MODE", "behind")
+SUMMARY_WRITE_BATCH = int(os.getenv("SUMMARY_WRITE_BATCH", 100))
+SUMMARY_WRITE_INTERVAL_SECONDS = float(os.getenv("SUMMARY_WRITE_INTERVAL_SECONDS", 1.0))
+SUMMARY_WRITE_MAX_PENDING = int(os.getenv("SUMMARY_WRITE_MAX_PENDING", 10000))
+SUMMARY_SPOOL_PATH = os.getenv("SUMMARY_SPOOL_PATH", str(BASE_DIR / "summary_spool.jsonl"))
+
+# Summary search ranks the SEARCH_MAX_CANDIDATES newest matches of a query
+# (0 ranks all of them), which bounds the cost of very common words
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", 1000))
+
+# Stored summary texts are compressed on SQLite: TEXT_COMPRESSION is 'auto'
+# (zstd when the zstandard package is installed, else zlib), 'zstd', 'zlib' or
+# 'none'. New rows use the TEXT_COMPRESSION_DICTIONARY file, if set, from
+# TEXT_COMPRESSION_DICTIONARY_DIR, which must keep every dictionary in use.
+TEXT_COMPRESSION = os.getenv("TEXT_COMPRESSION", "auto")
+TEXT_COMPRESSION_LEVEL = int(os.getenv("TEXT_COMPRESSION_LEVEL", 0))  # 0 = codec default
+TEXT_COMPRESSION_DICTIONARY_DIR = os.getenv("TEXT_COMPRESSION_DICTIONARY_DIR", str(BASE_DIR / "compression_dictionaries"))
+TEXT_COMPRESSION_DICTIONARY = os.getenv("TEXT_COMPRESSION_DICTIONARY", "")
+
+# Near-duplicate reuse: a text whose estimated similarity (MinHash over
+# 3-word shingles) to one summarized before with the same summary_type is at
+# least NEAR_DUPLICATE_THRESHOLD gets that summary (0 disables). Each process
+# indexes its NEAR_DUPLICATE_MAX_ENTRIES most recent texts.
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", 0.9))
+NEAR_DUPLICATE_MAX_ENTRIES = int(os.getenv("NEAR_DUPLICATE_MAX_ENTRIES", 100000))
+
+# Prompts (see summarizer/prompts.py): PROMPT_PRUNE drops boilerplate lines
+# and repeated sentences before content is sent. max_output_tokens is the
+# summary type's word budget plus GEMINI_OUTPUT_TOKEN_RESERVE, which leaves
+# room for the model's thinking tokens.
+PROMPT_PRUNE = os.getenv("PROMPT_PRUNE", "true").lower() == "true"
+GEMINI_OUTPUT_TOKEN_RESERVE = int(os.getenv("GEMINI_OUTPUT_TOKEN_RESERVE", 2048))
+
+# Identical concurrent requests (same summary input, same canonical URL)
+# share one generation or download. COALESCE_BACKEND is 'local' (per
+# process), 'django' (across workers, through the COALESCE_CACHE_ALIAS entry
+# in CACHES, which must be shared) or 'off'. Waiting requests give up after
+# the *_COALESCE_TIMEOUT_SECONDS; the request doing the work never does.
+COALESCE_BACKEND = os.getenv("COALESCE_BACKEND", "local")
+COALESCE_CACHE_ALIAS = os.getenv("COALESCE_CACHE_ALIAS", "default")
+SUMMARY_COALESCE_TIMEOUT_SECONDS = float(os.getenv("SUMMARY_COALESCE_TIMEOUT_SECONDS", 120))
+FETCH_COALESCE_TIMEOUT_SECONDS = float(os.getenv("FETCH_COALESCE_TIMEOUT_SECONDS", 30))
+
+# Authentication (see summarizer/authentication.py): JWT_USER_LOOKUP is
+# 'cache' (users are loaded from the database and kept AUTH_USER_CACHE_TTL
+# seconds per process), 'claims' (the user comes from the token, no query,
+# and deactivated users keep access until their token expires) or
+# 'database' (a query per request).
+JWT_USER_LOOKUP = os.getenv("JWT_USER_LOOKUP", "cache")
+AUTH_USER_CACHE_TTL = int(os.getenv("AUTH_USER_CACHE_TTL", 60))
+AUTH_USER_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_USER_CACHE_MAX_ENTRIES", 10000))
+
+# PBKDF2 iterations for new password hashes (0 = Django's default). Each
+# registration and login costs one hash on the request thread; stronger
+# existing hashes are not rehashed down to it.
+PASSWORD_HASH_ITERATIONS = int(os.getenv("PASSWORD_HASH_ITERATIONS", 0))
+PASSWORD_HASHERS = [
+    'summarizer.hashers.ConfigurablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
@@ -1,13 +1,18 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
 )
+from summarizer.views import MetricsView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('summarizer.urls')),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),  # login
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
-]
\ No newline at end of file
+]
+
+if settings.METRICS_ENABLED:
+    urlpatterns.append(path('metrics', MetricsView.as_view(), name='metrics'))
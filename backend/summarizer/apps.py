@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class SummarizerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'summarizer'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_save
+
+        from .authentication import forget_user
+        from .compression import register_sql_functions
+        connection_created.connect(register_sql_functions)
+        post_save.connect(forget_user, sender=get_user_model())
+        post_delete.connect(forget_user, sender=get_user_model())
@@ -0,0 +1,316 @@
+# async_views.py
+"""Native async versions of SummarizeView and FetchUrlContentView.
+
+These run on the event loop when served through smartsum.asgi, so a single
+process can hold many in-flight Gemini calls and page downloads instead of
+one per worker thread. Validation, extraction and persistence are shared
+with the DRF views through their mixins.
+"""
+import json
+import logging
+import socket
+import ssl
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .extraction import get_extractor
+from .fetching import BodyDecoder, get_async_client
+from .generation import asummarize, generation_error
+from .metrics import Stopwatch, timed
+from .page_cache import canonicalize_url, page_cache, page_flight
+from .persistence import summary_writer
+from .ratelimit import retry_after_headers
+from .resolver import dns_cache
+from .singleflight import FlightTimeout
+from .views import ContentFetchError, SummaryInputMixin, UrlContentMixin, fetch_timeout_error, wants_page_cache
+
+logger = logging.getLogger(__name__)
+
+
+def authenticated_user(drf_request):
+    """Run DRF authentication, which may query the database, and return the user"""
+    return drf_request.user
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncAPIView(View):
+    """Minimal async counterpart of APIView: DRF authentication + JSON body"""
+
+    http_method_names = ['post', 'options']
+
+    async def dispatch(self, request, *args, **kwargs):
+        drf_request = Request(
+            request,
+            authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+        )
+        try:
+            user = await sync_to_async(authenticated_user, thread_sensitive=False)(drf_request)
+        except Exception as e:
+            return JsonResponse(
+                {"detail": str(e)}, status=status.HTTP_401_UNAUTHORIZED
+            )
+        if not (user and user.is_authenticated):
+            return JsonResponse(
+                {"detail": "Authentication credentials were not provided."},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+        request.user = user
+
+        try:
+            self.data = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse(
+                {"error": "Malformed JSON body", "code": "invalid_input"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not isinstance(self.data, dict):
+            self.data = {}
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class AsyncSummarizeView(SummaryInputMixin, AsyncAPIView):
+
+    async def post(self, request):
+        try:
+            text = str(self.data.get("text", "")).strip()
+            summary_type = str(self.data.get("summary_type", "medium")).strip().lower()
+
+            try:
+                self.validate_summary_type(summary_type)
+                text = self.validate_content(text)
+            except ValueError as e:
+                return JsonResponse(
+                    {"error": str(e), "code": "invalid_input"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            try:
+                summary, cached, backend = await asummarize(text, summary_type, user=request.user)
+            except Exception as e:
+                payload, error_status = generation_error(e)
+                return JsonResponse(payload, status=error_status, headers=retry_after_headers(payload))
+
+            if summary_writer.write_behind:
+                # Only appends to the write-behind buffer; no database access
+                self.save_summary(request.user, text, summary, summary_type)
+            else:
+                await sync_to_async(self.save_summary)(request.user, text, summary, summary_type)
+
+            return JsonResponse({
+                "summary": summary,
+                "characters": len(summary),
+                "summary_type": summary_type,
+                "cached": cached,
+                "backend": backend,
+                "success": True
+            })
+
+        except Exception as e:
+            logger.error(f"Unexpected error: {str(e)}", exc_info=True)
+            return JsonResponse(
+                {
+                    "error": "Internal server error",
+                    "code": "server_error",
+                    "solutions": ["Try again later"]
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class AsyncFetchUrlContentView(UrlContentMixin, AsyncAPIView):
+
+    async def avalidate_url(self, url):
+        domain = self.validate_url_format(url)
+        try:
+            # Resolved on the loop's resolver instead of blocking the thread
+            with timed('dns'):
+                await dns_cache.aresolve(domain)
+            return True
+        except socket.gaierror as e:
+            raise ValueError(f"URL validation failed: {str(e)}")
+
+    transport_errors = (httpx.HTTPError,)
+
+    async def extract_body(self, response, fetch_time):
+        """extract_page_stream() over the body of response.
+
+        Chunks are read on the event loop and only the parser's feed() runs
+        in a worker thread. As in the sync view, the download stops once the
+        extractor holds SUMMARY_MAX_CONTENT_CHARS of likely main text.
+        """
+        extraction = get_extractor().start()
+        # Parsing is CPU-bound; keep it off the event loop
+        feed = sync_to_async(extraction.feed, thread_sensitive=False)
+        decoder = BodyDecoder(response.headers.get('Content-Type', ''), settings.FETCH_MAX_BYTES)
+        body = response.aiter_bytes(settings.FETCH_CHUNK_BYTES)
+        parse_time = Stopwatch('parse')
+        try:
+            while not decoder.full and extraction.candidate_chars < settings.SUMMARY_MAX_CONTENT_CHARS:
+                with fetch_time:
+                    chunk = await anext(body, None)
+                if chunk is None:
+                    break
+                if chunk:
+                    with parse_time:
+                        await feed(decoder.decode(chunk))
+            tail = decoder.finish()
+            if tail:
+                with parse_time:
+                    await feed(tail)
+            content = await sync_to_async(extraction.close, thread_sensitive=False)()
+        except self.transport_errors:
+            # Raised while reading the body; handled by adownload_content
+            raise
+        except Exception as e:
+            raise self.parse_error(e)
+        finally:
+            parse_time.done()
+
+        return self.checked_content(content)
+
+    def fetch_error(self, e):
+        """ContentFetchError for a failed download"""
+        if isinstance(e, httpx.TimeoutException):
+            return fetch_timeout_error()
+        if isinstance(e, httpx.TooManyRedirects):
+            return ContentFetchError(
+                {
+                    "error": "Too many redirects",
+                    "code": "redirect_loop",
+                    "solutions": ["Try a different URL"]
+                },
+                status.HTTP_400_BAD_REQUEST
+            )
+        if isinstance(e, httpx.HTTPStatusError):
+            status_code = e.response.status_code
+            if status_code == 403:
+                return ContentFetchError(
+                    {
+                        "error": "Access forbidden (403)",
+                        "code": "forbidden",
+                        "solutions": [
+                            "Try a different URL",
+                            "The website may block automated requests"
+                        ]
+                    },
+                    status.HTTP_400_BAD_REQUEST
+                )
+            return ContentFetchError(
+                {
+                    "error": f"HTTP error {status_code}",
+                    "code": f"http_{status_code}",
+                    "solutions": ["Try a different URL"]
+                },
+                status.HTTP_400_BAD_REQUEST
+            )
+        if isinstance(e.__context__, ssl.SSLError):
+            return ContentFetchError(
+                {
+                    "error": "SSL verification failed",
+                    "code": "ssl_error",
+                    "solutions": ["Try a different URL"]
+                },
+                status.HTTP_400_BAD_REQUEST
+            )
+        logger.error(f"URL fetch failed: {str(e)}")
+        return ContentFetchError(
+            {
+                "error": "Could not fetch URL content",
+                "code": "fetch_failed",
+                "solutions": ["Try a different URL", "Check your connection"]
+            },
+            status.HTTP_400_BAD_REQUEST
+        )
+
+    async def adownload_content(self, url, key, entry):
+        """Page text after a page cache miss; all failures raise ContentFetchError"""
+        try:
+            await self.avalidate_url(url)
+        except ValueError as e:
+            raise ContentFetchError({"error": str(e), "code": "invalid_url"}, status.HTTP_400_BAD_REQUEST)
+
+        # Connecting, headers and waiting for body chunks; parsing is timed
+        # separately, as in the sync view
+        fetch_time = Stopwatch('fetch')
+        try:
+            client = get_async_client()
+            with fetch_time:
+                response = await client.send(
+                    client.build_request('GET', url, headers=self.conditional_headers(entry)), stream=True
+                )
+            try:
+                # httpx treats 304 as an error status, so check it first
+                if response.status_code == 304 and entry is not None:
+                    page_cache.refresh(key)
+                    return entry.content
+                response.raise_for_status()
+                self.check_response_headers(response.headers)
+                content = await self.extract_body(response, fetch_time)
+            finally:
+                await response.aclose()
+        except httpx.HTTPError as e:
+            raise self.fetch_error(e)
+        finally:
+            fetch_time.done()
+
+        self.store_page(key, response.headers, content)
+        return content
+
+    async def post(self, request):
+        try:
+            url = str(self.data.get("url", "")).strip()
+
+            if not url:
+                return JsonResponse(
+                    {"error": "URL is required", "code": "missing_url"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            try:
+                self.validate_url_format(url)
+            except ValueError as e:
+                return JsonResponse(
+                    {"error": str(e), "code": "invalid_url"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            key, entry, fresh = self.cached_page(url, wants_page_cache(request, self.data))
+            if fresh:
+                content = entry.content
+            else:
+                try:
+                    # Identical concurrent fetches share one download
+                    content = await page_flight.ado(
+                        canonicalize_url(url), lambda: self.adownload_content(url, key, entry)
+                    )
+                except FlightTimeout:
+                    e = fetch_timeout_error()
+                    return JsonResponse(e.payload, status=e.status_code)
+                except ContentFetchError as e:
+                    return JsonResponse(e.payload, status=e.status_code)
+
+            return JsonResponse({
+                "content": content,
+                "source_url": url,
+                "success": True
+            })
+
+        except Exception as e:
+            logger.error(f"Unexpected error in URL fetch: {str(e)}", exc_info=True)
+            return JsonResponse(
+                {
+                    "error": "Internal server error",
+                    "code": "server_error",
+                    "solutions": ["Try again later", "Contact support"]
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
@@ -0,0 +1,157 @@
+# authentication.py
+"""Request authentication without a database round-trip.
+
+simplejwt's JWTAuthentication loads the token's user from the database on
+every request. With JWT_USER_LOOKUP='cache' (the default) users are still
+loaded from the database but kept for AUTH_USER_CACHE_TTL seconds per
+process, and is_active is checked on every request as simplejwt does.
+Saving or deleting a user (deactivating included) drops the entry in the
+process that saved it; other processes, and QuerySet.update(), which sends
+no signal, see the change once the entry expires.
+
+'claims' skips the database altogether, as an explicit opt-in: access
+tokens issued here carry the username as a claim too, and the user is
+built from the claims alone: an unsaved User holding the id and username,
+which is all the views use (ownership filters, rate limit buckets, new
+Summary rows). Don't save() it. A user deactivated or deleted keeps access
+until their access token expires (SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'], five
+minutes by default); refreshing checks the database again. Tokens issued
+before the username claim existed fall back to the cache.
+
+'database' is simplejwt's behaviour.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+USERNAME_CLAIM = 'username'
+
+LOOKUPS = ('claims', 'cache', 'database')
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Login serializer whose tokens carry the username (see module docstring)"""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token[USERNAME_CLAIM] = user.get_username()
+        return token
+
+
+class UserCache:
+    """Per-process LRU of users by id, with a TTL"""
+
+    def __init__(self, ttl=60, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.from_claims = 0
+
+    def count_claims(self):
+        with self._lock:
+            self.from_claims += 1
+
+    def get(self, user_id, load):
+        """The user with user_id, from the cache or else from load(user_id)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        user = load(user_id)
+        if self.ttl > 0:
+            with self._lock:
+                self._entries[user_id] = (user, now + self.ttl)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return user
+
+    def discard(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'from_claims': self.from_claims,
+            }
+
+
+user_cache = UserCache(
+    ttl=getattr(settings, 'AUTH_USER_CACHE_TTL', 60),
+    max_entries=getattr(settings, 'AUTH_USER_CACHE_MAX_ENTRIES', 10000),
+)
+
+
+def forget_user(sender, instance, **kwargs):
+    """post_save / post_delete receiver for the user model: the next request
+    of a user who was changed, deactivated or deleted reloads them"""
+    user_cache.discard(getattr(instance, jwt_settings.USER_ID_FIELD))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication resolving users per JWT_USER_LOOKUP"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lookup = getattr(settings, 'JWT_USER_LOOKUP', 'cache')
+        if self.lookup not in LOOKUPS:
+            raise ValueError(f"Unknown JWT user lookup: {self.lookup}")
+
+    def get_user(self, validated_token):
+        if self.lookup == 'database' or jwt_settings.CHECK_REVOKE_TOKEN:
+            # Revocation compares a claim with the stored password hash
+            return super().get_user(validated_token)
+        User = get_user_model()
+        try:
+            # simplejwt writes the id claim as a string
+            user_id = User._meta.get_field(jwt_settings.USER_ID_FIELD).to_python(
+                validated_token[jwt_settings.USER_ID_CLAIM]
+            )
+        except (KeyError, ValidationError):
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        username = validated_token.get(USERNAME_CLAIM)
+        if self.lookup == 'claims' and username is not None:
+            user_cache.count_claims()
+            return User(**{jwt_settings.USER_ID_FIELD: user_id, User.USERNAME_FIELD: username})
+
+        user = user_cache.get(user_id, self.load_user)
+        if user is None:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+        if jwt_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        return user
+
+    def load_user(self, user_id):
+        """User with user_id, or None (cached either way)"""
+        User = get_user_model()
+        try:
+            return User.objects.get(**{jwt_settings.USER_ID_FIELD: user_id})
+        except User.DoesNotExist:
+            return None
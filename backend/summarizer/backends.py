@@ -0,0 +1,53 @@
+# backends.py
+"""Summarizer backends and the rules that pick one for a request.
+
+A backend has a `name`, a `local` flag (no network, no quota) and
+summarize()/asummarize() methods. The extractive backend lives here; the
+Gemini backend is registered by generation.py.
+
+With SUMMARIZER_BACKEND=auto, summary types listed in SUMMARIZER_LOCAL_TYPES
+are answered locally when the text is at most SUMMARIZER_LOCAL_MAX_CHARS
+long, and everything else goes to Gemini. Setting it to `extractive` keeps
+the whole stack offline, e.g. for load tests.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .extractive import extractive_summary
+
+
+class ExtractiveBackend:
+    """TextRank sentence extraction; milliseconds on CPU, no API calls"""
+    name = 'extractive'
+    local = True
+
+    def summarize(self, text, summary_type):
+        return extractive_summary(text, summary_type)
+
+    async def asummarize(self, text, summary_type):
+        return await sync_to_async(self.summarize, thread_sensitive=False)(text, summary_type)
+
+
+BACKENDS = {
+    'extractive': ExtractiveBackend(),
+}
+
+
+def register_backend(backend):
+    BACKENDS[backend.name] = backend
+
+
+def get_backend(name):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown summarizer backend: {name}")
+    return BACKENDS[name]
+
+
+def select_backend(text, summary_type):
+    mode = getattr(settings, 'SUMMARIZER_BACKEND', 'auto')
+    if mode != 'auto':
+        return get_backend(mode)
+    local_types = getattr(settings, 'SUMMARIZER_LOCAL_TYPES', ['short'])
+    if summary_type in local_types and len(text) <= getattr(settings, 'SUMMARIZER_LOCAL_MAX_CHARS', 4000):
+        return get_backend('extractive')
+    return get_backend('gemini')
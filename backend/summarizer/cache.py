@@ -0,0 +1,242 @@
+# cache.py
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text):
+    """Collapse whitespace so trivially different pastes share a key"""
+    return ' '.join(text.split())
+
+
+def make_cache_key(text, summary_type, version):
+    """Content address for a summary: normalized text + type + prompt/model version"""
+    digest = hashlib.sha256()
+    for part in (version, summary_type, normalize_text(text)):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+class LocalLRUBackend:
+    """In-process LRU with per-entry TTL. Not shared between workers."""
+
+    def __init__(self, max_entries=1024, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, version):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def purge_stale(self, version):
+        # Keys embed the version, so stale entries can never be hit; drop
+        # everything rather than tracking versions per entry.
+        self.clear()
+
+
+class DjangoCacheBackend:
+    """Delegates to a configured Django cache alias (locmem, redis, memcached...).
+
+    Keys include a generation number kept in the cache itself; clear() bumps
+    it, which orphans every summary (they expire through their TTL) without
+    touching the alias's other entries. Each process rereads the generation
+    at most every `generation_check_seconds`, so a clear reaches all workers
+    within that time.
+    """
+
+    key_prefix = 'summary'
+
+    def __init__(self, alias='default', ttl=3600, generation_check_seconds=5.0):
+        self.cache = caches[alias]
+        self.ttl = ttl
+        self.generation_check_seconds = generation_check_seconds
+        self._generation = None
+        self._checked_at = 0.0
+
+    @property
+    def generation_key(self):
+        return f"{self.key_prefix}:generation"
+
+    def generation(self):
+        now = time.monotonic()
+        if self._generation is None or now - self._checked_at >= self.generation_check_seconds:
+            self.cache.add(self.generation_key, 0, None)
+            self._generation = self.cache.get(self.generation_key, 0)
+            self._checked_at = now
+        return self._generation
+
+    def _key(self, key):
+        return f"{self.key_prefix}:{self.generation()}:{key}"
+
+    def get(self, key):
+        return self.cache.get(self._key(key))
+
+    def set(self, key, value, version):
+        self.cache.set(self._key(key), value, self.ttl)
+
+    def clear(self):
+        self.cache.add(self.generation_key, 0, None)
+        try:
+            self._generation = self.cache.incr(self.generation_key)
+        except ValueError:
+            # Evicted between add() and incr()
+            self.cache.set(self.generation_key, 1, None)
+            self._generation = 1
+        self._checked_at = time.monotonic()
+
+    def purge_stale(self, version):
+        # The Django cache API cannot enumerate keys; stale versions simply
+        # expire through their TTL.
+        pass
+
+
+class DatabaseBackend:
+    """Persistent cache stored in the SummaryCacheEntry table next to Summary."""
+
+    def __init__(self, ttl=7 * 24 * 3600):
+        self.ttl = ttl
+
+    @property
+    def model(self):
+        from .models import SummaryCacheEntry
+        return SummaryCacheEntry
+
+    def get(self, key):
+        cutoff = timezone.now() - timedelta(seconds=self.ttl)
+        entry = (
+            self.model.objects
+            .filter(key=key, created_at__gte=cutoff)
+            .only('summary_text')
+            .first()
+        )
+        return entry.summary_text if entry else None
+
+    def set(self, key, value, version):
+        self.model.objects.update_or_create(
+            key=key,
+            defaults={'summary_text': value, 'version': version, 'created_at': timezone.now()},
+        )
+
+    def clear(self):
+        self.model.objects.all().delete()
+
+    def purge_stale(self, version):
+        cutoff = timezone.now() - timedelta(seconds=self.ttl)
+        self.model.objects.exclude(version=version).delete()
+        self.model.objects.filter(created_at__lt=cutoff).delete()
+
+
+BACKENDS = {
+    'local': LocalLRUBackend,
+    'django': DjangoCacheBackend,
+    'database': DatabaseBackend,
+}
+
+
+class SummaryCache:
+    """Front for a cache backend that keeps hit/miss counters.
+
+    Backend errors are logged and treated as misses so a broken cache never
+    fails a summarization request.
+    """
+
+    def __init__(self, backend, version):
+        self.backend = backend
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def _count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def key_for(self, text, summary_type):
+        return make_cache_key(text, summary_type, self.version)
+
+    def get(self, text, summary_type):
+        try:
+            value = self.backend.get(self.key_for(text, summary_type))
+        except Exception as e:
+            logger.error(f"Summary cache read failed: {str(e)}")
+            self._count('errors')
+            value = None
+        self._count('hits' if value is not None else 'misses')
+        return value
+
+    def set(self, text, summary_type, summary):
+        try:
+            self.backend.set(self.key_for(text, summary_type), summary, self.version)
+        except Exception as e:
+            logger.error(f"Summary cache write failed: {str(e)}")
+            self._count('errors')
+
+    def invalidate(self, all_versions=False):
+        """Drop entries written for an older prompt/model version (or everything)"""
+        if all_versions:
+            self.backend.clear()
+        else:
+            self.backend.purge_stale(self.version)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': type(self.backend).__name__,
+                'version': self.version,
+                'hits': self.hits,
+                'misses': self.misses,
+                'errors': self.errors,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+def build_backend(name=None):
+    name = name or getattr(settings, 'SUMMARY_CACHE_BACKEND', 'local')
+    ttl = getattr(settings, 'SUMMARY_CACHE_TTL', 3600)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown summary cache backend: {name}")
+    if name == 'local':
+        return LocalLRUBackend(
+            max_entries=getattr(settings, 'SUMMARY_CACHE_MAX_ENTRIES', 1024),
+            ttl=ttl,
+        )
+    if name == 'django':
+        return DjangoCacheBackend(
+            alias=getattr(settings, 'SUMMARY_CACHE_ALIAS', 'default'),
+            ttl=ttl,
+            generation_check_seconds=getattr(settings, 'SUMMARY_CACHE_GENERATION_CHECK_SECONDS', 5.0),
+        )
+    return DatabaseBackend(ttl=ttl)
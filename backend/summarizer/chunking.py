@@ -0,0 +1,83 @@
+# chunking.py
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+def _pieces(text, max_chars):
+    """Yield paragraph, then sentence, then hard-cut pieces no longer than max_chars"""
+    for paragraph in PARAGRAPH_BREAK.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            yield paragraph
+            continue
+        for sentence in SENTENCE_END.split(paragraph):
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(' ', 0, max_chars)
+                cut = cut if cut > 0 else max_chars
+                yield sentence[:cut]
+                sentence = sentence[cut:].lstrip()
+            if sentence:
+                yield sentence
+
+
+def split_into_chunks(text, max_chars):
+    """Pack paragraphs/sentences greedily into chunks of at most max_chars.
+
+    Boundaries fall between paragraphs where possible and between sentences
+    otherwise, so no chunk starts mid-thought unless a single sentence is
+    longer than a whole chunk.
+    """
+    chunks = []
+    current = []
+    size = 0
+    for piece in _pieces(text, max_chars):
+        separator = 2 if current else 0
+        if current and size + separator + len(piece) > max_chars:
+            chunks.append('\n\n'.join(current))
+            current, size, separator = [], 0, 0
+        current.append(piece)
+        size += separator + len(piece)
+    if current:
+        chunks.append('\n\n'.join(current))
+    return chunks
+
+
+def _run_chunk(summarize_chunk, chunk):
+    try:
+        return summarize_chunk(chunk)
+    finally:
+        # Pool threads end with the level; their connections would leak
+        connections.close_all()
+
+
+def map_reduce(text, summarize_chunk, summarize_final, chunk_chars, single_pass_chars, workers):
+    """Summarize arbitrarily long text hierarchically.
+
+    Chunks are summarized concurrently on a bounded pool; the partial
+    summaries are concatenated and, while still longer than one call can
+    take, chunked and summarized again. The last level goes through
+    summarize_final to produce the requested summary type.
+
+    Every chunk is attempted even if some fail, so a retry only has to redo
+    the failed ones (summarize_chunk is expected to cache its results). The
+    first failure is re-raised once the level completes.
+    """
+    while len(text) > single_pass_chars:
+        chunks = split_into_chunks(text, chunk_chars)
+        with ThreadPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            futures = [pool.submit(_run_chunk, summarize_chunk, chunk) for chunk in chunks]
+        errors = [f.exception() for f in futures if f.exception() is not None]
+        if errors:
+            raise errors[0]
+        reduced = '\n\n'.join(f.result() for f in futures)
+        if len(reduced) >= len(text):
+            raise ValueError("Chunk summaries did not reduce the content")
+        text = reduced
+    return summarize_final(text)
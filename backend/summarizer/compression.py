@@ -0,0 +1,291 @@
+# compression.py
+"""Compression of stored summary texts.
+
+Summary.original_text and summary_text are CompressedTextFields
+(summarizer.fields). On SQLite their values are stored as BLOBs made here:
+one header byte naming the codec, a 4-byte dictionary id if a dictionary was
+used, then the compressed UTF-8 text. Texts too short to gain anything are
+stored uncompressed behind the header, and rows written before compression
+was enabled are plain TEXT; both read back unchanged. On PostgreSQL values
+are stored as plain text, which TOAST already compresses.
+
+TEXT_COMPRESSION picks the codec: zstd (needs the `zstandard` package),
+zlib, or `auto` for zstd when it is installed and zlib otherwise. A shared
+dictionary trained on our own summaries (`manage.py
+train_compression_dictionary`) helps most on short texts, which have too
+little repetition of their own, and pays off mainly with zstd. Every *.dict file in
+TEXT_COMPRESSION_DICTIONARY_DIR can be read back; TEXT_COMPRESSION_DICTIONARY
+names the one new rows are written with. Keep old dictionaries for as long
+as rows written with them exist.
+
+SQLite connections get a smartsum_decompress() SQL function, which the
+summary search triggers use to index the plain text.
+"""
+import hashlib
+import threading
+import time
+import zlib
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional codec
+    zstandard = None
+
+# First byte of a stored value: the codec, plus WITH_DICTIONARY when a
+# 4-byte dictionary id follows
+STORED = 0
+ZLIB = 1
+ZSTD = 2
+WITH_DICTIONARY = 0x80
+
+CODECS = {'zlib': ZLIB, 'zstd': ZSTD}
+DEFAULT_LEVELS = {ZLIB: 6, ZSTD: 3}
+
+# Shorter texts cost more in header than compression saves
+MIN_COMPRESS_BYTES = 64
+
+# zlib only looks back 32 KiB, so a larger preset dictionary is wasted
+ZLIB_MAX_DICTIONARY_BYTES = 32 * 1024
+
+
+def dictionary_id(data):
+    return hashlib.sha256(data).digest()[:4]
+
+
+class TextCompressor:
+    def __init__(self, codec='auto', level=None, dictionary_dir=None, dictionary=''):
+        if codec == 'auto':
+            codec = 'zstd' if zstandard is not None else 'zlib'
+        if codec not in CODECS and codec != 'none':
+            raise ValueError(f"Unknown text compression codec: {codec}")
+        if codec == 'zstd' and zstandard is None:
+            raise ValueError("TEXT_COMPRESSION=zstd needs the zstandard package")
+        self.codec = CODECS.get(codec, STORED)
+        self.level = level or DEFAULT_LEVELS.get(self.codec, 0)
+        self.dictionary_dir = Path(dictionary_dir) if dictionary_dir else None
+        self.dictionary_name = dictionary
+        self._dictionaries = None   # id -> bytes, loaded on first use
+        self._active = None         # (id, bytes) or None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.compressed = 0
+        self.decompressed = 0
+        self.text_bytes = 0
+        self.stored_bytes = 0
+        self.compress_seconds = 0.0
+        self.decompress_seconds = 0.0
+
+    def _load_dictionaries(self):
+        dictionaries = {}
+        if self.dictionary_dir is not None and self.dictionary_dir.is_dir():
+            for path in sorted(self.dictionary_dir.glob('*.dict')):
+                data = path.read_bytes()
+                dictionaries[dictionary_id(data)] = data
+        active = None
+        if self.dictionary_name:
+            path = Path(self.dictionary_name)
+            if not path.is_absolute() and self.dictionary_dir is not None:
+                path = self.dictionary_dir / path
+            data = path.read_bytes()
+            active = (dictionary_id(data), data)
+            dictionaries[active[0]] = data
+        with self._lock:
+            self._dictionaries = dictionaries
+            self._active = active
+
+    def active_dictionary(self):
+        if self._dictionaries is None:
+            self._load_dictionaries()
+        return self._active
+
+    def dictionary(self, dict_id):
+        if self._dictionaries is None or dict_id not in self._dictionaries:
+            # Possibly trained since this process started
+            self._load_dictionaries()
+        try:
+            return self._dictionaries[dict_id]
+        except KeyError:
+            raise ValueError(f"Compression dictionary {dict_id.hex()} not found in {self.dictionary_dir}")
+
+    def _zstd(self, dict_id, data, decompress):
+        # zstd contexts aren't thread-safe; keep one per thread and dictionary
+        key = (dict_id, decompress)
+        contexts = self._local.__dict__.setdefault('contexts', {})
+        context = contexts.get(key)
+        if context is None:
+            shared = zstandard.ZstdCompressionDict(data) if data is not None else None
+            if decompress:
+                context = zstandard.ZstdDecompressor(dict_data=shared)
+            else:
+                context = zstandard.ZstdCompressor(level=self.level, dict_data=shared)
+            contexts[key] = context
+        return context
+
+    @property
+    def enabled(self):
+        return self.codec != STORED
+
+    def store(self, text):
+        """What to write to the database for text: compressed bytes, or text as is if disabled"""
+        return self.compress(text) if self.enabled else text
+
+    def compress(self, text):
+        """Stored form of text (bytes)"""
+        started = time.perf_counter()
+        raw = text.encode('utf-8')
+        stored = None
+        if self.codec != STORED and len(raw) >= MIN_COMPRESS_BYTES:
+            active = self.active_dictionary()
+            dict_id, data = active if active else (b'', None)
+            header = bytes([self.codec | (WITH_DICTIONARY if active else 0)]) + dict_id
+            if self.codec == ZSTD:
+                body = self._zstd(dict_id, data, False).compress(raw)
+            elif data is not None:
+                compressor = zlib.compressobj(self.level, zdict=data[-ZLIB_MAX_DICTIONARY_BYTES:])
+                body = compressor.compress(raw) + compressor.flush()
+            else:
+                body = zlib.compress(raw, self.level)
+            if len(header) + len(body) < len(raw) + 1:
+                stored = header + body
+        if stored is None:
+            stored = bytes([STORED]) + raw
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.compressed += 1
+            self.text_bytes += len(raw)
+            self.stored_bytes += len(stored)
+            self.compress_seconds += elapsed
+        return stored
+
+    def decompress(self, value):
+        """Text from a stored value; str values (uncompressed rows) are returned as is"""
+        if value is None or isinstance(value, str):
+            return value
+        started = time.perf_counter()
+        value = bytes(value)
+        codec, body = value[0], value[1:]
+        dict_id, data = b'', None
+        if codec & WITH_DICTIONARY:
+            codec &= ~WITH_DICTIONARY
+            dict_id, body = body[:4], body[4:]
+            data = self.dictionary(dict_id)
+        if codec == STORED:
+            raw = body
+        elif codec == ZLIB:
+            if data is not None:
+                decompressor = zlib.decompressobj(zdict=data[-ZLIB_MAX_DICTIONARY_BYTES:])
+                raw = decompressor.decompress(body) + decompressor.flush()
+            else:
+                raw = zlib.decompress(body)
+        elif codec == ZSTD:
+            if zstandard is None:
+                raise ValueError("Stored text is zstd-compressed but zstandard is not installed")
+            raw = self._zstd(dict_id, data, True).decompress(body)
+        else:
+            raise ValueError(f"Unknown stored text format {value[0]}")
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.decompressed += 1
+            self.decompress_seconds += elapsed
+        return raw.decode('utf-8')
+
+    def stats(self):
+        with self._lock:
+            return {
+                'compressed': self.compressed,
+                'decompressed': self.decompressed,
+                'ratio': self.text_bytes / self.stored_bytes if self.stored_bytes else 0.0,
+                'compress_seconds': self.compress_seconds,
+                'decompress_seconds': self.decompress_seconds,
+            }
+
+
+def train_dictionary(samples, size, codec):
+    """A shared dictionary of at most `size` bytes for texts like `samples`"""
+    if codec == ZSTD:
+        return zstandard.train_dictionary(size, [sample.encode('utf-8') for sample in samples]).as_bytes()
+    return phrase_dictionary(samples, min(size, ZLIB_MAX_DICTIONARY_BYTES))
+
+
+def phrase_dictionary(samples, size, max_words=4):
+    """Preset dictionary of the phrases that recur across most samples.
+
+    Phrases of one to max_words words are scored by how many samples contain
+    them times their length. zlib reaches the end of the dictionary with the
+    shortest distances, so the best phrases go last.
+    """
+    counts = Counter()
+    for sample in samples:
+        words = sample.split()
+        phrases = set()
+        for n in range(1, max_words + 1):
+            for start in range(len(words) - n + 1):
+                phrases.add(' '.join(words[start:start + n]))
+        counts.update(phrases)
+
+    recurring = [(phrase, frequency) for phrase, frequency in counts.items() if frequency > 1]
+    chosen, used = [], 0
+    for phrase, frequency in sorted(recurring, key=lambda item: -item[1] * len(item[0])):
+        piece = (phrase + ' ').encode('utf-8')
+        if used + len(piece) > size:
+            continue
+        chosen.append(piece)
+        used += len(piece)
+    return b''.join(reversed(chosen))
+
+
+text_compressor = TextCompressor(
+    codec=getattr(settings, 'TEXT_COMPRESSION', 'auto'),
+    level=getattr(settings, 'TEXT_COMPRESSION_LEVEL', 0),
+    dictionary_dir=getattr(settings, 'TEXT_COMPRESSION_DICTIONARY_DIR', None),
+    dictionary=getattr(settings, 'TEXT_COMPRESSION_DICTIONARY', ''),
+)
+
+
+def decompress_value(value):
+    """smartsum_decompress() for SQL; any value that isn't a BLOB is returned as is"""
+    if isinstance(value, bytes):
+        return text_compressor.decompress(value)
+    return value
+
+
+def register_sql_functions(sender, connection, **kwargs):
+    """connection_created receiver adding smartsum_decompress() to SQLite connections"""
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function('smartsum_decompress', 1, decompress_value, deterministic=True)
+
+
+def rewrite_texts(connection, table, columns, batch_size=500, recompress=False):
+    """Store the text columns of every row of table in the current format.
+
+    Rows still holding plain text are compressed; with recompress, rows
+    compressed before a codec or dictionary change are rewritten too (and
+    with compression disabled, every row is decompressed). Works in batches
+    of batch_size rows by id, one transaction each, and returns the number
+    of rows rewritten.
+    """
+    select = f"SELECT id, {', '.join(columns)} FROM {table} WHERE id > %s ORDER BY id LIMIT %s"
+    update = f"UPDATE {table} SET {', '.join(f'{column} = %s' for column in columns)} WHERE id = %s"
+    last, rewritten = 0, 0
+    with connection.cursor() as cursor:
+        while True:
+            with transaction.atomic(using=connection.alias):
+                cursor.execute(select, [last, batch_size])
+                rows = cursor.fetchall()
+                if not rows:
+                    return rewritten
+                updates = [
+                    [None if value is None else text_compressor.store(text_compressor.decompress(value))
+                     for value in values] + [pk]
+                    for pk, *values in rows
+                    if recompress or any(isinstance(value, str) for value in values)
+                ]
+                if updates:
+                    cursor.executemany(update, updates)
+            rewritten += len(updates)
+            last = rows[-1][0]
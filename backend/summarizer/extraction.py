@@ -0,0 +1,315 @@
+# extraction.py
+"""Main-content extraction engines for fetched pages.
+
+`soup` is the original BeautifulSoup algorithm. `density` makes a single
+streaming pass over the markup: text is attributed to the innermost block
+element that contains it, so every character is visited once no matter how
+deeply the page nests its divs, and blocks are then kept or dropped by word
+count and link density. It uses lxml's C parser when installed and falls
+back to the standard library's html.parser.
+
+Both engines accept the page as an iterable of text chunks through
+extract_stream(); the density engine parses chunks as they arrive and stops
+reading once it holds `enough_chars` of likely main content. Callers that
+read the page themselves (the async view) use start() to get an extraction
+they can feed() chunk by chunk.
+"""
+import re
+from html.parser import HTMLParser
+
+from bs4 import BeautifulSoup
+from django.conf import settings
+
+from .metrics import Stopwatch, timed
+
+try:
+    from lxml import etree
+except ImportError:  # pragma: no cover - optional accelerator
+    etree = None
+
+REMOVED_TAGS = ['script', 'style', 'nav', 'footer',
+                'iframe', 'img', 'button', 'form',
+                'header', 'aside', 'svg', 'link',
+                'meta', 'noscript']
+
+# Void elements never get an end tag, so they can't open a skipped region
+SKIPPED_TAGS = frozenset(REMOVED_TAGS) - {'img', 'link', 'meta'} | {'head', 'template', 'select', 'textarea'}
+
+BLOCK_TAGS = frozenset([
+    'address', 'article', 'blockquote', 'body', 'dd', 'details', 'div', 'dl', 'dt',
+    'figcaption', 'figure', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'li', 'main',
+    'ol', 'p', 'pre', 'section', 'summary', 'table', 'td', 'th', 'tr', 'ul', 'br',
+])
+
+CONTENT_ROOT_TAGS = frozenset(['article', 'main'])
+
+HEADING_TAGS = frozenset(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
+
+WHITESPACE = re.compile(r'\s+')
+
+
+class BlockCollector:
+    """Parser target that splits a document into scored text blocks.
+
+    Implements the lxml parser-target interface (start/end/data/close) and
+    is driven by html.parser through StdlibParser otherwise.
+    """
+
+    min_words = 10          # same threshold as the soup engine's paragraph filter
+    max_link_density = 0.5
+
+    def __init__(self):
+        self.blocks = []
+        self.candidate_chars = 0
+        self._parts = []
+        self._link_chars = 0
+        self._skip_depth = 0
+        self._link_depth = 0
+        self._root_depth = 0
+        self._heading_depth = 0
+
+    def _flush(self):
+        if not self._parts:
+            return
+        text = WHITESPACE.sub(' ', ''.join(self._parts)).strip()
+        link_chars = self._link_chars
+        self._parts = []
+        self._link_chars = 0
+        if not text:
+            return
+        in_root = self._root_depth > 0
+        self.blocks.append((text, link_chars, in_root, self._heading_depth > 0))
+        if in_root or len(text.split()) > self.min_words:
+            self.candidate_chars += len(text)
+
+    def start(self, tag, attrib=None):
+        tag = tag.lower() if isinstance(tag, str) else ''
+        if tag in SKIPPED_TAGS:
+            self._skip_depth += 1
+            return
+        if self._skip_depth:
+            return
+        if tag in BLOCK_TAGS:
+            self._flush()
+        if tag in CONTENT_ROOT_TAGS:
+            self._root_depth += 1
+        elif tag in HEADING_TAGS:
+            self._heading_depth += 1
+        elif tag == 'a':
+            self._link_depth += 1
+
+    def end(self, tag):
+        tag = tag.lower() if isinstance(tag, str) else ''
+        if tag in SKIPPED_TAGS:
+            if self._skip_depth:
+                self._skip_depth -= 1
+            return
+        if self._skip_depth:
+            return
+        if tag in BLOCK_TAGS:
+            self._flush()
+        if tag in CONTENT_ROOT_TAGS and self._root_depth:
+            self._root_depth -= 1
+        elif tag in HEADING_TAGS and self._heading_depth:
+            self._heading_depth -= 1
+        elif tag == 'a' and self._link_depth:
+            self._link_depth -= 1
+
+    def data(self, data):
+        if self._skip_depth:
+            return
+        self._parts.append(data)
+        if self._link_depth:
+            self._link_chars += len(data.strip())
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        self._flush()
+        return self.result()
+
+    def is_content(self, block):
+        text, links, _, _ = block
+        return len(text.split()) > self.min_words and links <= self.max_link_density * len(text)
+
+    def result(self):
+        blocks = self.blocks
+        # Like the soup engine, an <article>/<main> container wins when it
+        # has real text; inside it only link-heavy blocks (share bars,
+        # related-story lists) are dropped.
+        rooted = [b for b in blocks if b[2]]
+        if sum(len(b[0]) for b in rooted) >= 200:
+            kept = [b[0] for b in rooted if b[1] <= self.max_link_density * len(b[0])]
+        else:
+            # Headings are too short to pass the word threshold on their own,
+            # so keep one when the block right after it is kept.
+            keep = [self.is_content(b) for b in blocks]
+            kept = [
+                b[0] for i, b in enumerate(blocks)
+                if keep[i] or (b[3] and i + 1 < len(blocks) and keep[i + 1])
+            ]
+        if not kept:
+            kept = [b[0] for b in blocks]
+        return ' '.join(kept)
+
+
+class StdlibParser(HTMLParser):
+    def __init__(self, target):
+        super().__init__(convert_charrefs=True)
+        self.target = target
+
+    def handle_starttag(self, tag, attrs):
+        self.target.start(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.target.start(tag)
+        self.target.end(tag)
+
+    def handle_endtag(self, tag):
+        self.target.end(tag)
+
+    def handle_data(self, data):
+        self.target.data(data)
+
+    def close(self):
+        super().close()
+        return self.target.close()
+
+
+class StreamingExtraction:
+    """Incremental density extraction: feed() markup as it arrives, then close()"""
+
+    def __init__(self, parser_backend=None):
+        self.collector = BlockCollector()
+        backend = parser_backend or ('lxml' if etree is not None else 'html.parser')
+        if backend == 'lxml':
+            self.parser = etree.HTMLParser(target=self.collector, remove_comments=True)
+        else:
+            self.parser = StdlibParser(self.collector)
+
+    @property
+    def candidate_chars(self):
+        """Characters of likely main content collected so far"""
+        return self.collector.candidate_chars
+
+    def feed(self, markup):
+        self.parser.feed(markup)
+
+    def close(self):
+        with timed('extract'):
+            return self.parser.close()
+
+
+class BufferedExtraction:
+    """StreamingExtraction interface for engines that need the whole page"""
+
+    candidate_chars = 0
+
+    def __init__(self, extractor):
+        self.extractor = extractor
+        self._parts = []
+
+    def feed(self, markup):
+        self._parts.append(markup)
+
+    def close(self):
+        return self.extractor.extract(''.join(self._parts))
+
+
+class DensityExtractor:
+    name = 'density'
+
+    def __init__(self, parser_backend=None):
+        self.parser_backend = parser_backend
+
+    def start(self):
+        return StreamingExtraction(self.parser_backend)
+
+    def extract(self, html):
+        return self.extract_stream([html])
+
+    def extract_stream(self, chunks, enough_chars=None):
+        extraction = self.start()
+        # Only time spent in the parser counts; waiting on chunks is the fetch
+        parse_time = Stopwatch('parse')
+        try:
+            for chunk in chunks:
+                with parse_time:
+                    extraction.feed(chunk)
+                if enough_chars and extraction.candidate_chars >= enough_chars:
+                    break
+        finally:
+            parse_time.done()
+        return extraction.close()
+
+
+class SoupExtractor:
+    name = 'soup'
+
+    def __init__(self, parser_backend='html.parser'):
+        self.parser_backend = parser_backend
+
+    def extract_main_content(self, soup):
+        """Enhanced content extraction with multiple fallbacks"""
+        # Try common article containers first
+        selectors = [
+            'article',
+            'main',
+            'div.article',
+            'div.content',
+            'div.post',
+            'div.story',
+            'section.main-content'
+        ]
+
+        for selector in selectors:
+            element = soup.select_one(selector)
+            if element:
+                return element.get_text(' ', strip=True)
+
+        # Fallback to body text extraction
+        text_parts = []
+        for tag in ['p', 'div', 'section']:
+            elements = soup.find_all(tag)
+            for el in elements:
+                text = el.get_text(' ', strip=True)
+                if len(text.split()) > 10:  # Only include meaningful paragraphs
+                    text_parts.append(text)
+
+        if text_parts:
+            return ' '.join(text_parts)
+
+        # Final fallback to all text
+        return soup.get_text(' ', strip=True)
+
+    def extract(self, html):
+        with timed('parse'):
+            soup = BeautifulSoup(html, self.parser_backend)
+
+        with timed('extract'):
+            # Clean up the document
+            for element in soup(REMOVED_TAGS):
+                element.decompose()
+
+            return self.extract_main_content(soup)
+
+    def start(self):
+        return BufferedExtraction(self)
+
+    def extract_stream(self, chunks, enough_chars=None):
+        # BeautifulSoup needs the whole document; the byte cap still applies
+        return self.extract(''.join(chunks))
+
+
+ENGINES = {
+    'density': DensityExtractor,
+    'soup': SoupExtractor,
+}
+
+
+def get_extractor(name=None):
+    name = name or getattr(settings, 'CONTENT_EXTRACTOR', 'density')
+    if name not in ENGINES:
+        raise ValueError(f"Unknown content extractor: {name}")
+    return ENGINES[name]()
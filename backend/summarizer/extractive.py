@@ -0,0 +1,141 @@
+# extractive.py
+"""CPU-only extractive summarization.
+
+Sentences are turned into TF-IDF vectors and ranked with TextRank (PageRank
+over the cosine-similarity graph). Above TEXTRANK_MAX_SENTENCES the O(n^2)
+graph is replaced by similarity to the document's TF-IDF centroid, which is
+linear in the number of words. The best sentences are returned in their
+original order.
+"""
+import math
+import re
+
+import numpy as np
+
+SENTENCE_END = re.compile(r'(?<=[.!?。！？])\s+')
+WORD = re.compile(r'\w+', re.UNICODE)
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been
+before being below between both but by can did do does doing down during each
+few for from further had has have having he her here hers herself him himself
+his how i if in into is it its itself just me more most my myself no nor not
+now of off on once only or other our ours ourselves out over own same she
+should so some such than that the their theirs them themselves then there
+these they this those through to too under until up very was we were what
+when where which while who whom why will with would you your yours yourself
+yourselves also may might must shall could
+""".split())
+
+# (share of sentences, minimum, maximum) kept for each summary type
+SENTENCE_BUDGETS = {
+    'short': (0.1, 2, 5),
+    'medium': (0.2, 3, 10),
+    'long': (0.35, 5, 20),
+    'chunk': (0.3, 3, 30),
+}
+
+TEXTRANK_MAX_SENTENCES = 500
+DAMPING = 0.85
+
+
+def split_sentences(text):
+    return [s.strip() for s in SENTENCE_END.split(text) if len(s.strip()) > 1]
+
+
+def sentence_budget(count, summary_type):
+    share, minimum, maximum = SENTENCE_BUDGETS.get(summary_type, SENTENCE_BUDGETS['medium'])
+    return max(minimum, min(maximum, math.ceil(count * share)))
+
+
+def tfidf_entries(sentences):
+    """Sparse, row-normalized TF-IDF vectors as (rows, cols, values, terms)"""
+    vocabulary = {}
+    rows, cols = [], []
+    for index, sentence in enumerate(sentences):
+        for word in WORD.findall(sentence.lower()):
+            if word in STOPWORDS or len(word) < 2:
+                continue
+            rows.append(index)
+            cols.append(vocabulary.setdefault(word, len(vocabulary)))
+
+    terms = max(len(vocabulary), 1)
+    keys, counts = np.unique(np.asarray(rows, dtype=np.int64) * terms + np.asarray(cols, dtype=np.int64),
+                             return_counts=True)
+    rows, cols = keys // terms, keys % terms
+
+    # Sublinear tf, smoothed idf
+    document_frequency = np.bincount(cols, minlength=terms)
+    idf = np.log((1.0 + len(sentences)) / (1.0 + document_frequency)) + 1.0
+    values = (1.0 + np.log(counts)) * idf[cols]
+
+    norms = np.sqrt(np.bincount(rows, weights=values ** 2, minlength=len(sentences)))
+    values /= norms[rows]
+    return rows, cols, values, terms
+
+
+def cosine_similarity(entries, count):
+    """Sentence x sentence cosine similarity from the sparse TF-IDF entries.
+
+    Only sentences that share a term get a product, so the cost follows the
+    number of shared-term pairs rather than sentences x vocabulary.
+    """
+    rows, cols, values, _ = entries
+    # Group the entries by term; every pair within a group shares that term
+    order = np.argsort(cols, kind='stable')
+    rows, cols, values = rows[order], cols[order], values[order]
+    starts = np.flatnonzero(np.diff(cols, prepend=-1))
+    sizes = np.diff(np.r_[starts, len(cols)])
+    group = np.repeat(np.arange(len(starts)), sizes)
+
+    pairs = sizes[group]
+    left = np.repeat(np.arange(len(rows)), pairs)
+    offsets = np.arange(pairs.sum()) - np.repeat(np.cumsum(pairs) - pairs, pairs)
+    right = np.repeat(starts[group], pairs) + offsets
+
+    similarity = np.bincount(
+        rows[left] * count + rows[right], weights=values[left] * values[right], minlength=count * count
+    ).reshape(count, count)
+    np.fill_diagonal(similarity, 0.0)
+    return similarity
+
+
+def textrank_scores(entries, count, iterations=50, tolerance=1e-6):
+    similarity = cosine_similarity(entries, count)
+    row_sums = similarity.sum(axis=1, keepdims=True)
+    # Sentences sharing no words with anything link to every sentence
+    transition = np.where(row_sums > 0, similarity / np.where(row_sums > 0, row_sums, 1.0), 1.0 / count)
+
+    scores = np.full(count, 1.0 / count)
+    for _ in range(iterations):
+        updated = (1.0 - DAMPING) / count + DAMPING * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < tolerance:
+            return updated
+        scores = updated
+    return scores
+
+
+def centroid_scores(entries, count):
+    rows, cols, values, terms = entries
+    centroid = np.bincount(cols, weights=values, minlength=terms) / count
+    return np.bincount(rows, weights=values * centroid[cols], minlength=count)
+
+
+def sentence_scores(sentences):
+    """Centrality of each sentence (higher is more central)"""
+    entries = tfidf_entries(sentences)
+    if len(sentences) <= TEXTRANK_MAX_SENTENCES:
+        return textrank_scores(entries, len(sentences))
+    return centroid_scores(entries, len(sentences))
+
+
+def extractive_summary(text, summary_type):
+    """Pick the most central sentences of text; ValueError if there are too few"""
+    sentences = split_sentences(text)
+    keep = sentence_budget(len(sentences), summary_type)
+    if len(sentences) <= keep:
+        raise ValueError("Text has too few sentences for an extractive summary")
+
+    scores = sentence_scores(sentences)
+    chosen = np.sort(np.argsort(-scores, kind='stable')[:keep])
+    return ' '.join(sentences[i] for i in chosen)
@@ -0,0 +1,410 @@
+# fetching.py
+"""Process-wide HTTP clients for downloading pages.
+
+DRF creates a new view instance per request, so connection pools must live
+at module level for keep-alive and TLS session reuse to work. The sync
+fetcher is rebuilt after a fork so workers never share sockets; the async
+client is created per event loop and negotiates HTTP/2 when the optional
+`h2` package is installed.
+
+Host names are resolved through the shared DNS cache in resolver.py and
+both clients connect to the cached addresses, so URL validation and the
+connection agree on where a request goes.
+
+Bodies are read incrementally (decode_stream) under a hard FETCH_MAX_BYTES
+cap, so a huge or mislabelled response never has to fit in memory.
+"""
+import asyncio
+import codecs
+import importlib.util
+import logging
+import os
+import re
+import socket
+import threading
+import weakref
+
+import httpcore
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError, NewConnectionError
+from urllib3.util.retry import Retry
+
+from .resolver import dns_cache, open_connection
+
+logger = logging.getLogger(__name__)
+
+META_CHARSET = re.compile(rb'<meta[^>]+charset=["\']?([\w.:-]+)', re.IGNORECASE)
+
+
+class PoolStats:
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+        self._lock = threading.Lock()
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def count_connection(self):
+        with self._lock:
+            self.new_connections += 1
+
+
+class ResolvingConnectionMixin:
+    """Open the socket to the DNS cache's addresses instead of resolving again"""
+
+    def _new_conn(self):
+        try:
+            addresses = dns_cache.resolve(self._dns_host)
+            return open_connection(
+                addresses,
+                self.port,
+                self.timeout,
+                source_address=self.source_address,
+                socket_options=self.socket_options,
+            )
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+        except socket.timeout as e:
+            raise ConnectTimeoutError(
+                self,
+                f"Connection to {self.host} timed out. (connect timeout={self.timeout})",
+            ) from e
+        except OSError as e:
+            raise NewConnectionError(
+                self, f"Failed to establish a new connection: {e}"
+            ) from e
+
+
+class ResolvingHTTPConnection(ResolvingConnectionMixin, HTTPConnection):
+    pass
+
+
+class ResolvingHTTPSConnection(ResolvingConnectionMixin, HTTPSConnection):
+    pass
+
+
+class CountingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = ResolvingHTTPConnection
+    stats = None
+
+    def _new_conn(self):
+        if self.stats is not None:
+            self.stats.count_connection()
+        return super()._new_conn()
+
+
+class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = ResolvingHTTPSConnection
+    stats = None
+
+    def _new_conn(self):
+        if self.stats is not None:
+            self.stats.count_connection()
+        return super()._new_conn()
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools report new connections to PoolStats"""
+
+    def __init__(self, stats, **kwargs):
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        stats = self.stats
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': type('HTTPPool', (CountingHTTPConnectionPool,), {'stats': stats}),
+            'https': type('HTTPSPool', (CountingHTTPSConnectionPool,), {'stats': stats}),
+        }
+
+
+class PageFetcher:
+    def __init__(self, pool_hosts=50, pool_per_host=10, pool_block=False):
+        self.pid = os.getpid()
+        self.stats = PoolStats()
+        self.session = requests.Session()
+        # Enhanced session configuration
+        retries = Retry(
+            total=3,
+            backoff_factor=1,
+            status_forcelist=[400, 403, 408, 429, 500, 502, 503, 504]
+        )
+        self.adapter = PooledAdapter(
+            self.stats,
+            max_retries=retries,
+            pool_connections=pool_hosts,
+            pool_maxsize=pool_per_host,
+            pool_block=pool_block,
+        )
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+
+    def get(self, url, **kwargs):
+        self.stats.count_request()
+        return self.session.get(url, **kwargs)
+
+    def pool_usage(self):
+        pools = self.adapter.poolmanager.pools
+        with pools.lock:
+            live = list(pools._container.values())
+        return {
+            'host_pools': len(live),
+            # urllib3 pre-fills each pool queue with None placeholders
+            'idle_connections': sum(
+                sum(1 for conn in list(pool.pool.queue) if conn is not None)
+                for pool in live if pool.pool
+            ),
+        }
+
+    def metrics(self):
+        requests_made = self.stats.requests
+        new_connections = self.stats.new_connections
+        reused = max(requests_made - new_connections, 0)
+        return {
+            'requests': requests_made,
+            'new_connections': new_connections,
+            'reuse_rate': reused / requests_made if requests_made else 0.0,
+            **self.pool_usage(),
+        }
+
+
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher():
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None or _fetcher.pid != os.getpid():
+            _fetcher = PageFetcher(
+                pool_hosts=getattr(settings, 'FETCH_POOL_HOSTS', 50),
+                pool_per_host=getattr(settings, 'FETCH_POOL_PER_HOST', 10),
+                pool_block=getattr(settings, 'FETCH_POOL_BLOCK', False),
+            )
+        return _fetcher
+
+
+class ResolvingNetworkBackend(httpcore.AsyncNetworkBackend):
+    """httpcore backend that connects to addresses from the DNS cache.
+
+    TLS still uses the original host name for SNI and certificate checks;
+    only the TCP connect target changes.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        try:
+            addresses = await dns_cache.aresolve(host)
+        except socket.gaierror as e:
+            raise httpcore.ConnectError(str(e)) from e
+        error = None
+        for _, sockaddr in addresses:
+            try:
+                return await self.backend.connect_tcp(
+                    sockaddr[0], port, timeout=timeout,
+                    local_address=local_address, socket_options=socket_options,
+                )
+            except httpcore.ConnectError as e:
+                error = e
+        raise error or httpcore.ConnectError(f"No addresses for {host}")
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self.backend.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds):
+        await self.backend.sleep(seconds)
+
+
+# httpcore's exception bases; their subclasses have httpx twins of the same name
+HTTPCORE_ERRORS = (
+    httpcore.TimeoutException, httpcore.NetworkError, httpcore.ProtocolError,
+    httpcore.ProxyError, httpcore.UnsupportedProtocol,
+)
+
+
+def httpx_error(exc):
+    """The httpx exception for an httpcore one, so callers catch httpx.HTTPError only"""
+    for cls in type(exc).__mro__:
+        mapped = getattr(httpx, cls.__name__, None)
+        if isinstance(mapped, type) and issubclass(mapped, httpx.TransportError):
+            return mapped(str(exc))
+    return httpx.TransportError(str(exc))
+
+
+class ResolvingResponseStream(httpx.AsyncByteStream):
+    def __init__(self, stream):
+        self.stream = stream
+
+    async def __aiter__(self):
+        try:
+            async for part in self.stream:
+                yield part
+        except HTTPCORE_ERRORS as e:
+            raise httpx_error(e) from e
+
+    async def aclose(self):
+        await self.stream.aclose()
+
+
+class ResolvingTransport(httpx.AsyncBaseTransport):
+    """httpx transport on an httpcore pool that connects through ResolvingNetworkBackend.
+
+    httpx.AsyncHTTPTransport can't be given a network backend, so this
+    builds the pool itself; requests and responses are passed through as
+    AsyncHTTPTransport does, without proxy support.
+    """
+
+    def __init__(self, limits, http2=False, retries=0):
+        self.pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(),
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            http1=True,
+            http2=http2,
+            retries=retries,
+            network_backend=ResolvingNetworkBackend(httpcore.AnyIOBackend()),
+        )
+
+    async def handle_async_request(self, request):
+        core_request = httpcore.Request(
+            method=request.method,
+            url=httpcore.URL(
+                scheme=request.url.raw_scheme,
+                host=request.url.raw_host,
+                port=request.url.port,
+                target=request.url.raw_path,
+            ),
+            headers=request.headers.raw,
+            content=request.stream,
+            extensions=request.extensions,
+        )
+        try:
+            response = await self.pool.handle_async_request(core_request)
+        except HTTPCORE_ERRORS as e:
+            raise httpx_error(e) from e
+        return httpx.Response(
+            status_code=response.status,
+            headers=response.headers,
+            stream=ResolvingResponseStream(response.stream),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self):
+        await self.pool.aclose()
+
+
+# One client per event loop: httpx clients are bound to the loop they were
+# first used on, and ASGI servers normally run a single loop per process.
+_async_clients = weakref.WeakKeyDictionary()
+
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
+
+def get_async_client():
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        # httpx has no per-host cap, so the total is sized as hosts x per-host
+        max_connections = (
+            getattr(settings, 'FETCH_POOL_HOSTS', 50) * getattr(settings, 'FETCH_POOL_PER_HOST', 10)
+        )
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=getattr(settings, 'FETCH_KEEPALIVE_SECONDS', 30.0),
+        )
+        client = httpx.AsyncClient(
+            transport=ResolvingTransport(limits, http2=HTTP2_AVAILABLE, retries=3),
+            timeout=httpx.Timeout(10.0, connect=3.05),
+            follow_redirects=True,
+            max_redirects=10,
+        )
+        _async_clients[loop] = client
+    return client
+
+
+def declared_length(headers):
+    """Content-Length as an int, or None when missing or malformed"""
+    try:
+        return int(headers.get('Content-Length'))
+    except (TypeError, ValueError):
+        return None
+
+
+def sniff_encoding(content_type, head):
+    """Charset from the Content-Type header, else a <meta> tag, else UTF-8"""
+    candidates = []
+    for param in content_type.split(';')[1:]:
+        name, _, value = param.partition('=')
+        if name.strip().lower() == 'charset':
+            candidates.append(value.strip().strip('"\''))
+    match = META_CHARSET.search(head[:4096])
+    if match:
+        candidates.append(match.group(1).decode('ascii', 'ignore'))
+    for candidate in candidates:
+        try:
+            return codecs.lookup(candidate).name
+        except LookupError:
+            continue
+    return 'utf-8'
+
+
+class BodyDecoder:
+    """Incremental decoding of a page body, capped at max_bytes.
+
+    The charset is sniffed from the first chunk and decoding is incremental,
+    so multi-byte characters split across chunks are handled and only one
+    chunk is held in memory at a time.
+    """
+
+    def __init__(self, content_type, max_bytes):
+        self.content_type = content_type
+        self.max_bytes = max_bytes
+        self.received = 0
+        self._decoder = None
+
+    @property
+    def full(self):
+        return self.received >= self.max_bytes
+
+    def decode(self, chunk):
+        chunk = chunk[:self.max_bytes - self.received]
+        self.received += len(chunk)
+        if self._decoder is None:
+            encoding = sniff_encoding(self.content_type, chunk)
+            self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        text = self._decoder.decode(chunk)
+        if self.full:
+            logger.warning(f"Page body truncated at {self.max_bytes} bytes")
+        return text
+
+    def finish(self):
+        """Text still held back by the decoder at the end of the body"""
+        if self._decoder is None:
+            return ''
+        return self._decoder.decode(b'', final=True)
+
+
+def decode_stream(byte_chunks, content_type, max_bytes):
+    """Yield decoded text from byte_chunks, reading at most max_bytes"""
+    decoder = BodyDecoder(content_type, max_bytes)
+    for chunk in byte_chunks:
+        if not chunk:
+            continue
+        yield decoder.decode(chunk)
+        if decoder.full:
+            break
+    tail = decoder.finish()
+    if tail:
+        yield tail
@@ -0,0 +1,69 @@
+# fields.py
+"""Model fields"""
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+
+from .compression import text_compressor
+
+
+class CompressedText(bytes):
+    """A stored value read from the database and not yet decompressed"""
+
+    def __str__(self):
+        return text_compressor.decompress(self)
+
+
+class CompressedTextAttribute(DeferredAttribute):
+    """Decompresses the value on first access and keeps the text"""
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        value = super().__get__(instance, cls)
+        if isinstance(value, CompressedText):
+            value = text_compressor.decompress(value)
+            instance.__dict__[self.field.attname] = value
+        return value
+
+    def __set__(self, instance, value):
+        # Defining __set__ makes this a data descriptor, so __get__ still
+        # runs once the stored value is in the instance __dict__
+        instance.__dict__[self.field.attname] = value
+
+
+class CompressedTextField(models.TextField):
+    """TextField stored compressed on SQLite (see summarizer.compression).
+
+    Rows loaded for other columns, or saved again unchanged, are never
+    decompressed. values() and values_list() return CompressedText; str() it
+    for the text. On compressed values only exact and isnull lookups work;
+    search the texts with summarizer.search instead.
+    """
+    descriptor_class = CompressedTextAttribute
+
+    def from_db_value(self, value, expression, connection):
+        if isinstance(value, bytes):
+            return CompressedText(value)
+        return value
+
+    def pre_save(self, model_instance, add):
+        # The stored value as loaded, if the attribute hasn't been read
+        if self.attname in model_instance.__dict__:
+            return model_instance.__dict__[self.attname]
+        return super().pre_save(model_instance, add)
+
+    def get_prep_value(self, value):
+        if isinstance(value, CompressedText):
+            return value
+        return super().get_prep_value(value)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if not prepared:
+            value = self.get_prep_value(value)
+        if value is None:
+            return None
+        if connection.vendor != 'sqlite':
+            return str(value)
+        if isinstance(value, CompressedText) and text_compressor.enabled:
+            return bytes(value)
+        return text_compressor.store(str(value))
@@ -0,0 +1,463 @@
+# generation.py
+import hashlib
+import logging
+import time
+from collections import namedtuple
+
+import google.generativeai as genai
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from google.api_core import exceptions as api_exceptions, retry, retry_async
+from rest_framework import status
+
+from .backends import get_backend, register_backend, select_backend
+from .cache import SummaryCache, build_backend
+from .chunking import map_reduce
+from .metrics import gemini_tokens, observe, prompt_tokens, timed
+from .nearduplicates import near_duplicates
+from .prompts import CHUNK_SUMMARY_TYPE, TEMPLATE_SOURCE, make_prompt, single_pass_chars
+from .ratelimit import RateLimited, admit
+from .resilience import AdaptiveLimiter, CallGuard, CircuitBreaker, CircuitOpen, Overloaded
+from .singleflight import FlightTimeout, build_flight
+
+logger = logging.getLogger(__name__)
+
+GEMINI_MODEL_NAME = 'gemini-2.5-flash'
+
+# Any edit to the templates or model changes the version, which changes every
+# cache key, so stale summaries are never served after a prompt update.
+PROMPT_VERSION = hashlib.sha256(f"{GEMINI_MODEL_NAME}\n{TEMPLATE_SOURCE}".encode('utf-8')).hexdigest()[:16]
+
+# Seconds a client is asked to wait when Gemini itself reports quota exhaustion
+UPSTREAM_RETRY_AFTER = 30
+
+summary_cache = SummaryCache(build_backend(), PROMPT_VERSION)
+
+# A request refused by its own user's rate limit doesn't fail the identical
+# requests waiting on it; one of them tries in its place
+summary_flight = build_flight(
+    'summary',
+    timeout=getattr(settings, 'SUMMARY_COALESCE_TIMEOUT_SECONDS', 120),
+    personal_errors=(RateLimited,),
+)
+
+# Set for a self-hosted endpoint such as `manage.py mock_gemini`, which is
+# spoken to over the REST transport
+GEMINI_API_ENDPOINT = getattr(settings, 'GEMINI_API_ENDPOINT', '')
+
+# Initialize Gemini AI with enhanced configuration
+try:
+    if GEMINI_API_ENDPOINT:
+        genai.configure(
+            api_key=settings.GEMINI_API_KEY or 'local',
+            transport='rest',
+            client_options={'api_endpoint': GEMINI_API_ENDPOINT},
+        )
+    else:
+        genai.configure(api_key=settings.GEMINI_API_KEY)
+    generation_config = {
+        "temperature": 0.3,
+        "top_p": 0.95,
+        "top_k": 40,
+    }
+    safety_settings = [
+        {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+        {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+        {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+        {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
+    ]
+    gemini_model = genai.GenerativeModel(
+        GEMINI_MODEL_NAME,
+        generation_config=generation_config,
+        safety_settings=safety_settings
+    )
+except Exception as e:
+    logger.error(f"Failed to initialize Gemini: {str(e)}")
+    gemini_model = None
+
+
+def is_retryable(exc):
+    # Quota errors (429) are not retried: another attempt within the same
+    # request only burns more of the exhausted quota. Callers get a 429.
+    return retry.if_transient_error(exc) and not isinstance(exc, api_exceptions.TooManyRequests)
+
+
+def is_gemini_failure(exc):
+    """Errors that say Gemini is unhealthy, as opposed to problems with the input"""
+    if isinstance(exc, api_exceptions.TooManyRequests):
+        return True
+    return not isinstance(exc, (genai.types.StopCandidateException, ValueError, api_exceptions.ClientError))
+
+
+# Every Gemini request goes through the breaker and the concurrency limit;
+# see resilience.py
+gemini_guard = CallGuard(
+    CircuitBreaker(
+        failure_threshold=getattr(settings, 'GEMINI_BREAKER_FAILURES', 5),
+        reset_timeout=getattr(settings, 'GEMINI_BREAKER_RESET_SECONDS', 30),
+    ),
+    AdaptiveLimiter(
+        initial=getattr(settings, 'GEMINI_CONCURRENCY_INITIAL', 8),
+        maximum=getattr(settings, 'GEMINI_CONCURRENCY_MAX', 64),
+        latency_target=getattr(settings, 'GEMINI_LATENCY_TARGET_SECONDS', 20.0),
+        queue_timeout=getattr(settings, 'GEMINI_QUEUE_TIMEOUT_SECONDS', 2.0),
+    ),
+    is_failure=is_gemini_failure,
+)
+
+
+def request_options():
+    return {"timeout": getattr(settings, 'GEMINI_REQUEST_TIMEOUT_SECONDS', 60)}
+
+
+def build_prompt(text, summary_type):
+    """Prompt for text (see prompts.py), counting the tokens pruning saved"""
+    with timed('prompt'):
+        prompt = make_prompt(text, summary_type)
+    prompt_tokens.inc('content', amount=prompt.content_tokens)
+    prompt_tokens.inc('sent', amount=prompt.sent_tokens)
+    return prompt
+
+
+def call_options(prompt):
+    return {
+        "generation_config": {"max_output_tokens": prompt.max_output_tokens},
+        "request_options": request_options(),
+    }
+
+
+def record_usage(response):
+    """Count the tokens Gemini reports for a response"""
+    usage = getattr(response, 'usage_metadata', None)
+    if usage:
+        gemini_tokens.inc('prompt', amount=usage.prompt_token_count)
+        gemini_tokens.inc('output', amount=usage.candidates_token_count)
+
+
+@retry.Retry(
+    initial=1.0,
+    maximum=10.0,
+    multiplier=2.0,
+    deadline=30.0,
+    predicate=is_retryable
+)
+def generate_summary(text, summary_type):
+    if not gemini_model:
+        raise ConnectionError("Gemini AI service not configured")
+
+    prompt = build_prompt(text, summary_type)
+
+    try:
+        with gemini_guard.call(), timed('gemini'):
+            response = gemini_model.generate_content(prompt.text, **call_options(prompt))
+        record_usage(response)
+
+        # Validate response
+        if not response.text or len(response.text.strip()) < 10:
+            raise ValueError("Empty or invalid summary generated")
+
+        return response.text.strip()
+    except Exception as e:
+        logger.error(f"Generation error: {str(e)}")
+        raise
+
+
+def stream_summary(text, summary_type):
+    """Yield summary text as Gemini produces it.
+
+    Long text is first reduced with the (non-streamed, cached) chunk map step
+    so only the final pass is streamed. Nothing is retried here: once tokens
+    have been sent to the client the generation cannot be restarted.
+    """
+    if not gemini_model:
+        raise ConnectionError("Gemini AI service not configured")
+
+    if len(text) > single_pass_chars(summary_type):
+        text = reduce_long_text(text, summary_type, summarize_final=lambda combined: combined)
+
+    prompt = build_prompt(text, summary_type)
+    try:
+        with gemini_guard.call(), timed('gemini'):
+            started = time.perf_counter()
+            response = gemini_model.generate_content(prompt.text, stream=True, **call_options(prompt))
+            for index, chunk in enumerate(response):
+                if index == 0:
+                    observe('gemini_first_token', time.perf_counter() - started)
+                if chunk.text:
+                    yield chunk.text
+        record_usage(response)
+    except Exception as e:
+        logger.error(f"Streaming generation error: {str(e)}")
+        raise
+
+
+def reduce_long_text(text, summary_type, summarize_final):
+    return map_reduce(
+        text,
+        summarize_chunk=lambda chunk: summarize(chunk, CHUNK_SUMMARY_TYPE)[0],
+        summarize_final=summarize_final,
+        chunk_chars=getattr(settings, 'SUMMARY_CHUNK_CHARS', 12000),
+        single_pass_chars=single_pass_chars(summary_type),
+        workers=getattr(settings, 'SUMMARY_CHUNK_WORKERS', 8),
+    )
+
+
+def generate_hierarchical(text, summary_type):
+    """Map-reduce generation for text too long for a single Gemini call"""
+    return reduce_long_text(
+        text,
+        summary_type,
+        summarize_final=lambda combined: generate_summary(combined, summary_type),
+    )
+
+
+@retry_async.AsyncRetry(
+    initial=1.0,
+    maximum=10.0,
+    multiplier=2.0,
+    deadline=30.0,
+    predicate=is_retryable
+)
+async def agenerate_summary(text, summary_type):
+    """Async twin of generate_summary using Gemini's native async client"""
+    if not gemini_model:
+        raise ConnectionError("Gemini AI service not configured")
+
+    try:
+        prompt = build_prompt(text, summary_type)
+        async with gemini_guard.call():
+            with timed('gemini'):
+                response = await gemini_model.generate_content_async(prompt.text, **call_options(prompt))
+        record_usage(response)
+
+        if not response.text or len(response.text.strip()) < 10:
+            raise ValueError("Empty or invalid summary generated")
+
+        return response.text.strip()
+    except Exception as e:
+        logger.error(f"Generation error: {str(e)}")
+        raise
+
+
+class GeminiBackend:
+    name = 'gemini'
+    local = False
+
+    def summarize(self, text, summary_type):
+        if len(text) > single_pass_chars(summary_type):
+            return generate_hierarchical(text, summary_type)
+        return generate_summary(text, summary_type)
+
+    async def asummarize(self, text, summary_type):
+        # The map step of long documents fans out on its own thread pool
+        if len(text) > single_pass_chars(summary_type):
+            return await sync_to_async(generate_hierarchical, thread_sensitive=False)(text, summary_type)
+        if GEMINI_API_ENDPOINT:
+            # The SDK's REST transport has no async client
+            return await sync_to_async(generate_summary, thread_sensitive=False)(text, summary_type)
+        return await agenerate_summary(text, summary_type)
+
+
+register_backend(GeminiBackend())
+
+# `backend` is the name of the backend that produced the summary, 'cache' or
+# 'near_duplicate'
+SummaryResult = namedtuple('SummaryResult', ['summary', 'cached', 'backend'])
+
+# Raised when Gemini can't be reached at all; answered locally if allowed
+UNAVAILABLE_ERRORS = (CircuitOpen, Overloaded, ConnectionError)
+
+
+def local_fallback(text, summary_type):
+    """SummaryResult from the extractive backend, or None if not possible"""
+    if not getattr(settings, 'SUMMARIZER_LOCAL_FALLBACK', True):
+        return None
+    backend = get_backend('extractive')
+    try:
+        return SummaryResult(backend.summarize(text, summary_type), False, backend.name)
+    except ValueError:
+        return None
+
+
+def cached_result(text, summary_type):
+    """SummaryResult for text already summarized, exactly or nearly (see nearduplicates.py), or None"""
+    cached_summary = summary_cache.get(text, summary_type)
+    if cached_summary is not None:
+        return SummaryResult(cached_summary, True, 'cache')
+    similar_summary = near_duplicates.get(text, summary_type)
+    if similar_summary is not None:
+        return SummaryResult(similar_summary, True, 'near_duplicate')
+    return None
+
+
+def remember(text, summary_type, summary):
+    """Make a generated summary available to cached_result"""
+    summary_cache.set(text, summary_type, summary)
+    near_duplicates.add(text, summary_type, summary)
+
+
+def summarize(text, summary_type, user=None):
+    """Return a SummaryResult (summary, cached, backend) for validated text.
+
+    Identical or nearly identical content summarized recently (by anyone) is
+    served from the cache without a Gemini round-trip, and identical requests
+    made at the same time share one generation (see singleflight.py).
+    Otherwise select_backend() picks a backend: local ones answer directly,
+    and text too short for extraction goes to Gemini. Long text is
+    summarized in chunks, each cached on its own so a retry only regenerates
+    the chunks that failed. Before Gemini is called the input is charged to
+    user's rate limit (see ratelimit.py), by the request that makes the call;
+    if Gemini is unreachable the extractive backend answers instead.
+    """
+    cached = cached_result(text, summary_type)
+    if cached is not None:
+        return cached
+    return summary_flight.do(
+        summary_cache.key_for(text, summary_type),
+        lambda: generate_result(text, summary_type, user),
+    )
+
+
+def generate_result(text, summary_type, user=None):
+    """summarize() after a cache miss"""
+    backend = select_backend(text, summary_type)
+    if backend.local:
+        try:
+            return SummaryResult(backend.summarize(text, summary_type), False, backend.name)
+        except ValueError:
+            backend = get_backend('gemini')
+
+    if user is not None:
+        admit(user, len(text))
+
+    try:
+        summary = backend.summarize(text, summary_type)
+    except UNAVAILABLE_ERRORS:
+        fallback = local_fallback(text, summary_type)
+        if fallback is None:
+            raise
+        return fallback
+    remember(text, summary_type, summary)
+    return SummaryResult(summary, False, backend.name)
+
+
+async def asummarize(text, summary_type, user=None):
+    """Async twin of summarize.
+
+    Cache lookups may hit the database and local backends are CPU-bound, so
+    both run in a worker thread; single-pass Gemini calls stay on the event
+    loop.
+    """
+    cached = await sync_to_async(cached_result, thread_sensitive=False)(text, summary_type)
+    if cached is not None:
+        return cached
+    return await summary_flight.ado(
+        summary_cache.key_for(text, summary_type),
+        lambda: agenerate_result(text, summary_type, user),
+    )
+
+
+async def agenerate_result(text, summary_type, user=None):
+    backend = select_backend(text, summary_type)
+    if backend.local:
+        try:
+            return SummaryResult(await backend.asummarize(text, summary_type), False, backend.name)
+        except ValueError:
+            backend = get_backend('gemini')
+
+    if user is not None:
+        await sync_to_async(admit, thread_sensitive=False)(user, len(text))
+
+    try:
+        summary = await backend.asummarize(text, summary_type)
+    except UNAVAILABLE_ERRORS:
+        fallback = await sync_to_async(local_fallback, thread_sensitive=False)(text, summary_type)
+        if fallback is None:
+            raise
+        return fallback
+    await sync_to_async(remember, thread_sensitive=False)(text, summary_type, summary)
+    return SummaryResult(summary, False, backend.name)
+
+
+def generation_error(e):
+    """Map a generation exception to an API error payload and HTTP status"""
+    if isinstance(e, (RateLimited, api_exceptions.TooManyRequests)):
+        retry_after = e.retry_after if isinstance(e, RateLimited) else UPSTREAM_RETRY_AFTER
+        logger.warning(f"Summary request rejected: {str(e)}")
+        return (
+            {
+                "error": "Too many summary requests",
+                "code": "rate_limited",
+                "retry_after": round(retry_after, 1),
+                "solutions": [
+                    f"Try again in {max(1, round(retry_after))} seconds",
+                    "Send shorter texts",
+                ]
+            },
+            status.HTTP_429_TOO_MANY_REQUESTS
+        )
+    if isinstance(e, genai.types.StopCandidateException):
+        logger.error(f"Content filter triggered: {str(e)}")
+        return (
+            {
+                "error": "Content violation detected in generation",
+                "code": "content_violation",
+                "solutions": [
+                    "Try different content",
+                    "Reformulate your text",
+                    "Contact support if this persists"
+                ]
+            },
+            status.HTTP_400_BAD_REQUEST
+        )
+    if isinstance(e, ValueError):
+        logger.error(f"Empty summary generated: {str(e)}")
+        return (
+            {
+                "error": "Failed to generate meaningful summary",
+                "code": "empty_summary",
+                "solutions": [
+                    "Try different content",
+                    "Use a different summary length",
+                    "Break content into smaller sections"
+                ]
+            },
+            status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    if isinstance(e, FlightTimeout):
+        logger.warning(f"Summary request not answered in time: {str(e)}")
+        return (
+            {
+                "error": "Timed out waiting for the summary",
+                "code": "timeout",
+                "solutions": [
+                    "Try again later",
+                ]
+            },
+            status.HTTP_504_GATEWAY_TIMEOUT
+        )
+    if isinstance(e, (CircuitOpen, Overloaded)):
+        # Raised before any request was made, so this costs microseconds
+        logger.warning(f"Gemini call refused: {str(e)}")
+        return (
+            {
+                "error": "AI service unavailable",
+                "code": "circuit_open" if isinstance(e, CircuitOpen) else "overloaded",
+                "retry_after": round(e.retry_after, 1),
+                "solutions": [
+                    "Try again later",
+                ]
+            },
+            status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    logger.error(f"Generation failed: {str(e)}")
+    return (
+        {
+            "error": "AI service unavailable",
+            "code": "service_unavailable",
+            "solutions": [
+                "Try again later",
+            ]
+        },
+        status.HTTP_503_SERVICE_UNAVAILABLE
+    )
@@ -0,0 +1,25 @@
+# hashers.py
+"""Password hashing with a configurable cost.
+
+Django's PBKDF2 default (1,000,000 iterations in 5.2) takes about half a
+second of CPU per hash, which registration and every login pay on the
+request thread. PASSWORD_HASH_ITERATIONS sets the iteration count instead
+(0 keeps Django's). Existing hashes record their own count and still
+verify. Django rehashes them at the next successful login when their count
+is below the setting, but never lowers it: a hash made at Django's default
+keeps that strength after PASSWORD_HASH_ITERATIONS is set lower.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, must_update_salt
+
+
+class ConfigurablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """pbkdf2_sha256 with PASSWORD_HASH_ITERATIONS iterations"""
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_HASH_ITERATIONS', 0) or PBKDF2PasswordHasher.iterations
+
+    def must_update(self, encoded):
+        decoded = self.decode(encoded)
+        return decoded['iterations'] < self.iterations or must_update_salt(decoded['salt'], self.salt_entropy)
@@ -0,0 +1,156 @@
+# jobs.py
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .generation import generation_error, summarize
+from .metrics import timed
+from .models import Summary
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Process-wide pool used when jobs run inside the web process.
+
+    A new pool first picks up the jobs left queued or orphaned by a
+    process that stopped (see recover_jobs).
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'SUMMARY_JOB_WORKERS', 4),
+                thread_name_prefix='summary-job',
+            )
+            _executor.submit(recover_jobs)
+        return _executor
+
+
+def enqueue(user, text, summary_type):
+    """Create a queued Summary row and hand it to the worker pool.
+
+    The full input is kept in original_text until the job finishes so that
+    an out-of-process worker can pick it up from the database.
+    """
+    with timed('db_write'):
+        job = Summary.objects.create(
+            user=user,
+            original_text=text,
+            summary_text='',
+            summary_type=summary_type,
+            is_complete=False,
+            status=Summary.STATUS_QUEUED,
+        )
+    if getattr(settings, 'SUMMARY_JOB_MODE', 'inprocess') == 'inprocess':
+        get_executor().submit(run_job, job.pk)
+    return job
+
+
+def claim(job_id):
+    """Atomically move a queued job to running.
+
+    Returns the claim time, which run_job needs to record the outcome, or
+    None if someone else got the job.
+    """
+    claimed_at = timezone.now()
+    claimed = Summary.objects.filter(
+        pk=job_id, status=Summary.STATUS_QUEUED
+    ).update(status=Summary.STATUS_RUNNING, claimed_at=claimed_at)
+    return claimed_at if claimed == 1 else None
+
+
+def reclaim_stale(max_age=None):
+    """Queue again the running jobs claimed over max_age seconds ago.
+
+    Their worker is taken to have died with them. Defaults to
+    SUMMARY_JOB_STALE_SECONDS, which must be longer than any job runs.
+    Returns how many jobs were queued again.
+    """
+    if max_age is None:
+        max_age = getattr(settings, 'SUMMARY_JOB_STALE_SECONDS', 900)
+    cutoff = timezone.now() - timedelta(seconds=max_age)
+    reclaimed = Summary.objects.filter(
+        Q(claimed_at__lt=cutoff) | Q(claimed_at__isnull=True), status=Summary.STATUS_RUNNING
+    ).update(status=Summary.STATUS_QUEUED, claimed_at=None)
+    if reclaimed:
+        logger.warning(f"Queued {reclaimed} orphaned summary jobs again")
+    return reclaimed
+
+
+def recover_jobs():
+    """Reclaim stale jobs and run every queued job in this process's pool"""
+    close_old_connections()
+    try:
+        reclaim_stale()
+        job_ids = list(
+            Summary.objects
+            .filter(status=Summary.STATUS_QUEUED)
+            .order_by('created_at')
+            .values_list('pk', flat=True)
+        )
+    except Exception as e:
+        logger.error(f"Summary job recovery failed: {str(e)}")
+        return
+    finally:
+        close_old_connections()
+    executor = get_executor()
+    for job_id in job_ids:
+        # Jobs other processes are about to run fail to claim here
+        executor.submit(run_job, job_id)
+
+
+def finish(job_id, claimed_at, **fields):
+    """Record a job's outcome unless it was reclaimed and claimed again meanwhile"""
+    if not Summary.objects.filter(pk=job_id, claimed_at=claimed_at).update(is_complete=True, **fields):
+        logger.warning(f"Summary job {job_id} was reclaimed while running; its outcome is dropped")
+
+
+def run_job(job_id, claimed_at=None):
+    """Run a job; claimed_at is the time from claim() if the caller claimed it already"""
+    close_old_connections()
+    try:
+        if claimed_at is None:
+            claimed_at = claim(job_id)
+            if claimed_at is None:
+                return
+
+        job = Summary.objects.get(pk=job_id)
+        try:
+            summary = summarize(job.original_text, job.summary_type).summary
+        except Exception as e:
+            payload, _ = generation_error(e)
+            finish(
+                job_id, claimed_at,
+                status=Summary.STATUS_FAILED,
+                error_code=payload["code"],
+                error_message=payload["error"],
+                original_text=job.original_text[:5000],
+            )
+            return
+
+        finish(
+            job_id, claimed_at,
+            status=Summary.STATUS_COMPLETED,
+            summary_text=summary,
+            original_text=job.original_text[:5000],
+        )
+    except Exception as e:
+        logger.error(f"Summary job {job_id} crashed: {str(e)}", exc_info=True)
+        Summary.objects.filter(pk=job_id).update(
+            status=Summary.STATUS_FAILED,
+            is_complete=True,
+            error_code="server_error",
+            error_message="Internal server error",
+        )
+    finally:
+        close_old_connections()
@@ -0,0 +1,192 @@
+# loadtest.py
+import asyncio
+import statistics
+import time
+import uuid
+from collections import Counter
+
+import httpx
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def latency_report(latencies, errors, elapsed):
+    """Summary statistics in milliseconds for a list of latencies in seconds"""
+    ms = [value * 1000 for value in latencies]
+    total = len(latencies) + errors
+    return {
+        'requests': total,
+        'errors': errors,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(total / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(percentile(ms, 50), 2),
+        'p95_ms': round(percentile(ms, 95), 2),
+        'p99_ms': round(percentile(ms, 99), 2),
+        'mean_ms': round(statistics.fmean(ms), 2) if ms else 0.0,
+    }
+
+
+async def run_load(url, payload, headers, requests, concurrency, timeout=120.0):
+    """POST payload to url `requests` times with at most `concurrency` in flight"""
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        async def one():
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(url, json=payload, headers=headers)
+                    if response.status_code >= 400:
+                        errors += 1
+                        return
+                except httpx.HTTPError:
+                    errors += 1
+                    return
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+
+    return latency_report(latencies, errors, elapsed)
+
+
+FLOW_STAGES = ('register', 'login', 'fetch', 'summarize')
+
+
+async def run_flows(base_url, stages, rps, duration, concurrency, page_urls=(), text='',
+                    summary_type='medium', unique=True, password='Bench-pass-1234', timeout=120.0):
+    """Start a register→login→fetch→summarize flow every 1/rps seconds for `duration` seconds.
+
+    Arrivals are open-loop: a slow server does not slow the arrival rate, so
+    queueing shows up as latency. A flow that would exceed `concurrency`
+    flows in flight is dropped and counted instead of being delayed.
+
+    Without the register stage all flows log in as one user created up
+    front; without login they share one token. Without fetch, `text` is
+    summarized. With `unique`, each flow gets its own page variant (`?v=`)
+    or text so no cache can answer it.
+    """
+    run_id = uuid.uuid4().hex[:8]
+    stage_latencies = {stage: [] for stage in stages}
+    stage_errors = {stage: Counter() for stage in stages}
+    flow_latencies = []
+    counts = Counter()
+    in_flight = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        async def register(username):
+            return await client.post('/api/register/', json={
+                "username": username, "password": password, "email": f"{username}@bench.invalid",
+            })
+
+        async def login(username):
+            return await client.post('/api/login/', json={"username": username, "password": password})
+
+        shared_user = f"bench-{run_id}"
+        shared_token = None
+        if 'register' not in stages:
+            (await register(shared_user)).raise_for_status()
+            if 'login' not in stages:
+                response = await login(shared_user)
+                response.raise_for_status()
+                shared_token = response.json()['access']
+
+        async def flow(index):
+            username = f"{shared_user}-{index}" if 'register' in stages else shared_user
+            auth = {"Authorization": f"Bearer {shared_token}"} if shared_token else {}
+            content = f"{text} Bench run {run_id}, flow {index}." if unique else text
+            page = page_urls[index % len(page_urls)] if page_urls else None
+            if page and unique:
+                page = f"{page}{'&' if '?' in page else '?'}v={run_id}-{index}"
+
+            for stage in stages:
+                started = time.perf_counter()
+                try:
+                    if stage == 'register':
+                        response = await register(username)
+                    elif stage == 'login':
+                        response = await login(username)
+                    elif stage == 'fetch':
+                        response = await client.post('/api/fetch-url-content/', json={"url": page}, headers=auth)
+                    else:
+                        response = await client.post('/api/summarize/', headers=auth, json={
+                            "text": content, "summary_type": summary_type,
+                        })
+                except httpx.HTTPError as e:
+                    stage_errors[stage][type(e).__name__] += 1
+                    return False
+                if response.status_code >= 400:
+                    stage_errors[stage][str(response.status_code)] += 1
+                    return False
+                stage_latencies[stage].append(time.perf_counter() - started)
+
+                if stage == 'login':
+                    auth = {"Authorization": f"Bearer {response.json()['access']}"}
+                elif stage == 'fetch':
+                    content = response.json()['content']
+            return True
+
+        async def timed_flow(index):
+            nonlocal in_flight
+            in_flight += 1
+            started = time.perf_counter()
+            try:
+                if await flow(index):
+                    flow_latencies.append(time.perf_counter() - started)
+                    counts['completed'] += 1
+                else:
+                    counts['failed'] += 1
+            finally:
+                in_flight -= 1
+
+        tasks = []
+        started = time.perf_counter()
+        for index in range(max(1, round(rps * duration))):
+            delay = started + index / rps - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if in_flight >= concurrency:
+                counts['dropped'] += 1
+                continue
+            tasks.append(asyncio.create_task(timed_flow(index)))
+        arrivals = time.perf_counter() - started
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    stage_reports = {}
+    for stage in stages:
+        report = latency_report(stage_latencies[stage], sum(stage_errors[stage].values()), elapsed)
+        report['error_codes'] = dict(stage_errors[stage])
+        stage_reports[stage] = report
+    requests = sum(report['requests'] for report in stage_reports.values())
+    return {
+        'run_id': run_id,
+        'elapsed_s': round(elapsed, 3),
+        'target_rps': rps,
+        # Rate at which flows were actually started, over the arrival window
+        'achieved_rps': round(len(tasks) / arrivals, 2) if arrivals else 0.0,
+        'flows': {
+            'started': len(tasks),
+            'completed': counts['completed'],
+            'failed': counts['failed'],
+            'dropped': counts['dropped'],
+        },
+        'throughput': {
+            'flows_per_s': round(counts['completed'] / elapsed, 2) if elapsed else 0.0,
+            'requests_per_s': round(requests / elapsed, 2) if elapsed else 0.0,
+        },
+        'flow_latency': latency_report(flow_latencies, counts['failed'], elapsed),
+        'stages': stage_reports,
+    }
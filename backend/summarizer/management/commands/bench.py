@@ -0,0 +1,64 @@
+import asyncio
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from summarizer.loadtest import FLOW_STAGES, run_flows
+from summarizer.management.commands.loadtest import SAMPLE_TEXT
+from summarizer.mock_servers import CORPUS_DIR
+
+
+class Command(BaseCommand):
+    help = ("Drive register→login→fetch→summarize flows at a target rate and report per-stage "
+            "p50/p95/p99 latency and throughput as JSON (run mock_gemini and fake_origin for an offline stack)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--origin-url', default='http://127.0.0.1:9300',
+                            help="fake_origin server whose pages the fetch stage requests")
+        parser.add_argument('--page', action='append', dest='pages',
+                            help="Page URL to fetch instead of the fake origin's pages (repeatable)")
+        parser.add_argument('--stages', default=','.join(FLOW_STAGES),
+                            help=f"Comma-separated subset of {', '.join(FLOW_STAGES)}, run in that order")
+        parser.add_argument('--rps', type=float, default=5.0, help="Flows started per second")
+        parser.add_argument('--duration', type=float, default=30.0, help="Seconds to keep starting flows")
+        parser.add_argument('--concurrency', type=int, default=200,
+                            help="Most flows in flight; arrivals beyond this are dropped")
+        parser.add_argument('--summary-type', default='medium')
+        parser.add_argument('--text-file', help="Text to summarize when the fetch stage is skipped")
+        parser.add_argument('--repeat', action='store_true',
+                            help="Reuse the same pages and text in every flow so caches can answer")
+        parser.add_argument('--output', help="Write the JSON report to this file as well")
+
+    def handle(self, *args, **options):
+        stages = [stage.strip() for stage in options['stages'].split(',') if stage.strip()]
+        unknown = set(stages) - set(FLOW_STAGES)
+        if unknown or not stages:
+            raise CommandError(f"Unknown stages: {', '.join(sorted(unknown))}" if unknown else "No stages given")
+        stages.sort(key=FLOW_STAGES.index)
+        if options['rps'] <= 0:
+            raise CommandError("--rps must be positive")
+
+        pages = options['pages'] or [
+            f"{options['origin_url'].rstrip('/')}/{path.stem}.html" for path in sorted(CORPUS_DIR.glob('*.html'))
+        ]
+        text = Path(options['text_file']).read_text(encoding='utf-8') if options['text_file'] else SAMPLE_TEXT
+
+        report = asyncio.run(run_flows(
+            options['base_url'], stages, options['rps'], options['duration'], options['concurrency'],
+            page_urls=pages, text=text, summary_type=options['summary_type'], unique=not options['repeat'],
+        ))
+        report['config'] = {
+            'base_url': options['base_url'],
+            'stages': stages,
+            'duration_s': options['duration'],
+            'concurrency': options['concurrency'],
+            'summary_type': options['summary_type'],
+            'unique': not options['repeat'],
+        }
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            Path(options['output']).write_text(output + '\n', encoding='utf-8')
+        self.stdout.write(output)
@@ -0,0 +1,115 @@
+import json
+import multiprocessing
+import time
+import uuid
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection, connections
+
+from summarizer.loadtest import latency_report
+from summarizer.models import Summary
+
+
+def write_rows(user_id, start, deadline, batch, text):
+    """Insert Summary rows from start until deadline; returns (commit latencies, rows, errors)"""
+    time.sleep(max(0.0, start - time.time()))
+    latencies = []
+    rows = 0
+    errors = Counter()
+    while time.time() < deadline:
+        records = [
+            Summary(user_id=user_id, original_text=text, summary_text=text[:400], summary_type='medium')
+            for _ in range(batch)
+        ]
+        started = time.perf_counter()
+        try:
+            if batch == 1:
+                records[0].save()
+            else:
+                Summary.objects.bulk_create(records)
+        except DatabaseError as e:
+            errors[str(e)] += 1
+            continue
+        latencies.append(time.perf_counter() - started)
+        rows += batch
+    connection.close()
+    return latencies, rows, errors
+
+
+def read_rows(user_id, start, deadline, batch, text):
+    """List the newest rows, as the history page would, from start until deadline"""
+    time.sleep(max(0.0, start - time.time()))
+    reads = 0
+    errors = Counter()
+    while time.time() < deadline:
+        try:
+            list(Summary.objects.filter(user_id=user_id).order_by('-created_at')
+                 .values('id', 'summary_type', 'created_at')[:20])
+        except DatabaseError as e:
+            errors[str(e)] += 1
+            continue
+        reads += 1
+    connection.close()
+    return [], reads, errors
+
+
+def run_worker(job):
+    target, args = job
+    return target(*args)
+
+
+class Command(BaseCommand):
+    help = ("Measure concurrent Summary insert throughput on the configured database "
+            "(run once per DB_ENGINE / SQLITE_* profile to compare)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help="Writer processes")
+        parser.add_argument('--readers', type=int, default=2, help="Processes reading while the writers run")
+        parser.add_argument('--duration', type=float, default=10.0)
+        parser.add_argument('--batch', type=int, default=1,
+                            help="Rows per transaction (1 = a create() per request; more = write-behind batches)")
+        parser.add_argument('--text-chars', type=int, default=5000, help="Size of original_text per row")
+
+    def handle(self, *args, **options):
+        user = User.objects.create(username=f"bench-db-{uuid.uuid4().hex[:8]}")
+        text = ("Benchmark summary text. " * (options['text_chars'] // 24 + 1))[:options['text_chars']]
+        # All processes start together once the pool is up
+        start = time.time() + 1.0
+        deadline = start + options['duration']
+        job_args = (user.pk, start, deadline, options['batch'], text)
+        jobs = [(write_rows, job_args)] * options['writers'] + [(read_rows, job_args)] * options['readers']
+
+        # Each process opens its own connection after the fork
+        connections.close_all()
+        try:
+            with multiprocessing.get_context('fork').Pool(len(jobs)) as pool:
+                results = pool.map(run_worker, jobs)
+        finally:
+            user.delete()
+
+        writes = results[:options['writers']]
+        reads = results[options['writers']:]
+        latencies = [latency for result in writes for latency in result[0]]
+        write_errors = sum((result[2] for result in writes), Counter())
+        errors = sum((result[2] for result in results), Counter())
+        rows = sum(result[1] for result in writes)
+        settings_dict = connection.settings_dict
+
+        report = {
+            'engine': connection.vendor,
+            'options': {
+                key: value for key, value in settings_dict.get('OPTIONS', {}).items() if key != 'password'
+            },
+            'conn_max_age': settings_dict.get('CONN_MAX_AGE'),
+            'writers': options['writers'],
+            'readers': options['readers'],
+            'batch': options['batch'],
+            'rows_written': rows,
+            'rows_per_s': round(rows / options['duration'], 1),
+            'reads_per_s': round(sum(result[1] for result in reads) / options['duration'], 1),
+            'commits': latency_report(latencies, sum(write_errors.values()), options['duration']),
+            'errors': dict(errors),
+        }
+        self.stdout.write(json.dumps(report, indent=2, default=str))
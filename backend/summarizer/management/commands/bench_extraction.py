@@ -0,0 +1,59 @@
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from summarizer.extraction import DensityExtractor, SoupExtractor, etree
+
+CORPUS_DIR = Path(__file__).resolve().parents[2] / 'benchmarks' / 'html'
+
+
+def word_overlap(output, reference):
+    """(recall, precision) of output's distinct words against the reference"""
+    output_words = set(output.lower().split())
+    reference_words = set(reference.lower().split())
+    common = len(output_words & reference_words)
+    recall = common / len(reference_words) if reference_words else 1.0
+    precision = common / len(output_words) if output_words else 1.0
+    return recall, precision
+
+
+class Command(BaseCommand):
+    help = "Compare extraction engines on the saved HTML corpus (time and output vs the original soup engine)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corpus', default=str(CORPUS_DIR), help="Directory of .html files")
+        parser.add_argument('--runs', type=int, default=20, help="Timed runs per page and engine")
+
+    def handle(self, *args, **options):
+        engines = {
+            'soup/html.parser': SoupExtractor('html.parser'),
+            'density/html.parser': DensityExtractor('html.parser'),
+        }
+        if etree is not None:
+            engines['soup/lxml'] = SoupExtractor('lxml')
+            engines['density/lxml'] = DensityExtractor('lxml')
+
+        report = {}
+        for page in sorted(Path(options['corpus']).glob('*.html')):
+            html = page.read_text(encoding='utf-8')
+            reference = engines['soup/html.parser'].extract(html)
+            results = {}
+            for name, engine in engines.items():
+                started = time.perf_counter()
+                for _ in range(options['runs']):
+                    output = engine.extract(html)
+                elapsed_ms = (time.perf_counter() - started) * 1000 / options['runs']
+                recall, precision = word_overlap(output, reference)
+                results[name] = {
+                    'ms': round(elapsed_ms, 3),
+                    'chars': len(output),
+                    # Word-level agreement with the original engine; low
+                    # recall usually means bylines/nav links were dropped
+                    'recall_vs_original': round(recall, 3),
+                    'precision_vs_original': round(precision, 3),
+                }
+            report[page.name] = {'bytes': len(html.encode('utf-8')), 'engines': results}
+
+        self.stdout.write(json.dumps(report, indent=2))
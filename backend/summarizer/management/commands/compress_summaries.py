@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from summarizer.compression import rewrite_texts, text_compressor
+from summarizer.search import optimize_index
+
+
+class Command(BaseCommand):
+    help = "Compress stored summary texts with the current TEXT_COMPRESSION settings"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recompress', action='store_true',
+                            help="Also rewrite texts compressed with another codec or dictionary")
+        parser.add_argument('--batch', type=int, default=500)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            self.stdout.write("Texts are only compressed on SQLite; PostgreSQL compresses them itself (TOAST)")
+            return
+        rewritten = rewrite_texts(connection, 'summarizer_summary', ['original_text', 'summary_text'],
+                                  batch_size=options['batch'], recompress=options['recompress'])
+        if rewritten:
+            optimize_index()
+        stats = text_compressor.stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rewrote {rewritten} summaries at {stats['ratio']:.2f}x; run VACUUM to return the space to the disk"
+        ))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from summarizer.mock_servers import CORPUS_DIR, FakeOrigin, FakeOriginHandler, LatencyModel, serve
+
+
+class Command(BaseCommand):
+    help = "Serve the saved HTML corpus as a fake origin for the fetch endpoints (/<page>.html?v=<n>)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=9300)
+        parser.add_argument('--corpus', default=str(CORPUS_DIR), help="Directory of .html files")
+        parser.add_argument('--latency', choices=LatencyModel.KINDS, default='fixed')
+        parser.add_argument('--latency-ms', type=float, default=50, help="Median response delay")
+        parser.add_argument('--spread', type=float, default=0.5,
+                            help="lognormal: sigma of log(latency); uniform: ± milliseconds")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--verbose', action='store_true', help="Log every request")
+
+    def handle(self, *args, **options):
+        spread = options['spread'] / 1000 if options['latency'] == 'uniform' else options['spread']
+        origin = FakeOrigin(
+            LatencyModel(options['latency'], options['latency_ms'] / 1000, spread),
+            corpus_dir=options['corpus'],
+            seed=options['seed'],
+        )
+        server = serve(FakeOriginHandler, options['port'], options['host'], options['verbose'], origin=origin)
+        self.stdout.write(f"Fake origin listening on http://{options['host']}:{options['port']} "
+                          f"with pages: {', '.join(origin.pages)}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"Served {origin.stats()}")
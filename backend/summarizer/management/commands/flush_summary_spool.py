@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from summarizer.persistence import summary_writer
+
+
+class Command(BaseCommand):
+    help = "Insert summaries left in the write-behind spool file (e.g. after a database outage)"
+
+    def handle(self, *args, **options):
+        claimed = summary_writer.replay()
+        stats = summary_writer.stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Replayed {claimed} spooled summaries from {summary_writer.spool.path}: "
+            f"{stats['written']} written, {stats['spooled']} spooled again, {stats['dropped']} dropped"
+        ))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from summarizer.cache import LocalLRUBackend
+from summarizer.generation import summary_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Drop cached summaries written for an older prompt/model version. Needs a "
+        "shared cache (SUMMARY_CACHE_BACKEND=django or database): the local backend "
+        "lives in each worker process, so restart the workers to clear it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help="Clear every cached summary, including the current version",
+        )
+
+    def handle(self, *args, **options):
+        if isinstance(summary_cache.backend, LocalLRUBackend):
+            raise CommandError(
+                "SUMMARY_CACHE_BACKEND=local is per process; this command can't reach the "
+                "workers' caches. Restart the workers to clear them."
+            )
+        summary_cache.invalidate(all_versions=options['all'])
+        scope = "all entries" if options['all'] else f"entries older than version {summary_cache.version}"
+        self.stdout.write(self.style.SUCCESS(
+            f"Invalidated {scope} ({type(summary_cache.backend).__name__})"
+        ))
@@ -0,0 +1,58 @@
+import asyncio
+import json
+
+from django.core.management.base import BaseCommand
+
+from summarizer.loadtest import run_load
+
+SAMPLE_TEXT = (
+    "SmartSum load test document. The city council approved a new transit plan on Tuesday, "
+    "adding three bus rapid transit lines and extending light rail service to the airport. "
+    "Officials estimate the project will cost 2.4 billion dollars over ten years and carry "
+    "120,000 riders a day once complete. Critics argue the plan underfunds maintenance of "
+    "existing lines, while supporters say it will cut commute times by up to 30 percent. "
+) * 4
+
+ENDPOINTS = {
+    'summarize': ('/api/summarize/', '/api/async/summarize/'),
+    'fetch': ('/api/fetch-url-content/', '/api/async/fetch-url-content/'),
+}
+
+
+class Command(BaseCommand):
+    help = "Drive concurrent requests at the sync (WSGI) and async (ASGI) endpoints and compare latency"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000',
+                            help="Server to test; use --async-base-url if ASGI runs elsewhere")
+        parser.add_argument('--async-base-url', help="Server running smartsum.asgi (defaults to --base-url)")
+        parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), default='summarize')
+        parser.add_argument('--mode', choices=['sync', 'async', 'compare'], default='compare')
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--token', required=True, help="JWT access token")
+        parser.add_argument('--url', help="Page to fetch for --endpoint fetch")
+        parser.add_argument('--summary-type', default='short')
+
+    def handle(self, *args, **options):
+        sync_path, async_path = ENDPOINTS[options['endpoint']]
+        if options['endpoint'] == 'fetch':
+            payload = {"url": options['url']}
+        else:
+            payload = {"text": SAMPLE_TEXT, "summary_type": options['summary_type']}
+        headers = {"Authorization": f"Bearer {options['token']}"}
+
+        targets = []
+        if options['mode'] in ('sync', 'compare'):
+            targets.append(('wsgi', options['base_url'] + sync_path))
+        if options['mode'] in ('async', 'compare'):
+            targets.append(('asgi', (options['async_base_url'] or options['base_url']) + async_path))
+
+        results = {}
+        for name, url in targets:
+            results[name] = asyncio.run(run_load(
+                url, payload, headers, options['requests'], options['concurrency']
+            ))
+            results[name]['url'] = url
+
+        self.stdout.write(json.dumps(results, indent=2))
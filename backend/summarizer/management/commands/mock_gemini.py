@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from summarizer.mock_servers import LatencyModel, MockGemini, MockGeminiHandler, serve
+
+
+class Command(BaseCommand):
+    help = ("Run a local stand-in for the Gemini REST API; point the backend at it with "
+            "GEMINI_API_ENDPOINT=http://127.0.0.1:<port>")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=9200)
+        parser.add_argument('--latency', choices=LatencyModel.KINDS, default='lognormal',
+                            help="Distribution of the time to first token")
+        parser.add_argument('--latency-ms', type=float, default=500, help="Median time to first token")
+        parser.add_argument('--spread', type=float, default=0.5,
+                            help="lognormal: sigma of log(latency); uniform: ± milliseconds")
+        parser.add_argument('--token-ms', type=float, default=20, help="Delay per generated word")
+        parser.add_argument('--error-rate', type=float, default=0.0, help="Share of requests failing with 500/503")
+        parser.add_argument('--quota-rate', type=float, default=0.0, help="Share of requests failing with 429")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--verbose', action='store_true', help="Log every request")
+
+    def handle(self, *args, **options):
+        spread = options['spread'] / 1000 if options['latency'] == 'uniform' else options['spread']
+        mock = MockGemini(
+            LatencyModel(options['latency'], options['latency_ms'] / 1000, spread),
+            token_delay=options['token_ms'] / 1000,
+            error_rate=options['error_rate'],
+            quota_rate=options['quota_rate'],
+            seed=options['seed'],
+        )
+        server = serve(MockGeminiHandler, options['port'], options['host'], options['verbose'], mock=mock)
+        self.stdout.write(f"Mock Gemini listening on http://{options['host']}:{options['port']}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"Served {mock.stats()}")
@@ -0,0 +1,55 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from django.core.management.base import BaseCommand
+
+from summarizer.jobs import claim, reclaim_stale, run_job
+from summarizer.models import Summary
+
+
+class Command(BaseCommand):
+    help = "Process queued async summarization jobs (use with SUMMARY_JOB_MODE=external)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help="Concurrent jobs per worker process")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds between queue polls when idle")
+        parser.add_argument('--once', action='store_true', help="Drain the current queue and exit")
+        parser.add_argument(
+            '--reclaim-interval', type=float, default=60.0,
+            help="Seconds between checks for jobs orphaned by a worker that died (SUMMARY_JOB_STALE_SECONDS)",
+        )
+
+    def handle(self, *args, **options):
+        threads = options['threads']
+        in_flight = set()
+        reclaimed_at = None
+
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='summary-worker') as pool:
+            while True:
+                if reclaimed_at is None or time.monotonic() - reclaimed_at >= options['reclaim_interval']:
+                    reclaim_stale()
+                    reclaimed_at = time.monotonic()
+                free = threads - len(in_flight)
+                job_ids = []
+                if free > 0:
+                    job_ids = list(
+                        Summary.objects
+                        .filter(status=Summary.STATUS_QUEUED)
+                        .order_by('created_at')
+                        .values_list('pk', flat=True)[:free]
+                    )
+
+                for job_id in job_ids:
+                    # Several worker processes may poll the same rows; only
+                    # the one whose claim succeeds runs the job.
+                    claimed_at = claim(job_id)
+                    if claimed_at is not None:
+                        in_flight.add(pool.submit(run_job, job_id, claimed_at))
+
+                if in_flight:
+                    done, _ = wait(in_flight, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                    in_flight -= done
+                elif options['once']:
+                    break
+                elif not job_ids:
+                    time.sleep(options['poll_interval'])
@@ -0,0 +1,76 @@
+import json
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from summarizer.compression import TextCompressor, dictionary_id, text_compressor, train_dictionary, ZSTD
+from summarizer.models import Summary
+
+
+def measure(compressor, texts):
+    started = time.perf_counter()
+    stored = [compressor.compress(text) for text in texts]
+    encoded = time.perf_counter()
+    for value in stored:
+        compressor.decompress(value)
+    decoded = time.perf_counter()
+    return {
+        'ratio': round(sum(len(text.encode('utf-8')) for text in texts) / sum(map(len, stored)), 2),
+        'encode_us_per_text': round((encoded - started) / len(texts) * 1e6, 1),
+        'decode_us_per_text': round((decoded - encoded) / len(texts) * 1e6, 1),
+    }
+
+
+class Command(BaseCommand):
+    help = ("Train a shared compression dictionary on recent summaries and report the compression ratio "
+            "and cost with and without it")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples', type=int, default=2000, help="Recent completed summaries to sample")
+        parser.add_argument('--size', type=int, default=64 * 1024, help="Dictionary size in bytes")
+        parser.add_argument('--output-dir', default=settings.TEXT_COMPRESSION_DICTIONARY_DIR)
+
+    def handle(self, *args, **options):
+        rows = (
+            Summary.objects
+            .filter(status=Summary.STATUS_COMPLETED)
+            .only('original_text', 'summary_text')
+            .order_by('-id')[:options['samples']]
+        )
+        pairs = [[text for text in (row.original_text, row.summary_text) if text] for row in rows]
+        if len(pairs) < 10:
+            raise CommandError(f"Only {len(pairs)} summaries to train on; need at least 10")
+
+        # Every fifth summary is held out to measure the dictionary on; a
+        # summary and its original text repeat each other, so they stay together
+        training = [text for index, texts in enumerate(pairs) if index % 5 for text in texts]
+        held_out = [text for texts in pairs[::5] for text in texts]
+        codec = 'zstd' if text_compressor.codec == ZSTD else 'zlib'
+        started = time.perf_counter()
+        data = train_dictionary(training, options['size'], text_compressor.codec)
+        training_seconds = time.perf_counter() - started
+
+        output_dir = Path(options['output_dir'])
+        output_dir.mkdir(parents=True, exist_ok=True)
+        path = output_dir / f'{codec}-{dictionary_id(data).hex()}.dict'
+        path.write_bytes(data)
+
+        level = text_compressor.level
+        report = {
+            'codec': codec,
+            'level': level,
+            'dictionary': str(path),
+            'dictionary_bytes': len(data),
+            'training_seconds': round(training_seconds, 2),
+            'trained_on': len(training),
+            'held_out': len(held_out),
+            'without_dictionary': measure(TextCompressor(codec, level), held_out),
+            'with_dictionary': measure(TextCompressor(codec, level, output_dir, path.name), held_out),
+        }
+        self.stdout.write(json.dumps(report, indent=2))
+        self.stdout.write(self.style.SUCCESS(
+            f"Set TEXT_COMPRESSION_DICTIONARY={path.name} to compress new summaries with it, "
+            f"then run compress_summaries --recompress to rewrite existing ones"
+        ))
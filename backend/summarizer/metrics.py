@@ -0,0 +1,241 @@
+# metrics.py
+"""Stage timings and counters, rendered in the Prometheus text format.
+
+The stages of a request (dns, fetch, parse, extract, prompt, gemini,
+db_write) are timed into one latency histogram per stage, failures are
+counted per stage, and Gemini token usage is counted from the API's usage
+metadata. GET /metrics renders these together with the stats() of the
+process-wide caches, the rate limiter, the Gemini guard and the page
+fetcher.
+
+Figures are per process: scrape every worker, or sum them. With
+METRICS_SERVER_TIMING the stages timed while handling a request are also
+returned in its Server-Timing header. Work done on other threads (batch
+items, chunk summaries) and in streamed response bodies reaches the
+histograms but not the header.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+class Counter:
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        for label_values, value in values:
+            lines.append(f'{self.name}{format_labels(self.labels, label_values)} {value}')
+        return lines
+
+
+class Histogram:
+    """Latency histogram with one label (e.g. stage)"""
+
+    def __init__(self, name, documentation, label, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.buckets = buckets
+        # label value -> [per-bucket counts (last is +Inf), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        with self._lock:
+            series = sorted((label, list(counts), total) for label, (counts, total) in self._series.items())
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for label_value, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                labels = format_labels((self.label, 'le'), (label_value, bound))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = format_labels((self.label,), (label_value,))
+            lines.append(f'{self.name}_sum{labels} {total}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+stage_seconds = Histogram('smartsum_stage_duration_seconds', 'Time spent in each pipeline stage.', 'stage')
+stage_errors = Counter('smartsum_stage_errors_total', 'Pipeline stages that ended with an exception.', ('stage',))
+request_seconds = Histogram('smartsum_request_duration_seconds', 'Time to produce a response, by view.', 'view')
+requests_total = Counter('smartsum_requests_total', 'Responses by view and status code.', ('view', 'status'))
+gemini_tokens = Counter('smartsum_gemini_tokens_total', 'Tokens reported by Gemini usage metadata.', ('kind',))
+prompt_tokens = Counter('smartsum_prompt_tokens_total', 'Estimated tokens of content received and of prompts sent.', ('kind',))
+
+METRICS = (stage_seconds, stage_errors, request_seconds, requests_total, gemini_tokens, prompt_tokens)
+
+# (stage, seconds) pairs timed while handling the current request
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+def observe(stage, seconds):
+    stage_seconds.observe(stage, seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def timed(stage):
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        stage_errors.inc(stage)
+        raise
+    finally:
+        observe(stage, time.perf_counter() - started)
+
+
+class Stopwatch:
+    """Adds up several separate pieces of one stage; done() records the total"""
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.elapsed = 0.0
+        self.failed = False
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.elapsed += time.perf_counter() - self._started
+        if exc_type is not None and issubclass(exc_type, Exception):
+            self.failed = True
+        return False
+
+    def iterate(self, iterable):
+        """Yield from iterable, timing only the time spent waiting for items"""
+        iterator = iter(iterable)
+        while True:
+            with self:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def done(self):
+        if self.failed:
+            stage_errors.inc(self.stage)
+        observe(self.stage, self.elapsed)
+
+
+def server_timing(timings, total):
+    """Server-Timing header value; repeated stages (e.g. retries) are summed"""
+    durations = {}
+    for stage, seconds in timings:
+        durations[stage] = durations.get(stage, 0.0) + seconds
+    durations['total'] = total
+    return ', '.join(f'{stage};dur={seconds * 1000:.1f}' for stage, seconds in durations.items())
+
+
+def begin_request():
+    return _request_timings.set([]), time.perf_counter()
+
+
+def end_request(request, response, state):
+    token, started = state
+    elapsed = time.perf_counter() - started
+    timings = _request_timings.get()
+    _request_timings.reset(token)
+
+    match = getattr(request, 'resolver_match', None)
+    view = (match.url_name or match.view_name) if match else 'unmatched'
+    request_seconds.observe(view, elapsed)
+    requests_total.inc(view, str(response.status_code))
+    if getattr(settings, 'METRICS_SERVER_TIMING', False):
+        response['Server-Timing'] = server_timing(timings, elapsed)
+    return response
+
+
+class MetricsMiddleware:
+    """Times every request and, if enabled, adds its Server-Timing header.
+
+    For streamed responses the time is to the first byte of the response.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = begin_request()
+        response = self.get_response(request)
+        return end_request(request, response, state)
+
+    async def __acall__(self, request):
+        state = begin_request()
+        response = await self.get_response(request)
+        return end_request(request, response, state)
+
+
+def stats_lines(name, stats):
+    """Gauges for the numeric values of a stats() dict; nested dicts are flattened"""
+    lines = []
+    for key, value in stats.items():
+        metric = f'{name}_{key}'
+        if isinstance(value, dict):
+            lines.extend(stats_lines(metric, value))
+        elif isinstance(value, (bool, int, float)):
+            lines.append(f'# TYPE {metric} gauge')
+            lines.append(f'{metric} {float(value)}')
+    return lines
+
+
+def render(sources):
+    """Prometheus exposition of all metrics plus `sources`, a {name: stats dict} map"""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    for name, stats in sources.items():
+        lines.extend(stats_lines(f'smartsum_{name}', stats))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('summarizer', '0002_summary_is_complete_alter_summary_user_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SummaryCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('summary_text', models.TextField()),
+                ('version', models.CharField(db_index=True, max_length=32)),
+                ('created_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('summarizer', '0003_summarycacheentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='summary',
+            name='error_code',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='summary',
+            name='error_message',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='summary',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='completed', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='summary',
+            index=models.Index(fields=['status', 'created_at'], name='summarizer__status_5f7db2_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:07
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('summarizer', '0005_ratelimitbucket'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='summary',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('summarizer', '0006_summary_created_at_default'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='summary',
+            name='summarizer__user_id_f18e22_idx',
+        ),
+        migrations.AddIndex(
+            model_name='summary',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='summary_user_history_idx'),
+        ),
+    ]
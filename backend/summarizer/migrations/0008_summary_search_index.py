@@ -0,0 +1,95 @@
+from django.db import migrations
+
+FTS_TABLE = 'summarizer_summary_fts'
+FTS_COLUMNS = 'user_id, summary_type, original_text, summary_text'
+
+
+def fts_values(row):
+    return ', '.join(f'{row}.{column.strip()}' for column in FTS_COLUMNS.split(','))
+
+
+# The FTS5 table reads the texts from summarizer_summary (external content)
+# and is updated by triggers, so bulk_create and raw SQL writes are indexed.
+# Only completed summaries are indexed. SQLite migrations that rebuild
+# summarizer_summary drop its triggers; such a migration has to create them
+# again.
+SQLITE_FORWARD = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        {FTS_COLUMNS},
+        content='summarizer_summary', content_rowid='id', tokenize='porter unicode61'
+    )
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_insert AFTER INSERT ON summarizer_summary
+    WHEN new.status = 'completed' BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, {FTS_COLUMNS}) VALUES (new.id, {fts_values('new')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_delete AFTER DELETE ON summarizer_summary
+    WHEN old.status = 'completed' BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {FTS_COLUMNS}) VALUES ('delete', old.id, {fts_values('old')});
+    END
+    """,
+    # e.g. an async job completing
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_update AFTER UPDATE OF {FTS_COLUMNS}, status ON summarizer_summary BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {FTS_COLUMNS})
+        SELECT 'delete', old.id, {fts_values('old')} WHERE old.status = 'completed';
+        INSERT INTO {FTS_TABLE}(rowid, {FTS_COLUMNS})
+        SELECT new.id, {fts_values('new')} WHERE new.status = 'completed';
+    END
+    """,
+    f"""
+    INSERT INTO {FTS_TABLE}(rowid, {FTS_COLUMNS})
+    SELECT id, {FTS_COLUMNS} FROM summarizer_summary WHERE status = 'completed'
+    """,
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')",
+]
+
+SQLITE_BACKWARD = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_update",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+# Must match the weights in summarizer.search
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE summarizer_summary ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english'::regconfig, summary_text), 'A')
+        || setweight(to_tsvector('english'::regconfig, original_text), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX summary_search_idx ON summarizer_summary USING GIN (search_vector)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS summary_search_idx",
+    "ALTER TABLE summarizer_summary DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def create_search_index(apps, schema_editor):
+    statements = {'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    statements = {'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRES_BACKWARD}
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('summarizer', '0007_summary_history_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
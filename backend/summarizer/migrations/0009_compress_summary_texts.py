@@ -0,0 +1,222 @@
+import hashlib
+import importlib
+import zlib
+from functools import partial
+from pathlib import Path
+
+from django.conf import settings
+from django.db import migrations, transaction
+
+import summarizer.fields
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional codec
+    zstandard = None
+
+search_index = importlib.import_module('summarizer.migrations.0008_summary_search_index')
+
+FTS_TABLE = search_index.FTS_TABLE
+FTS_COLUMNS = search_index.FTS_COLUMNS
+TEXT_COLUMNS = ['original_text', 'summary_text']
+
+
+def fts_values(row):
+    # The index needs the plain text of compressed columns
+    return ', '.join(
+        f'smartsum_decompress({row}.{column})' if column in TEXT_COLUMNS else f'{row}.{column}'
+        for column in (name.strip() for name in FTS_COLUMNS.split(','))
+    )
+
+
+def changed():
+    # save() sets every column, so most updates change none of them
+    columns = [name.strip() for name in FTS_COLUMNS.split(',')] + ['status']
+    return ' OR '.join(f'old.{column} IS NOT new.{column}' for column in columns)
+
+
+# The external-content index of 0008 would read compressed BLOBs, so the
+# texts are indexed through a contentless table instead. The triggers call
+# smartsum_decompress, which summarizer.compression registers on every
+# connection; the existing rows are indexed by index_texts instead, so this
+# migration never needs the app's function.
+SQLITE_FORWARD = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        {FTS_COLUMNS}, content='', tokenize='porter unicode61'
+    )
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_insert AFTER INSERT ON summarizer_summary
+    WHEN new.status = 'completed' BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, {FTS_COLUMNS}) VALUES (new.id, {fts_values('new')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_delete AFTER DELETE ON summarizer_summary
+    WHEN old.status = 'completed' BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {FTS_COLUMNS}) VALUES ('delete', old.id, {fts_values('old')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_update AFTER UPDATE OF {FTS_COLUMNS}, status ON summarizer_summary
+    WHEN {changed()} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {FTS_COLUMNS})
+        SELECT 'delete', old.id, {fts_values('old')} WHERE old.status = 'completed';
+        INSERT INTO {FTS_TABLE}(rowid, {FTS_COLUMNS})
+        SELECT new.id, {fts_values('new')} WHERE new.status = 'completed';
+    END
+    """,
+]
+
+
+# Frozen copy of the stored text format of summarizer.compression: one
+# header byte naming the codec (plus WITH_DICTIONARY when a 4-byte
+# dictionary id follows), then the compressed UTF-8 text. Rows are
+# compressed with zlib, which needs no optional package;
+# `manage.py compress_summaries --recompress` moves them to the configured
+# codec and dictionary.
+STORED = 0
+ZLIB = 1
+ZSTD = 2
+WITH_DICTIONARY = 0x80
+MIN_COMPRESS_BYTES = 64
+ZLIB_MAX_DICTIONARY_BYTES = 32 * 1024
+
+
+def load_dictionaries():
+    directory = getattr(settings, 'TEXT_COMPRESSION_DICTIONARY_DIR', None)
+    if not directory or not Path(directory).is_dir():
+        return {}
+    dictionaries = {}
+    for path in sorted(Path(directory).glob('*.dict')):
+        data = path.read_bytes()
+        dictionaries[hashlib.sha256(data).digest()[:4]] = data
+    return dictionaries
+
+
+def compress(text):
+    raw = text.encode('utf-8')
+    if len(raw) >= MIN_COMPRESS_BYTES:
+        body = zlib.compress(raw, 6)
+        if len(body) < len(raw):
+            return bytes([ZLIB]) + body
+    return bytes([STORED]) + raw
+
+
+def decompress(value, dictionaries):
+    if not isinstance(value, bytes):
+        return value
+    codec, body = value[0], value[1:]
+    data = None
+    if codec & WITH_DICTIONARY:
+        codec &= ~WITH_DICTIONARY
+        dict_id, body = body[:4], body[4:]
+        if dict_id not in dictionaries:
+            raise ValueError(f"Compression dictionary {dict_id.hex()} not found")
+        data = dictionaries[dict_id]
+    if codec == STORED:
+        raw = body
+    elif codec == ZLIB:
+        decompressor = zlib.decompressobj(zdict=data[-ZLIB_MAX_DICTIONARY_BYTES:]) if data else zlib.decompressobj()
+        raw = decompressor.decompress(body) + decompressor.flush()
+    elif codec == ZSTD:
+        if zstandard is None:
+            raise ValueError("Stored text is zstd-compressed but zstandard is not installed")
+        shared = zstandard.ZstdCompressionDict(data) if data is not None else None
+        raw = zstandard.ZstdDecompressor(dict_data=shared).decompress(body)
+    else:
+        raise ValueError(f"Unknown stored text format {value[0]}")
+    return raw.decode('utf-8')
+
+
+def rewrite_texts(connection, transform, batch_size=500):
+    """Apply transform to the text columns of every summary, batch_size rows at a time"""
+    columns = ', '.join(TEXT_COLUMNS)
+    select = f"SELECT id, {columns} FROM summarizer_summary WHERE id > %s ORDER BY id LIMIT %s"
+    update = f"UPDATE summarizer_summary SET {', '.join(f'{column} = %s' for column in TEXT_COLUMNS)} WHERE id = %s"
+    last = 0
+    with connection.cursor() as cursor:
+        while True:
+            with transaction.atomic(using=connection.alias):
+                cursor.execute(select, [last, batch_size])
+                rows = cursor.fetchall()
+                if not rows:
+                    return
+                cursor.executemany(update, [
+                    [None if value is None else transform(value) for value in values] + [pk]
+                    for pk, *values in rows
+                ])
+            last = rows[-1][0]
+
+
+def index_texts(connection, dictionaries, batch_size=500):
+    """Add the plain text of every completed summary to the contentless index"""
+    columns = [name.strip() for name in FTS_COLUMNS.split(',')]
+    select = (f"SELECT id, {FTS_COLUMNS} FROM summarizer_summary "
+              f"WHERE status = 'completed' AND id > %s ORDER BY id LIMIT %s")
+    insert = f"INSERT INTO {FTS_TABLE}(rowid, {FTS_COLUMNS}) VALUES (%s, {', '.join(['%s'] * len(columns))})"
+    last = 0
+    with connection.cursor() as cursor:
+        while True:
+            cursor.execute(select, [last, batch_size])
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            cursor.executemany(insert, [
+                [pk] + [decompress(value, dictionaries) if column in TEXT_COLUMNS else value
+                        for column, value in zip(columns, values)]
+                for pk, *values in rows
+            ])
+            last = rows[-1][0]
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+
+
+def compress_texts(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    # Dropped first so compressing doesn't reindex every row
+    for statement in search_index.SQLITE_BACKWARD:
+        schema_editor.execute(statement)
+    if getattr(settings, 'TEXT_COMPRESSION', 'auto') != 'none':
+        rewrite_texts(connection, lambda value: compress(value) if isinstance(value, str) else value)
+    for statement in SQLITE_FORWARD:
+        schema_editor.execute(statement)
+    index_texts(connection, load_dictionaries())
+
+
+def decompress_texts(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    for statement in search_index.SQLITE_BACKWARD:
+        schema_editor.execute(statement)
+    rewrite_texts(connection, partial(decompress, dictionaries=load_dictionaries()))
+    for statement in search_index.SQLITE_FORWARD:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('summarizer', '0008_summary_search_index'),
+    ]
+
+    operations = [
+        # The columns stay TEXT; SQLite stores the compressed values as BLOBs
+        # in them, so the table isn't rebuilt
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AlterField(
+                model_name='summary',
+                name='original_text',
+                field=summarizer.fields.CompressedTextField(),
+            ),
+            migrations.AlterField(
+                model_name='summary',
+                name='summary_text',
+                field=summarizer.fields.CompressedTextField(),
+            ),
+        ]),
+        migrations.RunPython(compress_texts, decompress_texts),
+    ]
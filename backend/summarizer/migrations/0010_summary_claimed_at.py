@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('summarizer', '0009_compress_summary_texts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='summary',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,290 @@
+# mock_servers.py
+"""Local stand-ins for Gemini and for web pages, used by load tests.
+
+MockGemini answers the REST `generateContent` and `streamGenerateContent`
+calls google.generativeai makes once GEMINI_API_ENDPOINT points at it. Time
+to first token, per-token delay and error rates are configurable; with the
+same seed, the same sequence of requests gets the same latencies and errors.
+The "summary" is the first words of the submitted content, so it is stable
+too and its length follows the requested summary type.
+
+FakeOrigin serves the saved pages in summarizer/benchmarks/html with a
+configurable delay and ETag/Last-Modified validators, for the fetch views.
+`?v=<n>` returns a variant of a page with different text, so load tests can
+decide whether the page and summary caches get hits.
+"""
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+CORPUS_DIR = Path(__file__).resolve().parent / 'benchmarks' / 'html'
+
+CONTENT_MARKER = re.compile(r'(?:Original|Section) Content:\s*(.*?)(?:\n\s*Please provide|\Z)', re.DOTALL)
+SUMMARY_TYPE = re.compile(r'(?:generate|write) an? (\w+) summary', re.IGNORECASE)
+
+# Words returned for each summary type
+SUMMARY_WORDS = {
+    'short': 40,
+    'medium': 90,
+    'long': 180,
+    'chunk': 120,
+}
+
+ERROR_STATUSES = {
+    429: 'RESOURCE_EXHAUSTED',
+    500: 'INTERNAL',
+    503: 'UNAVAILABLE',
+}
+
+
+class LatencyModel:
+    """Delay in seconds: `fixed` at median, `uniform` within median ± spread,
+    or `lognormal` around median with `spread` as the sigma of its log"""
+    KINDS = ('fixed', 'uniform', 'lognormal')
+
+    def __init__(self, kind='lognormal', median=0.5, spread=0.5):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution: {kind}")
+        self.kind = kind
+        self.median = median
+        self.spread = spread
+
+    def sample(self, rng):
+        if self.kind == 'fixed' or self.median <= 0:
+            return max(self.median, 0.0)
+        if self.kind == 'uniform':
+            return rng.uniform(max(0.0, self.median - self.spread), self.median + self.spread)
+        return self.median * math.exp(rng.gauss(0.0, self.spread))
+
+    def describe(self):
+        return {'distribution': self.kind, 'median_s': self.median, 'spread': self.spread}
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connections under load tests
+    request_queue_size = 1024
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def send_body(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status, payload):
+        self.send_body(status, json.dumps(payload).encode('utf-8'), 'application/json; charset=UTF-8')
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class MockGemini:
+    """Behaviour and counters of the mock Gemini endpoint"""
+
+    def __init__(self, latency, token_delay=0.02, error_rate=0.0, quota_rate=0.0, seed=0):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.error_rate = error_rate
+        self.quota_rate = quota_rate
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def outcome(self):
+        """Draw (latency, error status or None) for the next request"""
+        with self._lock:
+            self.requests += 1
+            latency = self.latency.sample(self.rng)
+            roll = self.rng.random()
+            if roll < self.quota_rate:
+                error = 429
+            elif roll < self.quota_rate + self.error_rate:
+                error = self.rng.choice((500, 503))
+            else:
+                return latency, None
+            self.errors += 1
+            return latency, error
+
+    @staticmethod
+    def summary_words(prompt):
+        match = CONTENT_MARKER.search(prompt)
+        content = match.group(1) if match else prompt
+        summary_type = 'chunk' if 'Section Content:' in prompt else None
+        if summary_type is None:
+            type_match = SUMMARY_TYPE.search(prompt)
+            summary_type = type_match.group(1) if type_match else 'medium'
+        words = content.split()[:SUMMARY_WORDS.get(summary_type, SUMMARY_WORDS['medium'])]
+        return words or ['Empty', 'input', 'summarized', 'by', 'the', 'mock.']
+
+    def stats(self):
+        with self._lock:
+            return {'requests': self.requests, 'errors': self.errors}
+
+
+def gemini_response(text, prompt_tokens, output_tokens, final=True):
+    candidate = {"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}
+    if final:
+        candidate["finishReason"] = "STOP"
+    return {
+        "candidates": [candidate],
+        "usageMetadata": {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": output_tokens,
+            "totalTokenCount": prompt_tokens + output_tokens,
+        },
+    }
+
+
+class MockGeminiHandler(MockHandler):
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        if path.endswith(':generateContent'):
+            stream = False
+        elif path.endswith(':streamGenerateContent'):
+            stream = True
+        else:
+            self.send_json(404, {"error": {"code": 404, "message": f"Unknown method {path}", "status": "NOT_FOUND"}})
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self.send_json(400, {"error": {"code": 400, "message": "Invalid JSON", "status": "INVALID_ARGUMENT"}})
+            return
+
+        mock = self.server.mock
+        latency, error = mock.outcome()
+        time.sleep(latency)
+        if error is not None:
+            self.send_json(error, {"error": {
+                "code": error, "message": "Mock upstream error", "status": ERROR_STATUSES[error],
+            }})
+            return
+
+        prompt = ''.join(
+            part.get('text', '')
+            for content in body.get('contents', [])
+            for part in content.get('parts', [])
+        )
+        words = mock.summary_words(prompt)
+        # Like Gemini, stop at the requested output limit
+        config = body.get('generationConfig') or body.get('generation_config') or {}
+        max_tokens = config.get('maxOutputTokens') or config.get('max_output_tokens')
+        if max_tokens:
+            words = words[:int(max_tokens)]
+        # Rough token count, as with English text
+        prompt_tokens = len(prompt) // 4
+
+        if not stream:
+            time.sleep(mock.token_delay * len(words))
+            self.send_json(200, gemini_response(' '.join(words), prompt_tokens, len(words)))
+            return
+
+        # The REST stream is one JSON array, written an element per token
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for index, word in enumerate(words):
+            final = index == len(words) - 1
+            piece = json.dumps(gemini_response(
+                word + ('' if final else ' '), prompt_tokens, index + 1, final=final
+            ))
+            self.write_chunk(('[' if index == 0 else ',') + piece + (']' if final else ''))
+            if not final:
+                time.sleep(mock.token_delay)
+        self.wfile.write(b'0\r\n\r\n')
+
+    def write_chunk(self, text):
+        data = text.encode('utf-8')
+        self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+        self.wfile.flush()
+
+
+class FakeOrigin:
+    """Pages served by the fake origin, keyed by file name without .html"""
+
+    def __init__(self, latency, corpus_dir=CORPUS_DIR, seed=0):
+        self.latency = latency
+        self.pages = {path.stem: path.read_text(encoding='utf-8') for path in sorted(Path(corpus_dir).glob('*.html'))}
+        if not self.pages:
+            raise ValueError(f"No .html files in {corpus_dir}")
+        self.last_modified = formatdate(time.time(), usegmt=True)
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.not_modified = 0
+        self._lock = threading.Lock()
+
+    def page(self, name, version):
+        html = self.pages[name]
+        if version:
+            # Change the main text, not just the markup, so extracted content
+            # and therefore summary cache keys differ between versions
+            html = html.replace('<p>', f'<p>Revision {version}. ', 1)
+        return html.encode('utf-8')
+
+    def delay(self, not_modified=False):
+        with self._lock:
+            self.requests += 1
+            self.not_modified += not_modified
+            return self.latency.sample(self.rng)
+
+    def stats(self):
+        with self._lock:
+            return {'requests': self.requests, 'not_modified': self.not_modified}
+
+
+class FakeOriginHandler(MockHandler):
+    def do_GET(self):
+        origin = self.server.origin
+        parts = urlsplit(self.path)
+        name = parts.path.strip('/').removesuffix('.html')
+        if not name:
+            links = ''.join(f'<li><a href="/{page}.html">{page}</a></li>' for page in origin.pages)
+            self.send_body(200, f'<html><body><ul>{links}</ul></body></html>'.encode('utf-8'),
+                           'text/html; charset=utf-8')
+            return
+        if name not in origin.pages:
+            self.send_body(404, b'Not found', 'text/plain')
+            return
+
+        body = origin.page(name, parse_qs(parts.query).get('v', [''])[0])
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()[:16]
+        not_modified = self.headers.get('If-None-Match') == etag
+        time.sleep(origin.delay(not_modified))
+        headers = {'ETag': etag, 'Last-Modified': origin.last_modified, 'Cache-Control': 'max-age=0'}
+        if not_modified:
+            self.send_response(304)
+            for header, value in headers.items():
+                self.send_header(header, value)
+            self.end_headers()
+            return
+        self.send_body(200, body, 'text/html; charset=utf-8', headers)
+
+
+def serve(handler, port, host='127.0.0.1', verbose=False, **state):
+    """Bind a threaded server for handler with `state` attached to it"""
+    server = MockServer((host, port), handler)
+    server.verbose = verbose
+    for name, value in state.items():
+        setattr(server, name, value)
+    return server
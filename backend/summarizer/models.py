@@ -1,23 +1,71 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .fields import CompressedTextField
 
 class Summary(models.Model):
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    original_text = models.TextField()
-    summary_text = models.TextField()
+    original_text = CompressedTextField()
+    summary_text = CompressedTextField()
     source_url = models.URLField(blank=True, null=True)
     summary_type = models.CharField(
         max_length=10,
         choices=[('short', 'Short'), ('medium', 'Medium'), ('long', 'Long')],
         default='medium'
     )
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set when the object is built, not when it's inserted: completed
+    # summaries are written in batches by summarizer.persistence
+    created_at = models.DateTimeField(default=timezone.now)
+    # Async jobs are created with is_complete=False and flipped once the
+    # worker has either stored the summary or recorded the failure.
     is_complete = models.BooleanField(default=True)
+    status = models.CharField(
+        max_length=10,
+        choices=[
+            (STATUS_QUEUED, 'Queued'),
+            (STATUS_RUNNING, 'Running'),
+            (STATUS_COMPLETED, 'Completed'),
+            (STATUS_FAILED, 'Failed'),
+        ],
+        default=STATUS_COMPLETED
+    )
+    # When a worker moved the job to running; jobs running for longer than
+    # SUMMARY_JOB_STALE_SECONDS are taken to be orphaned and queued again
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    error_code = models.CharField(max_length=50, blank=True, default='')
+    error_message = models.TextField(blank=True, default='')
 
     def __str__(self):
         return f"Summary ({self.summary_type}) by {self.user.username}"
 
     class Meta:
         indexes = [
-            models.Index(fields=['user', 'created_at']),
-        ]
\ No newline at end of file
+            # History is listed newest first with (created_at, id) as cursor
+            models.Index(fields=['user', '-created_at', '-id'], name='summary_user_history_idx'),
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+class SummaryCacheEntry(models.Model):
+    key = models.CharField(max_length=64, unique=True)
+    summary_text = models.TextField()
+    version = models.CharField(max_length=32, db_index=True)
+    created_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"Cached summary {self.key[:12]} (v{self.version})"
+
+
+class RateLimitBucket(models.Model):
+    """Token bucket state for summarizer.ratelimit's database store"""
+    key = models.CharField(max_length=100, unique=True)
+    tokens = models.FloatField()
+    updated_at = models.FloatField()  # time.time() of the last refill
+
+    def __str__(self):
+        return f"Rate limit bucket {self.key} ({self.tokens:.0f} tokens)"
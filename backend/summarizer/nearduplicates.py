@@ -0,0 +1,258 @@
+# nearduplicates.py
+"""Reuse of summaries for almost identical texts.
+
+The summary cache only hits on the same words in the same order; the same
+article pasted with a tracking footer, or scraped again with a changed
+sidebar, misses it. Every text summarized here is therefore also indexed by
+its MinHash signature: the text's 3-word shingles are hashed once, and
+PERMUTATIONS universal hash functions are applied to all of them at once
+with NumPy, keeping the minimum of each. The share of equal minimums
+estimates the Jaccard similarity of two shingle sets.
+
+Signatures are found again with LSH: the signature is cut into BANDS bands
+and each band (salted with the summary type) is hashed to one 64-bit key.
+Texts sharing any key are candidates, so a lookup is one searchsorted over a
+sorted array of keys plus a comparison of a handful of signatures, whatever
+the number of stored texts. The best candidate of the same summary type
+whose estimated similarity reaches NEAR_DUPLICATE_THRESHOLD is reused.
+
+The index is per process and holds the NEAR_DUPLICATE_MAX_ENTRIES most
+recent texts (about 900 bytes each plus the summary). Keys of texts added
+since the last merge are kept in a dict; once there are enough of them
+they are sorted and merged into the array in one pass, which also drops the
+keys of overwritten entries.
+"""
+import threading
+
+import numpy as np
+from django.conf import settings
+
+from .extractive import WORD
+from .metrics import timed
+
+PERMUTATIONS = 128
+BANDS = 16
+ROWS = PERMUTATIONS // BANDS
+SHINGLE_WORDS = 3
+
+# Shingles hashed per step into a per-thread (BLOCK_SHINGLES x PERMUTATIONS)
+# buffer; allocating the matrix afresh for every text costs more than the hashing
+BLOCK_SHINGLES = 1024
+
+# Waiting keys are merged once this many texts (or 1/64 of the index) are waiting
+MIN_MERGE = 1024
+
+_random = np.random.default_rng(0x6e656172)
+MULTIPLIERS = _random.integers(0, 2**64, size=PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+OFFSETS = _random.integers(0, 2**64, size=PERMUTATIONS, dtype=np.uint64)
+SHINGLE_MIX = _random.integers(0, 2**64, size=SHINGLE_WORDS, dtype=np.uint64) | np.uint64(1)
+BAND_MIX = _random.integers(0, 2**64, size=ROWS, dtype=np.uint64) | np.uint64(1)
+BAND_SALTS = _random.integers(0, 2**64, size=BANDS, dtype=np.uint64)
+
+
+def shingle_hashes(text):
+    """64-bit hashes of the 3-word shingles of text (case and punctuation ignored).
+
+    Repeated shingles are left in: they can't change a minimum. Words are
+    hashed with hash(), which is salted per process, so signatures can only
+    be compared within one process.
+    """
+    words = WORD.findall(text.lower())
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    hashes = np.fromiter(map(hash, words), dtype=np.int64, count=len(words)).view(np.uint64)
+    width = min(SHINGLE_WORDS, len(hashes))
+    count = len(hashes) - width + 1
+    shingles = np.zeros(count, dtype=np.uint64)
+    for offset in range(width):
+        shingles = (shingles ^ hashes[offset:offset + count]) * SHINGLE_MIX[offset]
+    return shingles
+
+
+_local = threading.local()
+
+
+def signature(text):
+    """MinHash signature of text (PERMUTATIONS uint32), or None if it has no words"""
+    shingles = shingle_hashes(text)
+    if not len(shingles):
+        return None
+    buffer = getattr(_local, 'buffer', None)
+    if buffer is None:
+        buffer = _local.buffer = np.empty((BLOCK_SHINGLES, PERMUTATIONS), dtype=np.uint64)
+    minimum = np.full(PERMUTATIONS, np.iinfo(np.uint64).max, dtype=np.uint64)
+    for start in range(0, len(shingles), BLOCK_SHINGLES):
+        block = shingles[start:start + BLOCK_SHINGLES]
+        hashed = buffer[:len(block)]
+        np.multiply(block[:, None], MULTIPLIERS, out=hashed)
+        np.add(hashed, OFFSETS, out=hashed)
+        np.minimum(minimum, hashed.min(axis=0), out=minimum)
+    # The high half of a multiply-add hash is the well-mixed one
+    return (minimum >> np.uint64(32)).astype(np.uint32)
+
+
+def band_keys(sig, type_salt):
+    """One 64-bit LSH key per band of sig"""
+    keys = (sig.reshape(BANDS, ROWS).astype(np.uint64) * BAND_MIX).sum(axis=1, dtype=np.uint64)
+    keys ^= BAND_SALTS ^ np.uint64(type_salt)
+    # splitmix64 finalizer
+    keys ^= keys >> np.uint64(30)
+    keys *= np.uint64(0xbf58476d1ce4e5b9)
+    keys ^= keys >> np.uint64(27)
+    keys *= np.uint64(0x94d049bb133111eb)
+    keys ^= keys >> np.uint64(31)
+    return keys
+
+
+class NearDuplicateIndex:
+    """Bounded, thread-safe MinHash/LSH index of summarized texts"""
+
+    def __init__(self, threshold=0.9, max_entries=100000):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._types = {}        # summary_type -> code
+        self._signatures = np.empty((0, PERMUTATIONS), dtype=np.uint32)
+        self._keys = np.empty((0, BANDS), dtype=np.uint64)
+        self._type_codes = np.empty(0, dtype=np.int16)
+        self._summaries = []
+        self._count = 0
+        self._next = 0          # slot written next; wraps around when full
+        self._sorted_keys = np.empty(0, dtype=np.uint64)
+        self._sorted_slots = np.empty(0, dtype=np.int32)
+        self._sorted_bands = np.empty(0, dtype=np.uint8)
+        self._recent = {}       # key -> slots added since the last merge
+        self._waiting = []      # those slots
+        self._overwritten = False
+        self.lookups = 0
+        self.hits = 0
+        self.added = 0
+        self.merges = 0
+
+    @property
+    def enabled(self):
+        return self.threshold > 0 and self.max_entries > 0
+
+    def _type_code(self, summary_type):
+        code = self._types.get(summary_type)
+        if code is None:
+            code = self._types[summary_type] = len(self._types)
+        return code
+
+    def _candidates(self, keys):
+        lefts = np.searchsorted(self._sorted_keys, keys, side='left')
+        rights = np.searchsorted(self._sorted_keys, keys, side='right')
+        parts = [self._sorted_slots[left:right] for left, right in zip(lefts.tolist(), rights.tolist()) if right > left]
+        for key in keys.tolist():
+            slots = self._recent.get(key)
+            if slots:
+                parts.append(np.array(slots, dtype=np.int64))
+        if not parts:
+            return None
+        return np.unique(np.concatenate(parts))
+
+    def get(self, text, summary_type):
+        """Summary of the most similar indexed text of summary_type, or None"""
+        if not self.enabled:
+            return None
+        with timed('near_duplicate'):
+            sig = signature(text)
+            with self._lock:
+                self.lookups += 1
+                code = self._types.get(summary_type)
+                if sig is None or code is None:
+                    return None
+                candidates = self._candidates(band_keys(sig, code))
+                if candidates is None:
+                    return None
+                candidates = candidates[self._type_codes[candidates] == code]
+                if not len(candidates):
+                    return None
+                similarity = (self._signatures[candidates] == sig).mean(axis=1)
+                best = int(similarity.argmax())
+                if similarity[best] < self.threshold:
+                    return None
+                self.hits += 1
+                return self._summaries[candidates[best]]
+
+    def add(self, text, summary_type, summary):
+        if not self.enabled:
+            return
+        sig = signature(text)
+        if sig is None:
+            return
+        with self._lock:
+            code = self._type_code(summary_type)
+            keys = band_keys(sig, code)
+            slot = self._next
+            if slot == len(self._signatures):
+                self._grow()
+            self._signatures[slot] = sig
+            self._keys[slot] = keys
+            self._type_codes[slot] = code
+            if slot < len(self._summaries):
+                # Overwrites the oldest entry; until the next merge its old
+                # keys can still find the slot, and fail verification
+                self._summaries[slot] = summary
+                self._overwritten = True
+            else:
+                self._summaries.append(summary)
+            self._count = max(self._count, slot + 1)
+            self._next = (slot + 1) % self.max_entries
+            for key in keys.tolist():
+                self._recent.setdefault(key, []).append(slot)
+            self._waiting.append(slot)
+            self.added += 1
+            if len(self._waiting) >= max(MIN_MERGE, self._count // 64):
+                self._merge()
+
+    def _grow(self):
+        size = min(self.max_entries, max(1024, 2 * len(self._signatures)))
+        for name in ('_signatures', '_keys', '_type_codes'):
+            old = getattr(self, name)
+            new = np.empty((size,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _merge(self):
+        keys, slots, bands = self._sorted_keys, self._sorted_slots, self._sorted_bands
+        if self._overwritten:
+            current = self._keys[slots, bands] == keys
+            keys, slots, bands = keys[current], slots[current], bands[current]
+        waiting = np.unique(np.array(self._waiting, dtype=np.int32))
+        new_keys = self._keys[waiting].ravel()
+        order = np.argsort(new_keys)
+        new_keys = new_keys[order]
+        positions = np.searchsorted(keys, new_keys)
+        self._sorted_keys = np.insert(keys, positions, new_keys)
+        self._sorted_slots = np.insert(slots, positions, np.repeat(waiting, BANDS)[order])
+        self._sorted_bands = np.insert(bands, positions, np.tile(np.arange(BANDS, dtype=np.uint8), len(waiting))[order])
+        self._recent = {}
+        self._waiting = []
+        self._overwritten = False
+        self.merges += 1
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'entries': self._count,
+                'lookups': self.lookups,
+                'hits': self.hits,
+                'hit_rate': self.hits / self.lookups if self.lookups else 0.0,
+                'added': self.added,
+                'merges': self.merges,
+            }
+
+
+near_duplicates = NearDuplicateIndex(
+    threshold=getattr(settings, 'NEAR_DUPLICATE_THRESHOLD', 0.9),
+    max_entries=getattr(settings, 'NEAR_DUPLICATE_MAX_ENTRIES', 100000),
+)
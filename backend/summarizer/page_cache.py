@@ -0,0 +1,141 @@
+# page_cache.py
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from django.conf import settings
+
+from .singleflight import build_flight
+
+TRACKING_PARAMS = frozenset(['fbclid', 'gclid', 'dclid', 'msclkid', 'mc_cid', 'mc_eid', 'igshid', 'ref_src'])
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def canonicalize_url(url):
+    """Normalize a URL so that trivially different links share a cache entry.
+
+    Lower-cases scheme and host, drops default ports, fragments and common
+    tracking parameters (utm_*, fbclid, ...) and sorts the query string.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_') and key.lower() not in TRACKING_PARAMS
+    )
+    return urlunsplit((scheme, host, parts.path or '/', urlencode(query), ''))
+
+
+class CachedPage:
+    __slots__ = ('content', 'etag', 'last_modified', 'stored_at')
+
+    def __init__(self, content, etag=None, last_modified=None):
+        self.content = content
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = time.monotonic()
+
+    @property
+    def size(self):
+        return len(self.content)
+
+    @property
+    def revalidatable(self):
+        return bool(self.etag or self.last_modified)
+
+    def conditional_headers(self):
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class PageCache:
+    """In-process LRU of extracted page text, bounded by total characters.
+
+    Entries younger than `ttl` are served without touching the network.
+    Older entries are kept (until evicted) if the origin sent an ETag or
+    Last-Modified, so the next fetch can revalidate them with a conditional
+    request and skip the download and parse on a 304.
+    """
+
+    def __init__(self, max_chars=50_000_000, ttl=600):
+        self.max_chars = max_chars
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    def lookup(self, key):
+        """Return (entry, fresh); entry is None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, False
+            fresh = time.monotonic() - entry.stored_at < self.ttl
+            if not fresh and not entry.revalidatable:
+                self._remove(key)
+                self.misses += 1
+                return None, False
+            self._entries.move_to_end(key)
+            if fresh:
+                self.hits += 1
+            return entry, fresh
+
+    def store(self, key, content, etag=None, last_modified=None):
+        entry = CachedPage(content, etag, last_modified)
+        if entry.size > self.max_chars:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._size += entry.size
+            while self._size > self.max_chars:
+                self._remove(next(iter(self._entries)))
+
+    def refresh(self, key):
+        """Origin answered 304: the cached copy is fresh again"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.stored_at = time.monotonic()
+                self.revalidated += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._size -= entry.size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'chars': self._size,
+                'hits': self.hits,
+                'revalidated': self.revalidated,
+                'misses': self.misses,
+            }
+
+
+page_cache = PageCache(
+    max_chars=getattr(settings, 'PAGE_CACHE_MAX_CHARS', 50_000_000),
+    ttl=getattr(settings, 'PAGE_CACHE_TTL', 600),
+)
+
+# Concurrent fetches of one canonical URL share a single download
+page_flight = build_flight('page', timeout=getattr(settings, 'FETCH_COALESCE_TIMEOUT_SECONDS', 30))
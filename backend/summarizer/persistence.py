@@ -0,0 +1,274 @@
+# persistence.py
+"""Write-behind persistence of completed summaries.
+
+Views hand finished Summary objects to `summary_writer` instead of saving
+them, so a response never waits on the database (or on SQLite's write lock).
+A background thread inserts the buffered rows with bulk_create once
+SUMMARY_WRITE_BATCH rows are waiting or SUMMARY_WRITE_INTERVAL_SECONDS have
+passed, and the remaining rows are flushed when the process exits.
+
+Rows that can't be written - the database is down or locked, or more than
+SUMMARY_WRITE_MAX_PENDING rows are waiting - are appended to the JSON-lines
+spool file at SUMMARY_SPOOL_PATH and inserted on a later flush (or with
+`manage.py flush_summary_spool`). Only rows still in memory when a process
+is killed outright are lost, i.e. at most one flush interval's worth.
+
+With SUMMARY_WRITE_MODE=sync there is no writer thread: rows are saved
+during the request, and the first save that succeeds while the spool has
+rows starts a thread that replays them.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, close_old_connections, connections
+
+from .metrics import timed
+from .models import Summary
+
+logger = logging.getLogger(__name__)
+
+
+def record_fields(record):
+    """Summary fields as strings for the spool file"""
+    return {
+        field.attname: field.value_to_string(record)
+        for field in Summary._meta.concrete_fields
+        if not field.primary_key and getattr(record, field.attname) is not None
+    }
+
+
+def record_from_fields(fields):
+    return Summary(**{name: Summary._meta.get_field(name).to_python(value) for name, value in fields.items()})
+
+
+class SummarySpool:
+    """Append-only JSON-lines file of rows waiting to be inserted"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+
+    def append(self, records):
+        lines = ''.join(json.dumps(record_fields(record)) + '\n' for record in records)
+        with self._lock:
+            # One O_APPEND write per batch, so lines from several processes
+            # don't interleave
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                os.write(fd, lines.encode('utf-8'))
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def pending(self):
+        return os.path.exists(self.path)
+
+    def claim(self):
+        """Take the spooled rows out of the file; None if there are none.
+
+        The file is renamed first, so when several workers replay at once
+        each row is claimed by exactly one of them.
+        """
+        claimed = f'{self.path}.{os.getpid()}.{threading.get_ident()}'
+        try:
+            os.replace(self.path, claimed)
+        except FileNotFoundError:
+            return None
+        records = []
+        with open(claimed, encoding='utf-8') as spool:
+            for line in spool:
+                try:
+                    records.append(record_from_fields(json.loads(line)))
+                except (ValueError, ValidationError) as e:
+                    # e.g. a line cut short by a crash mid-write
+                    logger.error(f"Skipping unreadable spooled summary: {str(e)}")
+        os.remove(claimed)
+        return records
+
+
+class SummaryWriter:
+    def __init__(self, spool, batch_size=100, interval=1.0, max_pending=10000, write_behind=True):
+        self.spool = spool
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_pending = max_pending
+        self.write_behind = write_behind
+        self._pending = []
+        self._condition = threading.Condition()
+        self._thread = None
+        self._replay_thread = None
+        self._pid = None
+        self._stopping = False
+        self.written = 0
+        self.batches = 0
+        self.spooled = 0
+        self.dropped = 0
+
+    def add(self, records):
+        """Queue unsaved Summary objects for insertion"""
+        if not self.write_behind:
+            if self.write(records) and self.spool.pending():
+                self._replay_in_background()
+            return
+        overflow = []
+        with self._condition:
+            self._ensure_thread()
+            room = max(self.max_pending - len(self._pending), 0)
+            self._pending.extend(records[:room])
+            overflow = records[room:]
+            if len(self._pending) >= self.batch_size:
+                self._condition.notify()
+        if overflow:
+            self._spool(overflow)
+
+    def _ensure_thread(self):
+        # A forked worker inherits the parent's writer but not its thread
+        if self._thread is None or self._pid != os.getpid():
+            self._pending = []
+            self._stopping = False
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='summary-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._stopping or len(self._pending) >= self.batch_size,
+                    timeout=self.interval,
+                )
+                batch, self._pending = self._pending, []
+                stopping = self._stopping
+            if batch or self.spool.pending():
+                close_old_connections()
+            if batch:
+                self.write(batch)
+            if not stopping and self.spool.pending():
+                self.replay()
+            if stopping:
+                return
+
+    def write(self, records):
+        """Insert records now; rows that can't be written are spooled.
+
+        Returns False if the database refused the batch outright.
+        """
+        try:
+            with timed('db_write'):
+                Summary.objects.bulk_create(records)
+        except IntegrityError:
+            # Usually a user deleted since the summary was made; keep the rest
+            self._write_each(records)
+            return True
+        except Exception as e:
+            logger.error(f"Database save failed: {str(e)}")
+            self._spool(records)
+            return False
+        with self._condition:
+            self.written += len(records)
+            self.batches += 1
+        return True
+
+    def _write_each(self, records):
+        for record in records:
+            record.pk = None
+            try:
+                with timed('db_write'):
+                    record.save(force_insert=True)
+            except IntegrityError as e:
+                logger.error(f"Dropping summary that can't be saved: {str(e)}")
+                with self._condition:
+                    self.dropped += 1
+                continue
+            except Exception as e:
+                logger.error(f"Database save failed: {str(e)}")
+                self._spool([record])
+                continue
+            with self._condition:
+                self.written += 1
+
+    def _spool(self, records):
+        try:
+            self.spool.append(records)
+        except OSError as e:
+            logger.error(f"Summary spool write failed, {len(records)} summaries lost: {str(e)}")
+            with self._condition:
+                self.dropped += len(records)
+            return
+        with self._condition:
+            self.spooled += len(records)
+
+    def replay(self):
+        """Insert spooled rows; returns how many were claimed from the spool"""
+        try:
+            records = self.spool.claim()
+        except OSError as e:
+            logger.error(f"Summary spool replay failed: {str(e)}")
+            return 0
+        if not records:
+            return 0
+        for start in range(0, len(records), self.batch_size):
+            self.write(records[start:start + self.batch_size])
+        return len(records)
+
+    def _replay_in_background(self):
+        # Sync mode has no writer thread, and a request shouldn't wait for
+        # the whole spool
+        with self._condition:
+            if self._replay_thread is not None and self._replay_thread.is_alive():
+                return
+            self._replay_thread = threading.Thread(
+                target=self._replay_and_close, name='summary-spool-replay', daemon=True
+            )
+            self._replay_thread.start()
+
+    def _replay_and_close(self):
+        try:
+            self.replay()
+        finally:
+            connections.close_all()
+
+    def flush(self):
+        """Write everything buffered in this process now"""
+        with self._condition:
+            batch, self._pending = self._pending, []
+        if batch:
+            self.write(batch)
+
+    def close(self, timeout=10.0):
+        """Stop the background thread after a final flush"""
+        with self._condition:
+            thread = self._thread if self._pid == os.getpid() else None
+            replay_thread = self._replay_thread
+            self._stopping = True
+            self._condition.notify()
+        if thread is not None:
+            thread.join(timeout)
+        if replay_thread is not None:
+            replay_thread.join(timeout)
+        self.flush()
+
+    def stats(self):
+        with self._condition:
+            return {
+                'pending': len(self._pending),
+                'written': self.written,
+                'batches': self.batches,
+                'spooled': self.spooled,
+                'dropped': self.dropped,
+            }
+
+
+summary_writer = SummaryWriter(
+    SummarySpool(getattr(settings, 'SUMMARY_SPOOL_PATH', settings.BASE_DIR / 'summary_spool.jsonl')),
+    batch_size=getattr(settings, 'SUMMARY_WRITE_BATCH', 100),
+    interval=getattr(settings, 'SUMMARY_WRITE_INTERVAL_SECONDS', 1.0),
+    max_pending=getattr(settings, 'SUMMARY_WRITE_MAX_PENDING', 10000),
+    write_behind=getattr(settings, 'SUMMARY_WRITE_MODE', 'behind') == 'behind',
+)
+atexit.register(summary_writer.close)
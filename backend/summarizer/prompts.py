@@ -0,0 +1,190 @@
+# prompts.py
+"""Prompt building for Gemini calls.
+
+A prompt is a short instruction block followed by the content. The blocks
+are rendered once per summary type when this module is imported, so a
+request only concatenates strings. The templates, budgets and
+TEMPLATE_VERSION are part of the summary cache key; bump the version when
+a change to pruning alters what is sent.
+
+Before it is sent, content is pruned: whitespace runs are collapsed, short
+lines of site furniture (cookie notices, "Share this article", newsletter
+prompts...) are dropped, and so are sentences repeated word for word, as
+scraped pages often carry a standfirst or pull quote twice. What remains is
+held to the input budget of the summary type: past it, the most central
+sentences (see extractive.py) that fit are kept, in their original order,
+and the sentences dropped are logged. Text is only sent whole up to
+single_pass_chars() of its type, which keeps the input budget of ASCII text;
+longer text is map-reduced first (see chunking.py), so the budget only cuts
+text of scripts that take more tokens per character. The output budget plus
+GEMINI_OUTPUT_TOKEN_RESERVE for thinking tokens becomes the call's
+max_output_tokens.
+
+Token counts are a local estimate (about four characters of ASCII or one
+and a half of other scripts per token), not Gemini's tokenizer; budgets
+leave room for the difference.
+"""
+import logging
+import math
+import re
+from collections import namedtuple
+
+import numpy as np
+from django.conf import settings
+
+from .chunking import PARAGRAPH_BREAK
+from .extractive import SENTENCE_END, sentence_scores, split_sentences
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_VERSION = 3
+
+# `words` is the length asked for; `input_tokens` caps the content sent
+PromptBudget = namedtuple('PromptBudget', ['words', 'input_tokens'])
+
+SUMMARY_BUDGETS = {
+    'short': PromptBudget(60, 3000),
+    'medium': PromptBudget(150, 6000),
+    'long': PromptBudget(350, 12000),
+    'chunk': PromptBudget(250, 6000),
+}
+
+LENGTHS = {
+    'short': 'at most 60 words, in two or three sentences',
+    'medium': 'at most 150 words, in one or two paragraphs',
+    'long': 'at most 350 words, in several paragraphs',
+}
+
+SUMMARY_TEMPLATE = """You are KipaSum, a professional summarizer developed by Kidus Shimelis.
+Write a {summary_type} summary of the content below, {length}.
+- Keep the critical facts, key concepts, technical terms, proper nouns and figures; add nothing
+- Clear, grammatical, professional prose in complete sentences, most important points first
+- Same language as the content; leave out examples and repetition unless essential
+
+Original Content:
+"""
+
+# Used for the map step of long documents: each section is condensed on its
+# own and the partial summaries are then summarized with SUMMARY_TEMPLATE.
+CHUNK_TEMPLATE = """You are KipaSum, a professional summarizer developed by Kidus Shimelis.
+This is one section of a longer document. Condense it to at most {words} words, to be merged with the summaries of the other sections:
+- Keep every key fact, argument, name, number and date
+- No introduction or conclusion
+- Same language as the section
+
+Section Content:
+"""
+
+CHUNK_SUMMARY_TYPE = 'chunk'
+
+# Tokens per word of output, with room for languages that need more
+OUTPUT_TOKENS_PER_WORD = 2.0
+
+HEADERS = {
+    summary_type: CHUNK_TEMPLATE.format(words=SUMMARY_BUDGETS[summary_type].words)
+    if summary_type == CHUNK_SUMMARY_TYPE
+    else SUMMARY_TEMPLATE.format(summary_type=summary_type, length=LENGTHS[summary_type])
+    for summary_type in SUMMARY_BUDGETS
+}
+
+# Everything a change to the prompts must invalidate
+TEMPLATE_SOURCE = f"{TEMPLATE_VERSION}\n{SUMMARY_TEMPLATE}\n{CHUNK_TEMPLATE}\n{sorted(SUMMARY_BUDGETS.items())}"
+
+NON_ASCII = re.compile(r'[^\x00-\x7f]')
+
+# Lines of at most BOILERPLATE_MAX_WORDS words that match are dropped
+BOILERPLATE_MAX_WORDS = 15
+BOILERPLATE = re.compile(
+    r'^(?:advertisement|sponsored|skip to (?:main )?content|share (?:this|on)\b|follow us\b|click here\b'
+    r'|read (?:more|next)\b|related (?:articles|stories|posts)\b|print this\b|back to top\b)'
+    r'|\b(?:sign up|subscribe)\b.*\bnewsletter|all rights reserved|^(?:copyright|©)'
+    r'|\b(?:we use|accept(?: all)?) cookies|\bcookie (?:policy|settings)\b|^(?:privacy policy|terms of (?:use|service))\b',
+    re.IGNORECASE,
+)
+
+Prompt = namedtuple('Prompt', ['text', 'max_output_tokens', 'content_tokens', 'sent_tokens'])
+
+
+def estimate_tokens(text):
+    if text.isascii():
+        return math.ceil(len(text) / 4)
+    other = len(NON_ASCII.findall(text))
+    return math.ceil((len(text) - other) / 4 + other / 1.5)
+
+
+def is_boilerplate(line):
+    return len(line.split()) <= BOILERPLATE_MAX_WORDS and BOILERPLATE.search(line) is not None
+
+
+def prune(text):
+    """text without boilerplate lines, repeated sentences and extra whitespace"""
+    seen = set()
+    paragraphs = []
+    for paragraph in PARAGRAPH_BREAK.split(text):
+        lines = []
+        for line in paragraph.splitlines():
+            line = ' '.join(line.split())
+            if not line or is_boilerplate(line):
+                continue
+            sentences = []
+            for sentence in SENTENCE_END.split(line):
+                key = sentence.lower()
+                # Short ones ("Yes.", "Why?") may well be repeated on purpose
+                if key in seen and len(key.split()) >= 3:
+                    continue
+                seen.add(key)
+                sentences.append(sentence)
+            if sentences:
+                lines.append(' '.join(sentences))
+        if lines:
+            paragraphs.append('\n'.join(lines))
+    return '\n\n'.join(paragraphs)
+
+
+def fit_to_budget(text, max_tokens):
+    """The most central sentences of text that fit in max_tokens, in order.
+
+    Text that can't be split into sentences is cut off instead.
+    """
+    sentences = split_sentences(text)
+    chosen, used = [], 0
+    if len(sentences) > 1:
+        for index in np.argsort(-sentence_scores(sentences), kind='stable').tolist():
+            cost = estimate_tokens(sentences[index]) + 1
+            if used + cost <= max_tokens:
+                chosen.append(index)
+                used += cost
+    if not chosen:
+        logger.warning("Prompt budget of %d tokens: cut %d characters of unsplittable text to %d",
+                       max_tokens, len(text), max_tokens * 4)
+        return text[:max_tokens * 4]
+    logger.warning("Prompt budget of %d tokens: dropped %d of %d sentences",
+                   max_tokens, len(sentences) - len(chosen), len(sentences))
+    return ' '.join(sentences[index] for index in sorted(chosen))
+
+
+def budget_for(summary_type):
+    return SUMMARY_BUDGETS.get(summary_type, SUMMARY_BUDGETS['medium'])
+
+
+def single_pass_chars(summary_type):
+    """Longest text of summary_type sent in one call; longer text is map-reduced"""
+    # Four characters per token: ASCII text this long fits the input budget
+    return min(getattr(settings, 'SUMMARY_SINGLE_PASS_CHARS', 15000), budget_for(summary_type).input_tokens * 4)
+
+
+def make_prompt(text, summary_type):
+    """Prompt for a summary of text: instructions plus the pruned, budgeted content"""
+    budget = budget_for(summary_type)
+    header = HEADERS.get(summary_type, HEADERS['medium'])
+    content_tokens = estimate_tokens(text)
+    if getattr(settings, 'PROMPT_PRUNE', True):
+        text = prune(text)
+    if estimate_tokens(text) > budget.input_tokens:
+        text = fit_to_budget(text, budget.input_tokens)
+    prompt = header + text
+    # gemini-2.5 models count thinking tokens against max_output_tokens, and
+    # google.generativeai can't cap thinking separately
+    max_output_tokens = (math.ceil(budget.words * OUTPUT_TOKENS_PER_WORD)
+                         + getattr(settings, 'GEMINI_OUTPUT_TOKEN_RESERVE', 2048))
+    return Prompt(prompt, max_output_tokens, content_tokens, estimate_tokens(prompt))
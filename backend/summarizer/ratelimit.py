@@ -0,0 +1,172 @@
+# ratelimit.py
+"""Admission control for Gemini calls.
+
+Every summary that misses the cache is charged its input length against two
+token buckets, one for the user and one shared by everybody, before Gemini
+is called. When either bucket is short the request is refused immediately
+with the time until enough budget refills, instead of queueing up retries
+against an exhausted upstream quota.
+
+The `local` store keeps buckets in process memory. The `database` store
+keeps them in the RateLimitBucket table and updates them with a single
+conditional UPDATE, so all workers share one budget; every charge is a
+write, which SQLite serializes, so it is meant for PostgreSQL.
+"""
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import F, Value
+from django.db.models.functions import Least
+from django.db.models.lookups import GreaterThanOrEqual
+
+from .models import RateLimitBucket
+
+GLOBAL_BUCKET = 'global'
+
+
+class RateLimited(Exception):
+    def __init__(self, scope, retry_after):
+        super().__init__(f"Rate limit exceeded ({scope}); retry in {retry_after:.1f}s")
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+class LocalBucketStore:
+    """Buckets in this process only; every worker gets its own budget"""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, cost, capacity, rate):
+        """Take cost tokens; returns 0 on success or seconds until they'd be available"""
+        now = time.time()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            return (cost - tokens) / rate
+
+    def refund(self, key, cost, capacity):
+        with self._lock:
+            if key in self._buckets:
+                tokens, updated_at = self._buckets[key]
+                self._buckets[key] = (min(capacity, tokens + cost), updated_at)
+
+
+class DatabaseBucketStore:
+    """Buckets in the RateLimitBucket table, shared by all workers"""
+
+    def take(self, key, cost, capacity, rate):
+        now = time.time()
+        refilled = Least(
+            Value(float(capacity)),
+            F('tokens') + (Value(now) - F('updated_at')) * Value(float(rate)),
+        )
+        # Refill and spend in one statement so concurrent workers can't
+        # both spend the same tokens
+        for _ in range(2):
+            taken = RateLimitBucket.objects.filter(
+                GreaterThanOrEqual(refilled, float(cost)), key=key
+            ).update(tokens=refilled - cost, updated_at=now)
+            if taken:
+                return 0.0
+
+            bucket = RateLimitBucket.objects.filter(key=key).values('tokens', 'updated_at').first()
+            if bucket is not None:
+                tokens = min(capacity, bucket['tokens'] + (now - bucket['updated_at']) * rate)
+                return (cost - tokens) / rate
+            try:
+                RateLimitBucket.objects.create(key=key, tokens=capacity - cost, updated_at=now)
+                return 0.0
+            except IntegrityError:
+                continue  # another worker created it first; spend from theirs
+        return 1.0 / rate
+
+    def refund(self, key, cost, capacity):
+        RateLimitBucket.objects.filter(key=key).update(
+            tokens=Least(Value(float(capacity)), F('tokens') + float(cost))
+        )
+
+
+STORES = {
+    'local': LocalBucketStore,
+    'database': DatabaseBucketStore,
+}
+
+
+class RateLimiter:
+    """Per-user and global token buckets measured in input characters"""
+
+    def __init__(self, store, user_capacity, user_rate, global_capacity, global_rate):
+        self.store = store
+        self.user_capacity = user_capacity
+        self.user_rate = user_rate
+        self.global_capacity = global_capacity
+        self.global_rate = global_rate
+        self.admitted = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def buckets(self, user_id):
+        if user_id is not None and self.user_capacity > 0 and self.user_rate > 0:
+            yield 'user', f'user:{user_id}', self.user_capacity, self.user_rate
+        if self.global_capacity > 0 and self.global_rate > 0:
+            yield 'global', GLOBAL_BUCKET, self.global_capacity, self.global_rate
+
+    def acquire(self, user_id, chars):
+        """Charge chars to the user's and the global bucket or raise RateLimited.
+
+        A request bigger than a bucket costs the whole bucket, so it is
+        admitted only when that bucket is full rather than never.
+        """
+        taken = []
+        for scope, key, capacity, rate in self.buckets(user_id):
+            cost = min(chars, capacity)
+            wait = self.store.take(key, cost, capacity, rate)
+            if wait > 0:
+                for taken_key, taken_cost, taken_capacity in taken:
+                    self.store.refund(taken_key, taken_cost, taken_capacity)
+                with self._lock:
+                    self.rejected += 1
+                raise RateLimited(scope, wait)
+            taken.append((key, cost, capacity))
+        with self._lock:
+            self.admitted += 1
+
+    def stats(self):
+        return {'admitted': self.admitted, 'rejected': self.rejected}
+
+
+def build_limiter():
+    name = getattr(settings, 'RATE_LIMIT_BACKEND', 'local')
+    if name not in STORES:
+        raise ValueError(f"Unknown rate limit backend: {name}")
+    return RateLimiter(
+        STORES[name](),
+        user_capacity=getattr(settings, 'RATE_LIMIT_USER_BURST_CHARS', 500000),
+        user_rate=getattr(settings, 'RATE_LIMIT_USER_CHARS_PER_MINUTE', 200000) / 60,
+        global_capacity=getattr(settings, 'RATE_LIMIT_GLOBAL_BURST_CHARS', 2000000),
+        global_rate=getattr(settings, 'RATE_LIMIT_GLOBAL_CHARS_PER_MINUTE', 2000000) / 60,
+    )
+
+
+rate_limiter = build_limiter()
+
+
+def admit(user, chars):
+    """Charge a Gemini call on chars of input to user; raises RateLimited"""
+    rate_limiter.acquire(getattr(user, 'pk', None), chars)
+
+
+def retry_after_headers(payload):
+    """Retry-After header for an error payload that carries retry_after, else None"""
+    if "retry_after" not in payload:
+        return None
+    return {"Retry-After": str(max(1, math.ceil(payload["retry_after"])))}
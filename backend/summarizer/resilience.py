@@ -0,0 +1,224 @@
+# resilience.py
+"""Circuit breaker and adaptive concurrency limit for upstream calls.
+
+Both are process-wide and wrap each individual Gemini request through
+CallGuard:
+
+- CircuitBreaker opens after `failure_threshold` consecutive failures and
+  then rejects calls immediately for `reset_timeout` seconds. After that a
+  single probe call is let through (half-open); its outcome closes or
+  re-opens the circuit.
+- AdaptiveLimiter caps in-flight calls with AIMD: each fast success raises
+  the limit by 1/limit (about +1 per round of calls), a failure or a call
+  slower than `latency_target` multiplies it by `backoff`.
+"""
+import asyncio
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Numeric form for metrics
+STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpen(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Circuit open; retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class Overloaded(Exception):
+    def __init__(self, limit, retry_after=1.0):
+        super().__init__(f"Concurrency limit of {limit} calls reached")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.times_opened = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpen unless a call may go ahead now"""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if self.state == OPEN and remaining <= 0:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return
+            self.rejected += 1
+            raise CircuitOpen(max(remaining, 0.0))
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.probe_in_flight = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.times_opened += 1
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def cancel(self):
+        """The call never reached upstream; free the half-open probe slot"""
+        with self._lock:
+            self.probe_in_flight = False
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'state_code': STATE_CODES[self.state],
+                'consecutive_failures': self.failures,
+                'times_opened': self.times_opened,
+                'rejected': self.rejected,
+            }
+
+
+class AdaptiveLimiter:
+    def __init__(self, initial=8, minimum=1, maximum=64, latency_target=20.0,
+                 backoff=0.7, queue_timeout=2.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.rejected = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def _try_acquire(self):
+        if self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return True
+        return False
+
+    def acquire(self):
+        """Take a slot, waiting up to queue_timeout; raises Overloaded"""
+        with self._condition:
+            if self._condition.wait_for(self._try_acquire, timeout=self.queue_timeout):
+                return
+            self.rejected += 1
+            raise Overloaded(int(self.limit))
+
+    async def aacquire(self):
+        # Polls instead of blocking the event loop on the condition
+        deadline = time.monotonic() + self.queue_timeout
+        while True:
+            with self._condition:
+                if self._try_acquire():
+                    return
+                if time.monotonic() >= deadline:
+                    self.rejected += 1
+                    raise Overloaded(int(self.limit))
+            await asyncio.sleep(0.02)
+
+    def release(self, latency=None, failed=False):
+        """Free a slot and adapt the limit; latency None means no signal"""
+        with self._condition:
+            self.in_flight -= 1
+            if latency is not None:
+                now = time.monotonic()
+                if failed or latency > self.latency_target:
+                    # One decrease per latency window, so a burst of calls
+                    # failing together doesn't collapse the limit to minimum
+                    if now - self._last_decrease >= min(latency, self.latency_target):
+                        self.limit = max(self.minimum, self.limit * self.backoff)
+                        self._last_decrease = now
+                else:
+                    self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._condition.notify()
+
+    def stats(self):
+        with self._condition:
+            return {
+                'limit': int(self.limit),
+                'in_flight': self.in_flight,
+                'rejected': self.rejected,
+            }
+
+
+class CallGuard:
+    """Runs calls through a CircuitBreaker and an AdaptiveLimiter.
+
+    `is_failure(exc)` decides which exceptions count against upstream health;
+    errors caused by the input (content filters, bad requests) do not.
+    """
+
+    def __init__(self, breaker, limiter, is_failure):
+        self.breaker = breaker
+        self.limiter = limiter
+        self.is_failure = is_failure
+
+    def call(self):
+        return GuardedCall(self)
+
+    def stats(self):
+        return {'breaker': self.breaker.stats(), 'concurrency': self.limiter.stats()}
+
+
+class GuardedCall:
+    """One guarded call; usable with `with` or `async with`"""
+
+    def __init__(self, guard):
+        self.guard = guard
+        self.started = None
+
+    def __enter__(self):
+        self.guard.breaker.before_call()
+        try:
+            self.guard.limiter.acquire()
+        except Overloaded:
+            self.guard.breaker.cancel()
+            raise
+        self.started = time.monotonic()
+        return self
+
+    async def __aenter__(self):
+        self.guard.breaker.before_call()
+        try:
+            await self.guard.limiter.aacquire()
+        except Overloaded:
+            self.guard.breaker.cancel()
+            raise
+        self.started = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        breaker, limiter = self.guard.breaker, self.guard.limiter
+        if exc_type is not None and issubclass(exc_type, (GeneratorExit, asyncio.CancelledError)):
+            # The caller went away; says nothing about upstream health
+            limiter.release()
+            breaker.cancel()
+            return False
+        failed = exc is not None and self.guard.is_failure(exc)
+        limiter.release(time.monotonic() - self.started, failed)
+        if failed:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return False
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
@@ -0,0 +1,134 @@
+# resolver.py
+"""Cached DNS resolution for page fetches.
+
+URL validation and the HTTP connection both look names up here, so a fetch
+costs at most one getaddrinfo call and the socket is opened to the very
+addresses that validation saw. Failed lookups are cached for a shorter time
+so a mistyped domain can't trigger a lookup on every request.
+"""
+import asyncio
+import socket
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from urllib3.util.connection import _set_socket_options
+from urllib3.util.timeout import _DEFAULT_TIMEOUT
+
+
+class DnsCache:
+    def __init__(self, ttl=300, negative_ttl=30, max_entries=1024):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def _lookup(self, host):
+        """Return a cached address list or gaierror, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(host)
+            if entry is not None:
+                expires, result = entry
+                if time.monotonic() < expires:
+                    self._entries.move_to_end(host)
+                    if isinstance(result, socket.gaierror):
+                        self.negative_hits += 1
+                    else:
+                        self.hits += 1
+                    return result
+                del self._entries[host]
+            self.misses += 1
+            return None
+
+    def _store(self, host, result):
+        ttl = self.negative_ttl if isinstance(result, socket.gaierror) else self.ttl
+        with self._lock:
+            self._entries[host] = (time.monotonic() + ttl, result)
+            self._entries.move_to_end(host)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _addresses(infos):
+        # Keep getaddrinfo's order (the system's address preference)
+        return [(family, sockaddr) for family, _, _, _, sockaddr in infos]
+
+    def resolve(self, host):
+        """Return [(family, sockaddr), ...] for host, or raise socket.gaierror"""
+        host = host.lower().rstrip('.')
+        result = self._lookup(host)
+        if result is None:
+            try:
+                result = self._addresses(socket.getaddrinfo(host, None, type=socket.SOCK_STREAM))
+            except socket.gaierror as e:
+                result = e
+            self._store(host, result)
+        if isinstance(result, socket.gaierror):
+            raise result
+        return result
+
+    async def aresolve(self, host):
+        """resolve() using the event loop's non-blocking getaddrinfo"""
+        host = host.lower().rstrip('.')
+        result = self._lookup(host)
+        if result is None:
+            try:
+                infos = await asyncio.get_running_loop().getaddrinfo(host, None, type=socket.SOCK_STREAM)
+                result = self._addresses(infos)
+            except socket.gaierror as e:
+                result = e
+            self._store(host, result)
+        if isinstance(result, socket.gaierror):
+            raise result
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            entries = len(self._entries)
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            'entries': entries,
+            'hits': self.hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+        }
+
+
+def open_connection(addresses, port, timeout=_DEFAULT_TIMEOUT, source_address=None, socket_options=None):
+    """urllib3's create_connection, but over already-resolved addresses"""
+    error = None
+    for family, sockaddr in addresses:
+        sock = None
+        try:
+            sock = socket.socket(family, socket.SOCK_STREAM)
+            _set_socket_options(sock, socket_options)
+            if timeout is not _DEFAULT_TIMEOUT:
+                sock.settimeout(timeout)
+            if source_address:
+                sock.bind(source_address)
+            sock.connect((sockaddr[0], port, *sockaddr[2:]))
+            return sock
+        except OSError as e:
+            error = e
+            if sock is not None:
+                sock.close()
+    if error is not None:
+        raise error
+    raise OSError("getaddrinfo returned an empty list")
+
+
+dns_cache = DnsCache(
+    ttl=getattr(settings, 'DNS_CACHE_TTL', 300),
+    negative_ttl=getattr(settings, 'DNS_NEGATIVE_TTL', 30),
+    max_entries=getattr(settings, 'DNS_CACHE_MAX_ENTRIES', 1024),
+)
@@ -0,0 +1,118 @@
+# search.py
+"""Ranked full-text search over a user's saved summaries.
+
+On SQLite the texts of completed summaries are indexed by
+summarizer_summary_fts, an FTS5 table that triggers on summarizer_summary
+keep in step with every insert, update and delete, bulk_create included.
+Migration 0008 creates it as an external-content table that reads the
+texts back from summarizer_summary. Once 0009 stores those texts
+compressed, it is recreated as a contentless table whose triggers index the
+decompressed texts. The owner's id and the summary type are indexed as
+columns too, so a query intersects the user's posting list with the search
+terms' and never looks at other users' rows. Matches are ranked with BM25,
+with hits in the summary weighted above hits in the original text.
+
+On PostgreSQL the same weighting is a stored tsvector column
+(search_vector) with a GIN index, ranked with ts_rank, also created by
+migration 0008.
+
+Every word of the query has to match (stemmed, so "summaries" finds "summary");
+operators are not supported. Only the SEARCH_MAX_CANDIDATES newest matches
+are ranked: a word found in most of a long history would otherwise cost a
+BM25 score per summary.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+
+from .extractive import STOPWORDS
+from .metrics import timed
+from .models import Summary
+from .serializers import SummaryListSerializer
+
+FTS_TABLE = 'summarizer_summary_fts'
+
+# Summary hits count this much more than original text hits
+SUMMARY_WEIGHT = 2.0
+
+WORD = re.compile(r'\w+', re.UNICODE)
+
+COLUMNS = ', '.join(f's.{column}' for column in SummaryListSerializer.Meta.fields)
+
+# Candidates are the newest matches; only the requested page of them is
+# joined back to summarizer_summary, whose rows carry the full texts
+SQLITE_QUERY = f"""
+    SELECT {COLUMNS}, page.rank FROM (
+        SELECT rowid, rank FROM (
+            SELECT rowid, -bm25({FTS_TABLE}, 0.0, 0.0, 1.0, {SUMMARY_WEIGHT}) AS rank
+            FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s
+            ORDER BY rowid DESC LIMIT %s
+        ) ORDER BY rank DESC, rowid DESC LIMIT %s OFFSET %s
+    ) page
+    JOIN summarizer_summary s ON s.id = page.rowid
+    ORDER BY page.rank DESC, s.id DESC
+"""
+
+POSTGRES_QUERY = f"""
+    SELECT {COLUMNS}, page.rank FROM (
+        SELECT id, rank FROM (
+            SELECT id, ts_rank(ARRAY[0.1, 0.2, {1.0 / SUMMARY_WEIGHT}, 1.0]::real[], search_vector, query) AS rank
+            FROM summarizer_summary, plainto_tsquery('english', %s) query
+            WHERE user_id = %s AND status = %s AND search_vector @@ query
+                AND (%s = '' OR summary_type = %s)
+            ORDER BY id DESC LIMIT %s
+        ) candidates ORDER BY rank DESC, id DESC LIMIT %s OFFSET %s
+    ) page
+    JOIN summarizer_summary s ON s.id = page.id
+    ORDER BY page.rank DESC, s.id DESC
+"""
+
+
+def query_terms(query):
+    """Words of a free-text query, lowercased and without FTS syntax.
+
+    Stopwords are dropped unless the query is nothing but stopwords; they
+    match nearly every summary and add nothing to the ranking.
+    """
+    words = [word.lower() for word in WORD.findall(query or '')]
+    return [word for word in words if word not in STOPWORDS] or words
+
+
+def fts_string(value):
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def optimize_index():
+    """Merge the SQLite index into one segment, e.g. after rewriting many rows"""
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+
+
+def search_summaries(user, terms, limit, offset=0, summary_type=None):
+    """Completed summaries of user matching all terms, best first.
+
+    Rows carry only the list columns plus `rank` (higher is better).
+    """
+    candidates = getattr(settings, 'SEARCH_MAX_CANDIDATES', 1000) or -1
+    with timed('search'):
+        if connection.vendor == 'postgresql':
+            return postgres_search(user, terms, limit, offset, summary_type, candidates)
+        return sqlite_search(user, terms, limit, offset, summary_type, candidates)
+
+
+def sqlite_search(user, terms, limit, offset, summary_type, candidates):
+    # Terms are matched against the texts only, never the filter columns
+    words = ' AND '.join(fts_string(term) for term in terms)
+    match = f'user_id : {fts_string(user.pk)} AND {{original_text summary_text}} : ({words})'
+    if summary_type:
+        match = f'summary_type : {fts_string(summary_type)} AND {match}'
+    return list(Summary.objects.raw(SQLITE_QUERY, [match, candidates, limit, offset]))
+
+
+def postgres_search(user, terms, limit, offset, summary_type, candidates):
+    params = [' '.join(terms), user.pk, Summary.STATUS_COMPLETED, summary_type or '', summary_type or '',
+              # LIMIT NULL is no limit in PostgreSQL
+              candidates if candidates > 0 else None, limit, offset]
+    return list(Summary.objects.raw(POSTGRES_QUERY, params))
@@ -5,3 +5,25 @@ class SummarySerializer(serializers.ModelSerializer):
     class Meta:
         model = Summary
         fields = '__all__'
+
+
+class SummaryListSerializer(serializers.ModelSerializer):
+    """History rows without the text columns, so listing never loads them"""
+    class Meta:
+        model = Summary
+        fields = ['id', 'summary_type', 'source_url', 'status', 'is_complete', 'created_at']
+
+
+class SummaryDetailSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Summary
+        fields = SummaryListSerializer.Meta.fields + [
+            'original_text', 'summary_text', 'error_code', 'error_message',
+        ]
+
+
+class SummarySearchSerializer(SummaryListSerializer):
+    rank = serializers.FloatField(read_only=True)
+
+    class Meta(SummaryListSerializer.Meta):
+        fields = SummaryListSerializer.Meta.fields + ['rank']
@@ -0,0 +1,289 @@
+# singleflight.py
+"""Coalescing of identical concurrent requests ("single flight").
+
+When many clients ask for the same page or the same summary at once, the
+first caller for a key becomes the leader and does the work; callers that
+arrive while it is in flight wait for it and get its result, or its
+exception. A follower that has waited for longer than the flight's timeout
+gets FlightTimeout instead; the leader is never cut short. Errors that only
+concern the leader (`personal_errors`, e.g. its user's rate limit) aren't
+passed on: the followers try again, and one of them leads.
+
+Callers are coalesced per process by default. With COALESCE_BACKEND=django
+a lock in the COALESCE_CACHE_ALIAS cache makes one caller across all
+workers the leader: it publishes its outcome in the cache, and the other
+workers' callers poll for it. This needs a cache shared by the workers
+(Redis, Memcached or the database cache, not locmem). Outcomes that can't
+be pickled aren't published; the waiting workers then go ahead on their own.
+"""
+import asyncio
+import hashlib
+import logging
+import pickle
+import threading
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+# Followers in other workers poll the shared cache with backoff between these
+POLL_INITIAL_SECONDS = 0.02
+POLL_MAX_SECONDS = 0.25
+
+# How long a published outcome stays readable for the other workers' followers
+RESULT_TTL = 10
+
+
+class FlightTimeout(TimeoutError):
+    def __init__(self, name, timeout):
+        super().__init__(f"Timed out after {timeout:g}s waiting for an identical {name} request")
+        self.name = name
+        self.timeout = timeout
+
+    def __reduce__(self):
+        return type(self), (self.name, self.timeout)
+
+
+class Call:
+    """One in-flight computation and its outcome"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SharedLock:
+    """Leader lock and outcome mailbox in a Django cache, shared by all workers"""
+
+    def __init__(self, alias='default', prefix='singleflight'):
+        self.cache = caches[alias]
+        self.prefix = prefix
+
+    def _keys(self, name, key):
+        digest = hashlib.sha256(f'{name}\x00{key}'.encode('utf-8')).hexdigest()
+        return f'{self.prefix}:lock:{digest}', f'{self.prefix}:outcome:{digest}'
+
+    def acquire(self, name, key, ttl):
+        """A token if this caller now leads, else None"""
+        lock_key, outcome_key = self._keys(name, key)
+        token = uuid.uuid4().hex
+        if not self.cache.add(lock_key, token, ttl):
+            return None
+        self.cache.delete(outcome_key)   # left by an earlier flight
+        return token
+
+    def release(self, name, key, token, outcome):
+        """Publish outcome (pickled, see outcome_of) unless it is None, and unlock"""
+        lock_key, outcome_key = self._keys(name, key)
+        if outcome is not None:
+            try:
+                self.cache.set(outcome_key, outcome, RESULT_TTL)
+            except Exception as e:
+                logger.error(f"Single-flight outcome not shared: {str(e)}")
+        if self.cache.get(lock_key) == token:
+            self.cache.delete(lock_key)
+
+    def poll(self, name, key):
+        """(outcome or None, whether a leader still holds the lock)"""
+        lock_key, outcome_key = self._keys(name, key)
+        data = self.cache.get(outcome_key)
+        if data is not None:
+            try:
+                return pickle.loads(data), True
+            except Exception as e:
+                logger.error(f"Single-flight outcome unreadable: {str(e)}")
+        return None, self.cache.get(lock_key) is not None
+
+
+def outcome_of(error=None, result=None):
+    """What the leader publishes: a pickled ('result' | 'error', value) pair, or None"""
+    outcome = ('error', error) if error is not None else ('result', result)
+    try:
+        return pickle.dumps(outcome)
+    except Exception:
+        return None
+
+
+def settle(outcome):
+    kind, value = outcome
+    if kind == 'error':
+        raise value
+    return value
+
+
+class SingleFlight:
+    def __init__(self, name, timeout=60.0, shared=None, personal_errors=(), enabled=True):
+        self.name = name
+        self.timeout = timeout
+        self.shared = shared
+        self.personal_errors = personal_errors
+        self.enabled = enabled
+        self._calls = {}
+        self._tasks = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+        self.timeouts = 0
+        self.shared_waits = 0
+
+    def _count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def timed_out(self):
+        self._count('timeouts')
+        return FlightTimeout(self.name, self.timeout)
+
+    def do(self, key, fn):
+        """fn(), or the outcome of an identical call already in flight"""
+        if not self.enabled:
+            return fn()
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = Call()
+                    self.leaders += 1
+                else:
+                    self.followers += 1
+            if leader:
+                return self._lead(key, call, fn, deadline)
+            if not call.done.wait(max(0.0, deadline - time.monotonic())):
+                raise self.timed_out()
+            if call.error is None:
+                return call.result
+            if not isinstance(call.error, self.personal_errors):
+                raise call.error
+
+    def _lead(self, key, call, fn, deadline):
+        try:
+            call.result = self._run_shared(key, fn, deadline) if self.shared else fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _run_shared(self, key, fn, deadline):
+        delay = POLL_INITIAL_SECONDS
+        while True:
+            token = self.shared.acquire(self.name, key, self.timeout)
+            if token is not None:
+                try:
+                    result = fn()
+                except Exception as e:
+                    personal = isinstance(e, self.personal_errors)
+                    self.shared.release(self.name, key, token, None if personal else outcome_of(error=e))
+                    raise
+                self.shared.release(self.name, key, token, outcome_of(result=result))
+                return result
+            self._count('shared_waits')
+            while True:
+                outcome, held = self.shared.poll(self.name, key)
+                if outcome is not None:
+                    return settle(outcome)
+                if not held:
+                    break   # leader gone without an outcome; try to lead
+                if time.monotonic() + delay > deadline:
+                    raise self.timed_out()
+                time.sleep(delay)
+                delay = min(delay * 2, POLL_MAX_SECONDS)
+
+    async def ado(self, key, factory):
+        """Async twin of do(); factory() returns the coroutine to run.
+
+        The work runs in its own task, so a caller that goes away (and is
+        cancelled) doesn't cancel it for the others.
+        """
+        if not self.enabled:
+            return await factory()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        while True:
+            with self._lock:
+                task = self._tasks.get((loop, key))
+                leader = task is None
+                if leader:
+                    task = loop.create_task(self._alead(key, factory, deadline))
+                    self._tasks[(loop, key)] = task
+                    task.add_done_callback(lambda done, flight_key=(loop, key): self._finished(flight_key, done))
+                    self.leaders += 1
+                else:
+                    self.followers += 1
+            if leader:
+                return await asyncio.shield(task)
+            try:
+                return await asyncio.wait_for(asyncio.shield(task), max(0.0, deadline - loop.time()))
+            except self.personal_errors:
+                continue
+            except TimeoutError:
+                if task.done():
+                    raise   # the leader's own error
+                raise self.timed_out()
+
+    def _finished(self, flight_key, task):
+        with self._lock:
+            self._tasks.pop(flight_key, None)
+        if not task.cancelled():
+            task.exception()    # retrieved here in case nobody waits any more
+
+    async def _alead(self, key, factory, deadline):
+        if not self.shared:
+            return await factory()
+        loop = asyncio.get_running_loop()
+        delay = POLL_INITIAL_SECONDS
+        while True:
+            token = await sync_to_async(self.shared.acquire, thread_sensitive=False)(self.name, key, self.timeout)
+            if token is not None:
+                try:
+                    result = await factory()
+                except Exception as e:
+                    personal = isinstance(e, self.personal_errors)
+                    await sync_to_async(self.shared.release, thread_sensitive=False)(
+                        self.name, key, token, None if personal else outcome_of(error=e)
+                    )
+                    raise
+                await sync_to_async(self.shared.release, thread_sensitive=False)(
+                    self.name, key, token, outcome_of(result=result)
+                )
+                return result
+            self._count('shared_waits')
+            while True:
+                outcome, held = await sync_to_async(self.shared.poll, thread_sensitive=False)(self.name, key)
+                if outcome is not None:
+                    return settle(outcome)
+                if not held:
+                    break
+                if loop.time() + delay > deadline:
+                    raise self.timed_out()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, POLL_MAX_SECONDS)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._calls) + len(self._tasks),
+                'leaders': self.leaders,
+                'followers': self.followers,
+                'timeouts': self.timeouts,
+                'shared_waits': self.shared_waits,
+            }
+
+
+def build_flight(name, timeout, personal_errors=()):
+    """SingleFlight configured by COALESCE_BACKEND ('local', 'django' or 'off')"""
+    backend = getattr(settings, 'COALESCE_BACKEND', 'local')
+    if backend not in ('local', 'django', 'off'):
+        raise ValueError(f"Unknown coalescing backend: {backend}")
+    shared = SharedLock(getattr(settings, 'COALESCE_CACHE_ALIAS', 'default')) if backend == 'django' else None
+    return SingleFlight(name, timeout=timeout, shared=shared, personal_errors=personal_errors, enabled=backend != 'off')
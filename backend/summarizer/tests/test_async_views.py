@@ -0,0 +1,94 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, override_settings
+
+from summarizer import async_views, views
+from summarizer.authentication import ClaimsTokenObtainPairSerializer
+from summarizer.extraction import StreamingExtraction
+from summarizer.generation import SummaryResult
+from summarizer.page_cache import page_cache
+from summarizer.ratelimit import RateLimited
+from summarizer.tests.test_fetching import OriginTestCase
+
+TEXT = "The river flooded the valley after a week of rain. " * 10
+
+
+def auth_headers():
+    token = ClaimsTokenObtainPairSerializer.get_token(User(id=42, username='reader')).access_token
+    return {'Authorization': f'Bearer {token}'}
+
+
+@override_settings(JWT_USER_LOOKUP='claims')
+class AsyncSummarizeViewTests(SimpleTestCase):
+    def setUp(self):
+        self.headers = auth_headers()
+        # save_summary() is shared with the sync views and writes through theirs
+        self.writer = mock.Mock(write_behind=True)
+        for module in (async_views, views):
+            patcher = mock.patch.object(module, 'summary_writer', self.writer)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def post(self, body, **kwargs):
+        return await self.async_client.post(
+            '/api/async/summarize/', body, content_type='application/json', headers=self.headers, **kwargs
+        )
+
+    async def test_summarize(self):
+        result = SummaryResult('The valley flooded.', False, 'gemini')
+        with mock.patch.object(async_views, 'asummarize', return_value=result) as asummarize:
+            response = await self.post({'text': TEXT, 'summary_type': 'short'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['summary'], 'The valley flooded.')
+        self.assertEqual(asummarize.call_args.args, (TEXT.strip(), 'short'))
+        self.assertEqual(asummarize.call_args.kwargs['user'].pk, 42)
+        self.writer.add.assert_called_once()
+
+    async def test_generation_error(self):
+        with mock.patch.object(async_views, 'asummarize', side_effect=RateLimited('user', 12.0)), \
+                self.assertLogs('summarizer.generation', 'WARNING'):
+            response = await self.post({'text': TEXT})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '12')
+        self.writer.add.assert_not_called()
+
+    async def test_invalid_input(self):
+        self.assertEqual((await self.post({'text': 'too short'})).status_code, 400)
+        self.assertEqual((await self.post('{not json')).status_code, 400)
+        self.assertEqual((await self.post({'text': TEXT, 'summary_type': 'huge'})).status_code, 400)
+
+    async def test_authentication_is_required(self):
+        self.headers = {}
+        self.assertEqual((await self.post({'text': TEXT})).status_code, 401)
+        self.headers = {'Authorization': 'Bearer not-a-token'}
+        self.assertEqual((await self.post({'text': TEXT})).status_code, 401)
+
+
+@override_settings(JWT_USER_LOOKUP='claims', CONTENT_EXTRACTOR='density')
+class AsyncFetchUrlContentViewTests(OriginTestCase):
+    def setUp(self):
+        super().setUp()
+        page_cache.clear()
+        self.addCleanup(page_cache.clear)
+
+    async def fetch(self, name):
+        return await self.async_client.post(
+            '/api/async/fetch-url-content/', {'url': f'{self.url}/{name}.html'},
+            content_type='application/json', headers=auth_headers()
+        )
+
+    async def test_fetch(self):
+        response = await self.fetch('news_article')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Transit Expansion', response.json()['content'])
+
+    @override_settings(FETCH_CHUNK_BYTES=4096, SUMMARY_MAX_CONTENT_CHARS=2000)
+    async def test_download_stops_once_enough_text_is_extracted(self):
+        with mock.patch.object(StreamingExtraction, 'feed', autospec=True,
+                               side_effect=StreamingExtraction.feed) as feed:
+            response = await self.fetch('forum_deep_nesting')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['content']), 2000)
+        page_size = len(self.origin.page('forum_deep_nesting', ''))
+        self.assertLess(feed.call_count, page_size // 4096 // 4)
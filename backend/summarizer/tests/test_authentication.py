@@ -0,0 +1,85 @@
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, check_password, make_password
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+
+from summarizer.authentication import CachedJWTAuthentication, ClaimsTokenObtainPairSerializer, user_cache
+from summarizer.hashers import ConfigurablePBKDF2PasswordHasher
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.addCleanup(user_cache.clear)
+        self.user = User.objects.create_user('reader')
+
+    def token(self, user=None):
+        return str(ClaimsTokenObtainPairSerializer.get_token(user or self.user).access_token)
+
+    def authenticate(self, token=None):
+        authentication = CachedJWTAuthentication()
+        return authentication.get_user(authentication.get_validated_token(token or self.token()))
+
+    def test_cache_is_the_default(self):
+        self.assertEqual(CachedJWTAuthentication().lookup, 'cache')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.authenticate(), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authenticate(), self.user)
+
+    def test_deactivation_evicts_the_cached_user(self):
+        token = self.token()
+        self.authenticate(token)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed) as raised:
+            self.authenticate(token)
+        self.assertEqual(raised.exception.detail['code'], 'user_inactive')
+
+    def test_cached_users_are_checked_for_is_active(self):
+        self.authenticate().is_active = False
+        with self.assertNumQueries(0), self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_deleted_user(self):
+        token = self.token()
+        self.authenticate(token)
+        self.user.delete()
+        with self.assertRaises(AuthenticationFailed) as raised:
+            self.authenticate(token)
+        self.assertEqual(raised.exception.detail['code'], 'user_not_found')
+
+    @override_settings(JWT_USER_LOOKUP='claims')
+    def test_claims_are_an_opt_in_without_queries(self):
+        reader = User(id=42, username='reader')
+        with self.assertNumQueries(0):
+            user = self.authenticate(self.token(reader))
+        self.assertEqual((user.id, user.username), (42, 'reader'))
+        self.assertEqual(user_cache.stats()['from_claims'], 1)
+
+    @override_settings(JWT_USER_LOOKUP='sessions')
+    def test_unknown_lookup(self):
+        with self.assertRaises(ValueError):
+            CachedJWTAuthentication()
+
+
+class PasswordHasherTests(SimpleTestCase):
+    def encode(self, iterations):
+        return PBKDF2PasswordHasher().encode('secret', 'seasalt' * 4, iterations)
+
+    @override_settings(PASSWORD_HASH_ITERATIONS=1000)
+    def test_new_hashes_use_the_setting(self):
+        encoded = make_password('secret')
+        self.assertTrue(encoded.startswith('pbkdf2_sha256$1000$'))
+        self.assertTrue(check_password('secret', encoded))
+
+    @override_settings(PASSWORD_HASH_ITERATIONS=0)
+    def test_zero_keeps_the_django_default(self):
+        self.assertEqual(ConfigurablePBKDF2PasswordHasher().iterations, PBKDF2PasswordHasher.iterations)
+
+    @override_settings(PASSWORD_HASH_ITERATIONS=1000)
+    def test_hashes_are_rehashed_up_but_never_down(self):
+        hasher = ConfigurablePBKDF2PasswordHasher()
+        self.assertTrue(hasher.must_update(self.encode(500)))
+        self.assertFalse(hasher.must_update(self.encode(1000)))
+        self.assertFalse(hasher.must_update(self.encode(2000)))
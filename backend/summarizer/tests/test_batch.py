@@ -0,0 +1,73 @@
+import json
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from summarizer import views
+from summarizer.generation import SummaryResult
+from summarizer.ratelimit import RateLimited
+
+TEXT = "The river flooded the valley after a week of rain. " * 10
+
+
+class SummarizeBatchViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('reader')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        writer = mock.patch.object(views, 'summary_writer')
+        self.writer = writer.start()
+        self.addCleanup(writer.stop)
+        patcher = mock.patch.object(views, 'summarize', side_effect=self.summarize)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def summarize(self, text, summary_type, user=None):
+        if text.startswith('Fail'):
+            raise RateLimited('user', 3.0)
+        return SummaryResult(f'Summary of {len(text)} characters.', False, 'gemini')
+
+    def post(self, items, **extra):
+        return self.client.post('/api/summarize/batch/', {'items': items, **extra}, format='json')
+
+    def test_each_item_gets_its_own_result(self):
+        items = [
+            {'text': TEXT},
+            {'text': 'Fail ' + TEXT, 'summary_type': 'short'},
+            {'text': 'too short'},
+            {'text': TEXT, 'url': 'https://example.com/'},
+            'not an object',
+            {'text': TEXT, 'summary_type': 'huge'},
+        ]
+        with self.assertLogs('summarizer.generation', 'WARNING'):
+            response = self.post(items)
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual([result['index'] for result in results], list(range(len(items))))
+        self.assertEqual([result['success'] for result in results], [True, False, False, False, False, False])
+        self.assertEqual(results[0]['summary'], f'Summary of {len(TEXT.strip())} characters.')
+        self.assertEqual(results[1]['code'], 'rate_limited')
+        self.assertEqual({result['code'] for result in results[2:]}, {'invalid_input'})
+        self.assertEqual((response.data['succeeded'], response.data['failed']), (1, 5))
+
+        # Only the successful item is saved, in one write
+        records, = self.writer.add.call_args.args
+        self.assertEqual([record.summary_type for record in records], ['medium'])
+
+    def test_streamed_results(self):
+        response = self.post([{'text': TEXT}, {'text': 'Fail ' + TEXT}], stream=True)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        with self.assertLogs('summarizer.generation', 'WARNING'):
+            body = b''.join(response.streaming_content).decode()
+        lines = [json.loads(line) for line in body.splitlines()]
+        self.assertCountEqual([(line['index'], line['success']) for line in lines[:-1]], [(0, True), (1, False)])
+        self.assertEqual(lines[-1], {'done': True, 'succeeded': 1, 'failed': 1})
+        self.writer.add.assert_called_once()
+
+    def test_invalid_batches(self):
+        self.assertEqual(self.post([]).status_code, 400)
+        self.assertEqual(self.post('not a list').status_code, 400)
+        with self.settings(SUMMARY_BATCH_MAX_ITEMS=2):
+            self.assertEqual(self.post([{'text': TEXT}] * 3).status_code, 400)
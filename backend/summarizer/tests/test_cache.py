@@ -0,0 +1,115 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from summarizer.cache import (
+    DatabaseBackend, DjangoCacheBackend, LocalLRUBackend, SummaryCache, build_backend, make_cache_key,
+)
+from summarizer.models import SummaryCacheEntry
+
+
+class CacheKeyTests(SimpleTestCase):
+    def test_whitespace_does_not_change_the_key(self):
+        self.assertEqual(
+            make_cache_key("Some  text\n\nhere ", 'short', 'v1'),
+            make_cache_key("Some text here", 'short', 'v1'),
+        )
+
+    def test_type_and_version_change_the_key(self):
+        key = make_cache_key("Some text", 'short', 'v1')
+        self.assertNotEqual(key, make_cache_key("Some text", 'long', 'v1'))
+        self.assertNotEqual(key, make_cache_key("Some text", 'short', 'v2'))
+
+
+class LocalLRUBackendTests(SimpleTestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        backend = LocalLRUBackend(max_entries=2)
+        backend.set('a', 'A', 'v1')
+        backend.set('b', 'B', 'v1')
+        backend.get('a')
+        backend.set('c', 'C', 'v1')
+        self.assertEqual([backend.get(key) for key in 'abc'], ['A', None, 'C'])
+
+    def test_expired_entry_is_a_miss(self):
+        backend = LocalLRUBackend(ttl=-1)
+        backend.set('a', 'A', 'v1')
+        self.assertIsNone(backend.get('a'))
+
+
+class DjangoCacheBackendTests(SimpleTestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.addCleanup(caches['default'].clear)
+
+    def test_clear_keeps_other_entries_of_the_alias(self):
+        backend = DjangoCacheBackend()
+        backend.set('key', 'summary', 'v1')
+        caches['default'].set('unrelated', 'kept')
+        backend.clear()
+        self.assertIsNone(backend.get('key'))
+        self.assertEqual(caches['default'].get('unrelated'), 'kept')
+
+    def test_other_processes_see_a_clear_after_the_check_interval(self):
+        writer = DjangoCacheBackend(generation_check_seconds=60)
+        other = DjangoCacheBackend(generation_check_seconds=60)
+        writer.set('key', 'summary', 'v1')
+        self.assertEqual(other.get('key'), 'summary')
+        writer.clear()
+        # Until it rereads the generation, the other process keeps its namespace
+        self.assertEqual(other.get('key'), 'summary')
+        other.generation_check_seconds = 0
+        self.assertIsNone(other.get('key'))
+
+    def test_clear_after_the_generation_was_evicted(self):
+        backend = DjangoCacheBackend()
+        backend.set('key', 'summary', 'v1')
+        with mock.patch.object(backend.cache, 'incr', side_effect=ValueError):
+            backend.clear()
+        self.assertIsNone(backend.get('key'))
+
+    @override_settings(SUMMARY_CACHE_BACKEND='django', SUMMARY_CACHE_GENERATION_CHECK_SECONDS=0.5)
+    def test_check_interval_comes_from_settings(self):
+        self.assertEqual(build_backend().generation_check_seconds, 0.5)
+
+
+class DatabaseBackendTests(TestCase):
+    def test_purge_stale_drops_old_versions_and_expired_rows(self):
+        backend = DatabaseBackend(ttl=3600)
+        backend.set('current', 'summary', 'v2')
+        backend.set('old-version', 'summary', 'v1')
+        backend.set('expired', 'summary', 'v2')
+        SummaryCacheEntry.objects.filter(key='expired').update(created_at=timezone.now() - timedelta(hours=2))
+        self.assertIsNone(backend.get('expired'))
+        backend.purge_stale('v2')
+        self.assertEqual(list(SummaryCacheEntry.objects.values_list('key', flat=True)), ['current'])
+
+
+class SummaryCacheTests(SimpleTestCase):
+    def test_hits_and_misses(self):
+        cache = SummaryCache(LocalLRUBackend(), 'v1')
+        self.assertIsNone(cache.get("Some text", 'short'))
+        cache.set("Some  text", 'short', 'summary')
+        self.assertEqual(cache.get("Some text", 'short'), 'summary')
+        self.assertIsNone(cache.get("Some text", 'long'))
+        self.assertEqual((cache.stats()['hits'], cache.stats()['misses']), (1, 2))
+
+    def test_backend_errors_are_misses(self):
+        backend = mock.Mock(get=mock.Mock(side_effect=ConnectionError("down")),
+                            set=mock.Mock(side_effect=ConnectionError("down")))
+        cache = SummaryCache(backend, 'v1')
+        with self.assertLogs('summarizer.cache', 'ERROR') as logs:
+            self.assertIsNone(cache.get("Some text", 'short'))
+            cache.set("Some text", 'short', 'summary')
+        self.assertEqual(len(logs.records), 2)
+        self.assertEqual((cache.stats()['misses'], cache.stats()['errors']), (1, 2))
+
+
+class InvalidateCommandTests(SimpleTestCase):
+    def test_refuses_the_local_backend(self):
+        with mock.patch('summarizer.generation.summary_cache.backend', LocalLRUBackend()):
+            with self.assertRaises(CommandError):
+                call_command('invalidate_summary_cache', '--all')
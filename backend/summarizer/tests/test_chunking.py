@@ -0,0 +1,117 @@
+import threading
+import uuid
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from summarizer import generation
+from summarizer.chunking import map_reduce, split_into_chunks
+
+
+def paragraph(index, sentences=5):
+    return ' '.join(f'Paragraph {index} sentence {n} ends here.' for n in range(sentences))
+
+
+class SplitIntoChunksTests(SimpleTestCase):
+    def test_pieces_keep_their_order_and_limit(self):
+        text = '\n\n'.join(paragraph(i) for i in range(20))
+        chunks = split_into_chunks(text, 500)
+        self.assertTrue(all(len(chunk) <= 500 for chunk in chunks))
+        self.assertEqual(' '.join(' '.join(chunks).split()), ' '.join(text.split()))
+
+    def test_breaks_between_paragraphs_first(self):
+        paragraphs = [paragraph(i) for i in range(6)]
+        chunks = split_into_chunks('\n\n'.join(paragraphs), len(paragraphs[0]) * 2 + 2)
+        self.assertEqual(chunks, ['\n\n'.join(paragraphs[i:i + 2]) for i in (0, 2, 4)])
+
+    def test_long_paragraph_breaks_between_sentences(self):
+        text = paragraph(0, sentences=30)
+        for chunk in split_into_chunks(text, 200):
+            self.assertTrue(chunk.startswith('Paragraph 0 sentence'))
+            self.assertTrue(chunk.endswith('ends here.'))
+
+    def test_overlong_sentence_is_cut_at_a_space(self):
+        text = ' '.join(['word'] * 100)
+        chunks = split_into_chunks(text, 42)
+        self.assertTrue(all(len(chunk) <= 42 and not chunk.startswith(' ') for chunk in chunks))
+        self.assertEqual(' '.join(chunks).split(), text.split())
+
+    def test_blank_text(self):
+        self.assertEqual(split_into_chunks('\n\n  \n\n', 100), [])
+
+
+class MapReduceTests(SimpleTestCase):
+    def test_short_text_goes_straight_to_the_final_pass(self):
+        result = map_reduce('short', lambda chunk: self.fail("chunked"), str.upper, 100, 1000, 4)
+        self.assertEqual(result, 'SHORT')
+
+    def test_levels_until_the_text_fits(self):
+        text = '\n\n'.join(paragraph(i) for i in range(40))
+        calls = []
+        lock = threading.Lock()
+
+        def summarize_chunk(chunk):
+            with lock:
+                calls.append(chunk)
+            return chunk[:len(chunk) // 3]
+
+        result = map_reduce(text, summarize_chunk, lambda final: final, 1000, 1200, 4)
+        self.assertLessEqual(len(result), 1200)
+        self.assertGreater(len(calls), len(split_into_chunks(text, 1000)))
+        # Partial summaries are joined in document order
+        self.assertTrue(result.startswith('Paragraph 0 '))
+
+    def test_every_chunk_is_attempted_and_the_first_error_raised(self):
+        text = '\n\n'.join(paragraph(i) for i in range(10))
+        chunks = split_into_chunks(text, 300)
+        attempted = []
+        lock = threading.Lock()
+
+        def summarize_chunk(chunk):
+            with lock:
+                attempted.append(chunk)
+            index = chunks.index(chunk)
+            if index in (1, 3):
+                raise RuntimeError(f"chunk {index} failed")
+            return 'ok'
+
+        with self.assertRaisesMessage(RuntimeError, "chunk 1 failed"):
+            map_reduce(text, summarize_chunk, lambda final: final, 300, 400, 4)
+        self.assertCountEqual(attempted, chunks)
+
+    def test_summaries_that_do_not_shrink_are_an_error(self):
+        text = '\n\n'.join(paragraph(i) for i in range(10))
+        with self.assertRaises(ValueError):
+            map_reduce(text, lambda chunk: chunk + ' and more', lambda final: final, 300, 400, 4)
+
+
+@override_settings(SUMMARY_CHUNK_CHARS=1000, SUMMARY_SINGLE_PASS_CHARS=1500, SUMMARIZER_BACKEND='auto')
+class HierarchicalGenerationTests(SimpleTestCase):
+    def test_retry_regenerates_only_the_failed_chunks(self):
+        run = uuid.uuid4().hex    # keeps the shared summary cache out of the way
+        text = '\n\n'.join(f'{run} {paragraph(i)}' for i in range(12))
+        chunks = split_into_chunks(text, 1000)
+        failing = {chunks[1]}
+        calls = []
+        lock = threading.Lock()
+
+        def generate_summary(content, summary_type):
+            with lock:
+                calls.append((content, summary_type))
+            if content in failing:
+                raise RuntimeError("upstream failed")
+            return f'Summary of {len(content)} characters.'
+
+        with mock.patch.object(generation, 'generate_summary', side_effect=generate_summary):
+            with self.assertRaises(RuntimeError):
+                generation.get_backend('gemini').summarize(text, 'medium')
+            self.assertEqual(len(calls), len(chunks))
+            failing.clear()
+            calls.clear()
+            summary = generation.get_backend('gemini').summarize(text, 'medium')
+
+        self.assertEqual([content for content, _ in calls[:-1]], [chunks[1]])
+        final_content, final_type = calls[-1]
+        self.assertEqual(final_type, 'medium')
+        self.assertEqual(final_content.count('Summary of'), len(chunks))
+        self.assertEqual(summary, f'Summary of {len(final_content)} characters.')
@@ -0,0 +1,90 @@
+import importlib
+import tempfile
+from pathlib import Path
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+
+from summarizer.compression import STORED, WITH_DICTIONARY, ZLIB, TextCompressor, dictionary_id, text_compressor
+from summarizer.models import Summary
+from summarizer.search import search_summaries
+
+compression_migration = importlib.import_module('summarizer.migrations.0009_compress_summary_texts')
+
+LONG_TEXT = "The quick brown fox jumps over the lazy dog while the farmer sleeps. " * 20
+
+
+class TextCompressorTests(SimpleTestCase):
+    def test_round_trip(self):
+        compressor = TextCompressor('zlib')
+        stored = compressor.compress(LONG_TEXT)
+        self.assertEqual(stored[0], ZLIB)
+        self.assertLess(len(stored), len(LONG_TEXT) // 4)
+        self.assertEqual(compressor.decompress(stored), LONG_TEXT)
+
+    def test_short_and_plain_texts(self):
+        compressor = TextCompressor('zlib')
+        self.assertEqual(compressor.compress('Short.'), bytes([STORED]) + b'Short.')
+        self.assertEqual(compressor.decompress(bytes([STORED]) + 'Ünïcode'.encode('utf-8')), 'Ünïcode')
+        self.assertEqual(compressor.decompress('written before compression'), 'written before compression')
+        self.assertEqual(TextCompressor('none').store('plain'), 'plain')
+
+    def test_migration_format_matches(self):
+        compressor = TextCompressor('zlib')
+        self.assertEqual(compressor.decompress(compression_migration.compress(LONG_TEXT)), LONG_TEXT)
+        self.assertEqual(compression_migration.decompress(compressor.compress(LONG_TEXT), {}), LONG_TEXT)
+        self.assertEqual(compression_migration.compress('Short.'), compressor.compress('Short.'))
+
+    def test_dictionaries(self):
+        dictionary = ("The quick brown fox jumps over the lazy dog. " * 10).encode('utf-8')
+        with tempfile.TemporaryDirectory() as directory:
+            (Path(directory) / 'texts.dict').write_bytes(dictionary)
+            compressor = TextCompressor('zlib', dictionary_dir=directory, dictionary='texts.dict')
+            stored = compressor.compress(LONG_TEXT)
+            self.assertEqual(stored[0], ZLIB | WITH_DICTIONARY)
+            self.assertEqual(stored[1:5], dictionary_id(dictionary))
+            self.assertEqual(compressor.decompress(stored), LONG_TEXT)
+            with override_settings(TEXT_COMPRESSION_DICTIONARY_DIR=directory):
+                dictionaries = compression_migration.load_dictionaries()
+        self.assertEqual(compression_migration.decompress(stored, dictionaries), LONG_TEXT)
+        with self.assertRaises(ValueError):
+            compression_migration.decompress(stored, {})
+
+
+class CompressionMigrationTests(TransactionTestCase):
+    """0009's data migration, backwards and forwards again"""
+
+    def raw_texts(self, pk):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT original_text, summary_text FROM summarizer_summary WHERE id = %s", [pk])
+            return cursor.fetchone()
+
+    def run_migration(self, operation):
+        with connection.schema_editor() as schema_editor:
+            operation(apps, schema_editor)
+
+    def test_round_trip(self):
+        if connection.vendor != 'sqlite' or not text_compressor.enabled:
+            self.skipTest("texts are only compressed on SQLite")
+        user = User.objects.create_user('reader')
+        summary = Summary.objects.create(user=user, original_text=LONG_TEXT, summary_text='A fox and a dog.')
+        self.assertIsInstance(self.raw_texts(summary.pk)[0], bytes)
+
+        self.run_migration(compression_migration.decompress_texts)
+        self.assertEqual(self.raw_texts(summary.pk), (LONG_TEXT, 'A fox and a dog.'))
+
+        self.run_migration(compression_migration.compress_texts)
+        original_text, summary_text = self.raw_texts(summary.pk)
+        self.assertIsInstance(original_text, bytes)
+        self.assertLess(len(original_text), len(LONG_TEXT))
+        self.assertEqual(text_compressor.decompress(original_text), LONG_TEXT)
+        self.assertEqual(text_compressor.decompress(summary_text), 'A fox and a dog.')
+
+        loaded = Summary.objects.get(pk=summary.pk)
+        self.assertEqual((loaded.original_text, loaded.summary_text), (LONG_TEXT, 'A fox and a dog.'))
+        # The index was rebuilt from the decompressed texts
+        self.assertEqual([row.pk for row in search_summaries(user, ['farmer'], 10)], [summary.pk])
+
+
@@ -0,0 +1,67 @@
+from django.test import SimpleTestCase
+
+from summarizer.extraction import DensityExtractor, SoupExtractor, get_extractor
+
+STORY = "The council approved the new transit line after months of public hearings and debate."
+
+PAGE = f"""<html><head><title>News</title><script>var tracking = "ignore me";</script></head>
+<body>
+<nav><a href="/">Home</a> <a href="/world">World</a> <a href="/sport">Sport</a></nav>
+<div class="layout"><div><div>
+<h2>Transit line approved</h2>
+<p>{STORY}</p>
+<p>{STORY} Construction starts next spring &amp; ends in 2030.</p>
+<ul><li><a href="/a">A related story with a long enough headline to count as words</a></li></ul>
+</div></div></div>
+<footer>Copyright and a long list of legal words that nobody reads at all ever</footer>
+</body></html>"""
+
+
+class DensityExtractorTests(SimpleTestCase):
+    def extract(self, html, parser_backend):
+        return DensityExtractor(parser_backend).extract(html)
+
+    def test_keeps_main_text_and_drops_boilerplate(self):
+        for backend in ('lxml', 'html.parser'):
+            with self.subTest(backend=backend):
+                text = self.extract(PAGE, backend)
+                self.assertEqual(text, f"Transit line approved {STORY} {STORY} "
+                                       f"Construction starts next spring & ends in 2030.")
+
+    def test_article_container_wins(self):
+        article = ' '.join([f"<p>{STORY}</p>"] * 3)
+        html = f"<body><p>{STORY} Outside the article.</p><article>{article}</article></body>"
+        for backend in ('lxml', 'html.parser'):
+            with self.subTest(backend=backend):
+                self.assertEqual(self.extract(html, backend), ' '.join([STORY] * 3))
+
+    def test_short_page_falls_back_to_all_text(self):
+        self.assertEqual(self.extract('<p>Just a few words.</p>', 'html.parser'), 'Just a few words.')
+
+    def test_chunk_boundaries_do_not_matter(self):
+        chunks = [PAGE[i:i + 7] for i in range(0, len(PAGE), 7)]
+        for backend in ('lxml', 'html.parser'):
+            with self.subTest(backend=backend):
+                self.assertEqual(DensityExtractor(backend).extract_stream(chunks), self.extract(PAGE, backend))
+
+    def test_stream_stops_once_enough_text_is_read(self):
+        for backend in ('lxml', 'html.parser'):
+            read = []
+
+            def chunks():
+                for n in range(20):
+                    read.append(n)
+                    yield f"<p>{STORY}</p>"
+
+            with self.subTest(backend=backend):
+                text = DensityExtractor(backend).extract_stream(chunks(), enough_chars=3 * len(STORY))
+                self.assertEqual(len(read), 3)
+                self.assertEqual(text, ' '.join([STORY] * 3))
+
+    def test_matches_the_soup_engine_on_article_pages(self):
+        html = f"<body><nav>Menu</nav><article><p>{STORY}</p><p>{STORY}</p></article></body>"
+        self.assertEqual(get_extractor('density').extract(html), SoupExtractor().extract(html))
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            get_extractor('regex')
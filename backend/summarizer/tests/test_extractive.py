@@ -0,0 +1,63 @@
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from summarizer import extractive
+from summarizer.extractive import (
+    cosine_similarity, extractive_summary, sentence_budget, sentence_scores, split_sentences, tfidf_entries,
+)
+
+SENTENCES = [
+    "The river flooded the valley after a week of heavy rain.",
+    "Farmers in the valley lost crops to the flooded river.",
+    "The mayor's cat enjoys sleeping on warm windowsills.",
+    "Engineers say the river dam could not hold the rain.",
+    "Heavy rain and the flooded river closed valley roads.",
+    "A bakery downtown started selling cinnamon buns.",
+    "Officials expect the river to fall once the rain stops.",
+    "The valley school reopened after the flood waters receded.",
+    "Tickets for the summer concert sold out in an hour.",
+    "Rain is forecast to return to the valley next week.",
+]
+
+
+class ExtractiveTests(SimpleTestCase):
+    def test_split_sentences(self):
+        self.assertEqual(split_sentences("One here. Two there!  Three?\nFour。 Five"),
+                         ["One here.", "Two there!", "Three?", "Four。", "Five"])
+
+    def test_sentence_budget(self):
+        self.assertEqual(sentence_budget(10, 'short'), 2)
+        self.assertEqual(sentence_budget(100, 'medium'), 10)
+        self.assertEqual(sentence_budget(1000, 'long'), 20)
+        self.assertEqual(sentence_budget(10, 'unknown'), sentence_budget(10, 'medium'))
+
+    def test_similarity_matches_the_dense_product(self):
+        entries = tfidf_entries(SENTENCES)
+        rows, cols, values, terms = entries
+        vectors = np.zeros((len(SENTENCES), terms))
+        vectors[rows, cols] = values
+        dense = vectors @ vectors.T
+        np.fill_diagonal(dense, 0.0)
+        np.testing.assert_allclose(cosine_similarity(entries, len(SENTENCES)), dense, atol=1e-12)
+
+    def test_off_topic_sentences_rank_lowest(self):
+        scores = sentence_scores(SENTENCES)
+        self.assertEqual(set(np.argsort(scores)[:3]), {2, 5, 8})
+
+    def test_centroid_scores_above_the_textrank_limit(self):
+        with mock.patch.object(extractive, 'TEXTRANK_MAX_SENTENCES', 5):
+            scores = sentence_scores(SENTENCES)
+        self.assertEqual(set(np.argsort(scores)[:3]), {2, 5, 8})
+
+    def test_summary_keeps_document_order(self):
+        summary = extractive_summary(' '.join(SENTENCES), 'medium')
+        chosen = split_sentences(summary)
+        self.assertEqual(len(chosen), 3)
+        self.assertEqual(chosen, sorted(chosen, key=SENTENCES.index))
+        self.assertNotIn(SENTENCES[2], chosen)
+
+    def test_too_few_sentences(self):
+        with self.assertRaises(ValueError):
+            extractive_summary(' '.join(SENTENCES[:2]), 'short')
@@ -0,0 +1,94 @@
+import asyncio
+import socket
+import threading
+from unittest import mock
+
+import httpx
+from django.test import SimpleTestCase
+
+from summarizer import fetching
+from summarizer.fetching import get_async_client, get_fetcher
+from summarizer.mock_servers import FakeOrigin, FakeOriginHandler, LatencyModel, serve
+from summarizer.resolver import dns_cache
+
+
+class OriginTestCase(SimpleTestCase):
+    """A FakeOrigin on localhost that `origin.test` resolves to"""
+
+    def setUp(self):
+        self.origin = FakeOrigin(LatencyModel('fixed', 0.0))
+        server = serve(FakeOriginHandler, 0, origin=self.origin)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.port = server.server_address[1]
+        self.url = f'http://origin.test:{self.port}'
+        self.lookups = []
+
+        def resolve(host):
+            self.lookups.append(host)
+            if host != 'origin.test':
+                raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+            return [(socket.AF_INET, ('127.0.0.1', 0))]
+
+        async def aresolve(host):
+            return resolve(host)
+
+        for patcher in (mock.patch.object(dns_cache, 'resolve', side_effect=resolve),
+                        mock.patch.object(dns_cache, 'aresolve', side_effect=aresolve)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class AsyncClientTests(OriginTestCase):
+    def fetch(self, *urls):
+        async def run():
+            client = get_async_client()
+            try:
+                return [await client.get(url) for url in urls]
+            finally:
+                await client.aclose()
+        return asyncio.run(run())
+
+    def test_connects_to_the_cached_addresses(self):
+        first, second = self.fetch(f'{self.url}/news_article.html', f'{self.url}/docs_page.html')
+        self.assertEqual((first.status_code, second.status_code), (200, 200))
+        self.assertIn('Transit Expansion', first.text)
+        self.assertEqual(self.lookups, ['origin.test'])    # the second request reused the connection
+
+    def test_connection_errors_are_httpx_errors(self):
+        with self.assertRaises(httpx.ConnectError):
+            self.fetch(f'http://unknown.test:{self.port}/')
+
+    def test_streamed_body(self):
+        async def run():
+            client = get_async_client()
+            try:
+                request = client.build_request('GET', f'{self.url}/news_article.html')
+                response = await client.send(request, stream=True)
+                try:
+                    return b''.join([chunk async for chunk in response.aiter_bytes()])
+                finally:
+                    await response.aclose()
+            finally:
+                await client.aclose()
+
+        self.assertEqual(asyncio.run(run()), self.origin.page('news_article', ''))
+
+
+class PageFetcherTests(OriginTestCase):
+    def test_one_fetcher_per_process(self):
+        fetcher = get_fetcher()
+        self.assertIs(get_fetcher(), fetcher)
+        with mock.patch.object(fetching.os, 'getpid', return_value=fetcher.pid + 1):
+            self.assertIsNot(get_fetcher(), fetcher)
+
+    def test_connections_are_reused(self):
+        fetcher = fetching.PageFetcher()
+        for name in ('news_article', 'docs_page', 'news_article'):
+            response = fetcher.get(f'{self.url}/{name}.html', timeout=5)
+            self.assertEqual(response.status_code, 200)
+        metrics = fetcher.metrics()
+        self.assertEqual((metrics['requests'], metrics['new_connections']), (3, 1))
+        self.assertEqual((metrics['host_pools'], metrics['idle_connections']), (1, 1))
+        self.assertEqual(self.lookups, ['origin.test'])
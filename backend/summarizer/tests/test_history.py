@@ -0,0 +1,77 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from summarizer.models import Summary
+from summarizer.views import decode_cursor, encode_cursor
+
+
+class SummaryHistoryViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('reader')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        now = timezone.now()
+        # Pairs of rows share created_at, so pages must break ties on id
+        self.summaries = [
+            Summary.objects.create(
+                user=self.user, original_text=f'text {i}', summary_text=f'summary {i}',
+                summary_type='short' if i % 3 == 0 else 'medium',
+                created_at=now - timedelta(minutes=i // 2),
+            )
+            for i in range(7)
+        ]
+        other = User.objects.create_user('other')
+        Summary.objects.create(user=other, original_text='text', summary_text='summary')
+
+    def pages(self, **params):
+        ids, cursor = [], None
+        while True:
+            query = dict(params, **({'cursor': cursor} if cursor else {}))
+            response = self.client.get('/api/summaries/', query)
+            self.assertEqual(response.status_code, 200)
+            ids.append([row['id'] for row in response.data['results']])
+            cursor = response.data['next_cursor']
+            if cursor is None:
+                return ids
+
+    def test_pages_cover_every_row_once_newest_first(self):
+        expected = [s.pk for s in sorted(self.summaries, key=lambda s: (s.created_at, s.pk), reverse=True)]
+        pages = self.pages(limit=3)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), expected)
+
+    def test_exact_page_has_no_next_cursor(self):
+        self.assertEqual(len(self.pages(limit=7)), 1)
+
+    def test_summary_type_filter(self):
+        ids = sum(self.pages(limit=2, summary_type='short'), [])
+        self.assertEqual(sorted(ids), sorted(s.pk for s in self.summaries if s.summary_type == 'short'))
+
+    def test_rows_leave_out_the_texts(self):
+        response = self.client.get('/api/summaries/', {'limit': 1})
+        self.assertNotIn('summary_text', response.data['results'][0])
+
+    def test_invalid_cursor_and_limit(self):
+        response = self.client.get('/api/summaries/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['code'], 'invalid_cursor')
+        response = self.client.get('/api/summaries/', {'limit': 0})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_round_trip(self):
+        summary = self.summaries[0]
+        self.assertEqual(decode_cursor(encode_cursor(summary)), (summary.created_at, summary.pk))
+
+
+
+    def test_detail_is_limited_to_the_owner(self):
+        summary = self.summaries[0]
+        response = self.client.get(f'/api/summaries/{summary.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['summary_text'], 'summary 0')
+        other = Summary.objects.exclude(user=self.user).get()
+        self.assertEqual(self.client.get(f'/api/summaries/{other.pk}/').status_code, 404)
@@ -0,0 +1,131 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from summarizer import jobs
+from summarizer.generation import SummaryResult
+from summarizer.models import Summary
+
+TEXT = "A long article about rivers. " * 300
+
+
+class FakeExecutor:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, *args):
+        self.submitted.append((fn, args))
+
+
+@override_settings(SUMMARY_JOB_MODE='external')
+class JobTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('reader')
+
+    def summarize(self, summary='The summary.', error=None):
+        result = SummaryResult(summary, False, 'gemini')
+        return mock.patch.object(jobs, 'summarize', side_effect=error, return_value=result)
+
+    def test_enqueue_leaves_external_jobs_queued(self):
+        with mock.patch.object(jobs, 'get_executor') as get_executor:
+            job = jobs.enqueue(self.user, TEXT, 'short')
+        get_executor.assert_not_called()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.is_complete, job.original_text), (Summary.STATUS_QUEUED, False, TEXT))
+
+    @override_settings(SUMMARY_JOB_MODE='inprocess')
+    def test_enqueue_submits_inprocess_jobs(self):
+        executor = FakeExecutor()
+        with mock.patch.object(jobs, 'get_executor', return_value=executor):
+            job = jobs.enqueue(self.user, TEXT, 'short')
+        self.assertEqual(executor.submitted, [(jobs.run_job, (job.pk,))])
+
+    def test_run_job_completes(self):
+        job = jobs.enqueue(self.user, TEXT, 'short')
+        with self.summarize() as summarize:
+            jobs.run_job(job.pk)
+        summarize.assert_called_once_with(TEXT, 'short')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.is_complete, job.summary_text),
+                         (Summary.STATUS_COMPLETED, True, 'The summary.'))
+        self.assertEqual(job.original_text, TEXT[:5000])
+
+    def test_run_job_records_the_failure(self):
+        job = jobs.enqueue(self.user, TEXT, 'short')
+        with self.summarize(error=ValueError("empty")), self.assertLogs('summarizer.generation', 'ERROR'):
+            jobs.run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.is_complete, job.error_code), (Summary.STATUS_FAILED, True, 'empty_summary'))
+
+    def test_job_claimed_elsewhere_is_not_run(self):
+        job = jobs.enqueue(self.user, TEXT, 'short')
+        self.assertIsNotNone(jobs.claim(job.pk))
+        self.assertIsNone(jobs.claim(job.pk))
+        with self.summarize() as summarize:
+            jobs.run_job(job.pk)
+        summarize.assert_not_called()
+
+    def test_job_view(self):
+        job = jobs.enqueue(self.user, TEXT, 'short')
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get(f'/api/summarize/{job.pk}/').data['status'], Summary.STATUS_QUEUED)
+        with self.summarize():
+            jobs.run_job(job.pk)
+        data = client.get(f'/api/summarize/{job.pk}/').data
+        self.assertEqual((data['status'], data['summary']), (Summary.STATUS_COMPLETED, 'The summary.'))
+        other = User.objects.create_user('other')
+        client.force_authenticate(other)
+        self.assertEqual(client.get(f'/api/summarize/{job.pk}/').status_code, 404)
+
+
+@override_settings(SUMMARY_JOB_MODE='external', SUMMARY_JOB_STALE_SECONDS=600)
+class ReclaimTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('reader')
+
+    def running(self, claimed_ago):
+        job = jobs.enqueue(self.user, TEXT, 'short')
+        jobs.claim(job.pk)
+        Summary.objects.filter(pk=job.pk).update(
+            claimed_at=None if claimed_ago is None else timezone.now() - timedelta(seconds=claimed_ago)
+        )
+        return job
+
+    def status(self, job):
+        job.refresh_from_db()
+        return job.status
+
+    def test_stale_running_jobs_are_queued_again(self):
+        stale, recent, unclaimed = self.running(3600), self.running(60), self.running(None)
+        with self.assertLogs('summarizer.jobs', 'WARNING'):
+            self.assertEqual(jobs.reclaim_stale(), 2)
+        self.assertEqual(self.status(stale), Summary.STATUS_QUEUED)
+        self.assertEqual(self.status(recent), Summary.STATUS_RUNNING)
+        self.assertEqual(self.status(unclaimed), Summary.STATUS_QUEUED)
+
+    def test_outcome_of_a_reclaimed_run_is_dropped(self):
+        job = jobs.enqueue(self.user, TEXT, 'short')
+        first_claim = jobs.claim(job.pk)
+        with self.assertLogs('summarizer.jobs', 'WARNING'):
+            jobs.reclaim_stale(max_age=-1)
+        second_claim = jobs.claim(job.pk)
+        with mock.patch.object(jobs, 'summarize', return_value=SummaryResult('Late.', False, 'gemini')):
+            with self.assertLogs('summarizer.jobs', 'WARNING'):
+                jobs.run_job(job.pk, first_claim)
+            self.assertEqual(self.status(job), Summary.STATUS_RUNNING)
+            jobs.run_job(job.pk, second_claim)
+        self.assertEqual(self.status(job), Summary.STATUS_COMPLETED)
+
+    def test_recover_jobs_runs_queued_and_orphaned_jobs(self):
+        queued = jobs.enqueue(self.user, TEXT, 'short')
+        orphaned = self.running(3600)
+        self.running(60)
+        executor = FakeExecutor()
+        with mock.patch.object(jobs, 'get_executor', return_value=executor), self.assertLogs('summarizer.jobs'):
+            jobs.recover_jobs()
+        self.assertEqual(executor.submitted, [(jobs.run_job, (queued.pk,)), (jobs.run_job, (orphaned.pk,))])
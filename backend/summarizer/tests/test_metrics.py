@@ -0,0 +1,54 @@
+from django.test import SimpleTestCase, override_settings
+
+from summarizer.metrics import Counter, Histogram, server_timing, stats_lines
+
+
+class MetricsViewTests(SimpleTestCase):
+    def get(self, authorization=None):
+        headers = {'Authorization': authorization} if authorization is not None else {}
+        return self.client.get('/metrics', headers=headers)
+
+    @override_settings(METRICS_TOKEN='', DEBUG=False)
+    def test_open_metrics_are_refused_outside_debug(self):
+        self.assertEqual(self.get().status_code, 403)
+
+    @override_settings(METRICS_TOKEN='', DEBUG=True)
+    def test_open_metrics_in_debug(self):
+        self.assertEqual(self.get().status_code, 200)
+
+    @override_settings(METRICS_TOKEN='s3cret-tøken')
+    def test_token_is_required(self):
+        self.assertEqual(self.get().status_code, 403)
+        self.assertEqual(self.get('Bearer wrong').status_code, 403)
+        response = self.get('Bearer s3cret-tøken'.encode('utf-8').decode('latin-1'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        body = response.content.decode()
+        self.assertIn('# TYPE smartsum_requests_total counter', body)
+        self.assertIn('smartsum_dns_cache_hit_rate ', body)
+
+    @override_settings(METRICS_TOKEN='', DEBUG=True, METRICS_SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        self.assertRegex(self.get()['Server-Timing'], r'^total;dur=[0-9.]+$')
+
+
+class RenderTests(SimpleTestCase):
+    def test_counter_and_histogram(self):
+        counter = Counter('test_calls_total', 'Calls.', ('kind',))
+        counter.inc('a')
+        counter.inc('a', amount=2)
+        histogram = Histogram('test_seconds', 'Time.', 'stage')
+        histogram.observe('parse', 0.03)
+        lines = counter.render() + histogram.render()
+        self.assertIn('test_calls_total{kind="a"} 3', lines)
+        self.assertIn('test_seconds_count{stage="parse"} 1', lines)
+
+    def test_stats_are_flattened_into_gauges(self):
+        self.assertEqual(stats_lines('smartsum_x', {'a': 1, 'b': {'c': True}, 'name': 'skipped'}), [
+            '# TYPE smartsum_x_a gauge', 'smartsum_x_a 1.0',
+            '# TYPE smartsum_x_b_c gauge', 'smartsum_x_b_c 1.0',
+        ])
+
+    def test_server_timing_sums_repeated_stages(self):
+        self.assertEqual(server_timing([('gemini', 0.25), ('parse', 0.01), ('gemini', 0.5)], 1.0),
+                         'gemini;dur=750.0, parse;dur=10.0, total;dur=1000.0')
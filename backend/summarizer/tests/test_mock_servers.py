@@ -0,0 +1,115 @@
+import asyncio
+import json
+import threading
+
+import requests
+from django.test import SimpleTestCase
+
+from summarizer.loadtest import latency_report, percentile, run_load
+from summarizer.mock_servers import (
+    SUMMARY_WORDS, FakeOrigin, FakeOriginHandler, LatencyModel, MockGemini, MockGeminiHandler, serve,
+)
+from summarizer.prompts import make_prompt
+
+ARTICLE = ' '.join(f'Word{i} is the {i}th word of this article.' for i in range(200))
+
+
+class ServerTestCase(SimpleTestCase):
+    def start(self, handler, **state):
+        server = serve(handler, 0, **state)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return f'http://127.0.0.1:{server.server_address[1]}'
+
+
+class MockGeminiTests(ServerTestCase):
+    def setUp(self):
+        self.mock = MockGemini(LatencyModel('fixed', 0.0), token_delay=0.0)
+        self.url = self.start(MockGeminiHandler, mock=self.mock) + '/v1beta/models/gemini-2.5-flash'
+
+    def generate(self, prompt, method='generateContent', **config):
+        body = {'contents': [{'parts': [{'text': prompt}]}], 'generationConfig': config}
+        return requests.post(f'{self.url}:{method}', json=body, timeout=10)
+
+    def test_summary_is_the_start_of_the_content(self):
+        response = self.generate(make_prompt(ARTICLE, 'short').text)
+        self.assertEqual(response.status_code, 200)
+        text = response.json()['candidates'][0]['content']['parts'][0]['text']
+        self.assertEqual(text.split(), ARTICLE.split()[:SUMMARY_WORDS['short']])
+        self.assertEqual(self.mock.stats(), {'requests': 1, 'errors': 0})
+
+    def test_output_limit_is_honoured(self):
+        response = self.generate(make_prompt(ARTICLE, 'long').text, maxOutputTokens=5)
+        self.assertEqual(response.json()['usageMetadata']['candidatesTokenCount'], 5)
+
+    def test_stream_is_one_json_array(self):
+        response = self.generate(make_prompt(ARTICLE, 'short').text, method='streamGenerateContent')
+        pieces = json.loads(response.content)
+        self.assertEqual(len(pieces), SUMMARY_WORDS['short'])
+        self.assertEqual(pieces[-1]['candidates'][0]['finishReason'], 'STOP')
+
+    def test_errors_are_reproducible_with_a_seed(self):
+        def outcomes(seed):
+            mock = MockGemini(LatencyModel('uniform', 1.0, 0.5), error_rate=0.3, quota_rate=0.2, seed=seed)
+            return [mock.outcome() for _ in range(50)]
+
+        self.assertEqual(outcomes(7), outcomes(7))
+        errors = [error for _, error in outcomes(7) if error is not None]
+        self.assertTrue(set(errors) <= {429, 500, 503})
+        self.assertTrue(errors)
+
+    def test_upstream_error_status(self):
+        self.mock.quota_rate = 1.0
+        response = self.generate('Write a short summary of the content below.')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.json()['error']['status'], 'RESOURCE_EXHAUSTED')
+
+    def test_unknown_method(self):
+        self.assertEqual(self.generate('text', method='countTokens').status_code, 404)
+
+
+class FakeOriginTests(ServerTestCase):
+    def setUp(self):
+        self.origin = FakeOrigin(LatencyModel('fixed', 0.0))
+        self.url = self.start(FakeOriginHandler, origin=self.origin)
+
+    def test_revalidation(self):
+        first = requests.get(f'{self.url}/news_article.html', timeout=10)
+        self.assertEqual(first.status_code, 200)
+        again = requests.get(f'{self.url}/news_article.html', headers={'If-None-Match': first.headers['ETag']},
+                             timeout=10)
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(self.origin.stats(), {'requests': 2, 'not_modified': 1})
+
+    def test_versions_change_the_text(self):
+        first = requests.get(f'{self.url}/news_article.html?v=1', timeout=10)
+        second = requests.get(f'{self.url}/news_article.html?v=2', timeout=10)
+        self.assertIn('Revision 1.', first.text)
+        self.assertNotEqual(first.headers['ETag'], second.headers['ETag'])
+
+    def test_index_and_missing_page(self):
+        self.assertIn('news_article.html', requests.get(self.url + '/', timeout=10).text)
+        self.assertEqual(requests.get(f'{self.url}/missing.html', timeout=10).status_code, 404)
+
+
+class LoadTestTests(ServerTestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([], 95), 0.0)
+
+    def test_latency_report_counts_errors(self):
+        report = latency_report([0.1, 0.2], errors=2, elapsed=2.0)
+        self.assertEqual((report['requests'], report['errors'], report['throughput_rps']), (4, 2, 2.0))
+
+    def test_run_load_against_the_mock(self):
+        mock = MockGemini(LatencyModel('fixed', 0.0), token_delay=0.0, error_rate=0.5, seed=1)
+        url = self.start(MockGeminiHandler, mock=mock) + '/v1beta/models/gemini-2.5-flash:generateContent'
+        payload = {'contents': [{'parts': [{'text': ARTICLE}]}]}
+        report = asyncio.run(run_load(url, payload, {}, requests=20, concurrency=4))
+        self.assertEqual(report['requests'], 20)
+        self.assertEqual(report['errors'], mock.stats()['errors'])
+        self.assertEqual(mock.stats()['requests'], 20)
@@ -0,0 +1,98 @@
+import random
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from summarizer import nearduplicates
+from summarizer.nearduplicates import (
+    MULTIPLIERS, OFFSETS, PERMUTATIONS, NearDuplicateIndex, shingle_hashes, signature,
+)
+
+VOCABULARY = ("river valley council transit budget school harbour market bridge festival "
+              "museum station library garden tower forest island mountain village castle").split()
+
+
+def article(seed, words=400):
+    rng = random.Random(seed)
+    return ' '.join(rng.choice(VOCABULARY) + str(rng.randrange(50)) for _ in range(words))
+
+
+def jaccard(a, b):
+    a, b = set(shingle_hashes(a).tolist()), set(shingle_hashes(b).tolist())
+    return len(a & b) / len(a | b)
+
+
+class SignatureTests(SimpleTestCase):
+    def test_case_and_punctuation_are_ignored(self):
+        text = article(1)
+        np.testing.assert_array_equal(signature(text.upper().replace(' ', ', ')), signature(text))
+
+    def test_blocks_match_the_full_matrix(self):
+        text = article(2, words=3000)
+        shingles = shingle_hashes(text)
+        self.assertGreater(len(shingles), nearduplicates.BLOCK_SHINGLES)
+        full = (shingles[:, None] * MULTIPLIERS + OFFSETS).min(axis=0)
+        np.testing.assert_array_equal(signature(text), (full >> np.uint64(32)).astype(np.uint32))
+
+    def test_agreement_estimates_jaccard_similarity(self):
+        text = article(3)
+        edited = text + ' ' + article(4, words=60)
+        estimate = (signature(text) == signature(edited)).mean()
+        self.assertAlmostEqual(estimate, jaccard(text, edited), delta=0.1)
+
+    def test_no_words(self):
+        self.assertIsNone(signature(' ... '))
+        self.assertEqual(signature('one two').shape, (PERMUTATIONS,))
+
+
+class NearDuplicateIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = NearDuplicateIndex(threshold=0.9, max_entries=100)
+
+    def test_lightly_edited_text_reuses_the_summary(self):
+        text = article(10)
+        self.index.add(text, 'short', 'Summary ten.')
+        self.assertEqual(self.index.get(text + " Subscribe to our newsletter.", 'short'), 'Summary ten.')
+        self.assertIsNone(self.index.get(article(11), 'short'))
+        self.assertEqual(self.index.stats()['hits'], 1)
+
+    def test_summary_types_are_kept_apart(self):
+        text = article(12)
+        self.index.add(text, 'short', 'Short summary.')
+        self.assertIsNone(self.index.get(text, 'long'))
+        self.index.add(text, 'long', 'Long summary.')
+        self.assertEqual(self.index.get(text, 'long'), 'Long summary.')
+        self.assertEqual(self.index.get(text, 'short'), 'Short summary.')
+
+    def test_below_the_threshold_is_a_miss(self):
+        text = article(13)
+        self.index.add(text, 'short', 'Summary.')
+        half = ' '.join(text.split()[:200]) + ' ' + article(14, words=200)
+        self.assertLess(jaccard(text, half), 0.9)
+        self.assertIsNone(self.index.get(half, 'short'))
+
+    def test_merged_and_waiting_entries_are_found(self):
+        with mock.patch.object(nearduplicates, 'MIN_MERGE', 4):
+            for seed in range(10):
+                self.index.add(article(100 + seed), 'short', f'Summary {seed}.')
+        self.assertEqual(self.index.stats()['merges'], 2)
+        for seed in range(10):
+            self.assertEqual(self.index.get(article(100 + seed), 'short'), f'Summary {seed}.')
+
+    def test_oldest_entries_are_overwritten(self):
+        index = NearDuplicateIndex(threshold=0.9, max_entries=5)
+        with mock.patch.object(nearduplicates, 'MIN_MERGE', 2):
+            for seed in range(8):
+                index.add(article(200 + seed), 'short', f'Summary {seed}.')
+        self.assertEqual(index.stats()['entries'], 5)
+        for seed in range(3):
+            self.assertIsNone(index.get(article(200 + seed), 'short'))
+        for seed in range(3, 8):
+            self.assertEqual(index.get(article(200 + seed), 'short'), f'Summary {seed}.')
+
+    def test_disabled(self):
+        index = NearDuplicateIndex(threshold=0)
+        index.add(article(15), 'short', 'Summary.')
+        self.assertIsNone(index.get(article(15), 'short'))
+        self.assertEqual(index.stats()['entries'], 0)
@@ -0,0 +1,81 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase
+from rest_framework.test import APIClient
+
+from summarizer.page_cache import PageCache, canonicalize_url, page_cache
+from summarizer.tests.test_fetching import OriginTestCase
+
+
+class CanonicalizeUrlTests(SimpleTestCase):
+    def test_trivially_different_links_match(self):
+        self.assertEqual(
+            canonicalize_url('HTTPS://Example.COM:443/story?b=2&utm_source=feed&a=1&fbclid=x#comments'),
+            'https://example.com/story?a=1&b=2',
+        )
+        self.assertEqual(canonicalize_url('http://example.com'), 'http://example.com/')
+        self.assertEqual(canonicalize_url('http://example.com:8080/'), 'http://example.com:8080/')
+
+
+class PageCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        clock = mock.patch('summarizer.page_cache.time.monotonic', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.cache = PageCache(max_chars=10, ttl=60)
+
+    def test_fresh_and_stale_entries(self):
+        self.cache.store('validated', 'text', etag='"v1"')
+        self.cache.store('plain', 'text')
+        self.assertEqual(self.cache.lookup('validated')[1], True)
+        self.now += 61
+        entry, fresh = self.cache.lookup('validated')
+        self.assertEqual((entry.conditional_headers(), fresh), ({'If-None-Match': '"v1"'}, False))
+        # Without a validator a stale entry is useless and is dropped
+        self.assertEqual(self.cache.lookup('plain'), (None, False))
+        self.cache.refresh('validated')
+        self.assertEqual(self.cache.lookup('validated')[1], True)
+        self.assertEqual(self.cache.stats(), {'entries': 1, 'chars': 4, 'hits': 2, 'revalidated': 1, 'misses': 1})
+
+    def test_least_recently_used_pages_are_evicted_by_size(self):
+        self.cache.store('a', 'aaaa')
+        self.cache.store('b', 'bbbb')
+        self.cache.lookup('a')
+        self.cache.store('c', 'cccc')
+        self.assertIsNone(self.cache.lookup('b')[0])
+        self.assertIsNotNone(self.cache.lookup('a')[0])
+        self.cache.store('huge', 'x' * 11)
+        self.assertIsNone(self.cache.lookup('huge')[0])
+
+
+class FetchRevalidationTests(OriginTestCase):
+    def setUp(self):
+        super().setUp()
+        page_cache.clear()
+        self.addCleanup(page_cache.clear)
+        self.client = APIClient()
+        self.client.force_authenticate(User(id=1, username='reader'))
+
+    def fetch(self, url, **data):
+        response = self.client.post('/api/fetch-url-content/', {'url': url, **data}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data['content']
+
+    def test_fresh_hit_then_conditional_revalidation(self):
+        url = f'{self.url}/news_article.html'
+        content = self.fetch(url)
+        self.assertIn('Transit Expansion', content)
+        self.assertEqual(self.fetch(f'{url}?utm_source=feed'), content)
+        self.assertEqual(self.origin.stats(), {'requests': 1, 'not_modified': 0})
+
+        with mock.patch.object(page_cache, 'ttl', 0):
+            self.assertEqual(self.fetch(url), content)
+        self.assertEqual(self.origin.stats(), {'requests': 2, 'not_modified': 1})
+
+    def test_opting_out_downloads_again(self):
+        url = f'{self.url}/news_article.html'
+        self.fetch(url)
+        self.fetch(url, cache=False)
+        self.assertEqual(self.origin.stats(), {'requests': 2, 'not_modified': 0})
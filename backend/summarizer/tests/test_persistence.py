@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import OperationalError
+from django.test import TestCase, TransactionTestCase
+
+from summarizer.models import Summary
+from summarizer.persistence import SummarySpool, SummaryWriter, record_fields
+
+LONG_TEXT = "The quick brown fox jumps over the lazy dog while the farmer sleeps. " * 20
+
+
+class SpoolTestMixin:
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.spool = SummarySpool(os.path.join(self.directory, 'spool.jsonl'))
+        self.user = User.objects.create_user('writer')
+
+    def summaries(self, count, start=0):
+        return [
+            Summary(user=self.user, original_text=f'{LONG_TEXT} {i}', summary_text=f'summary {i}',
+                    source_url='https://example.com/', summary_type='short')
+            for i in range(start, start + count)
+        ]
+
+    def locked(self):
+        return mock.patch.object(Summary.objects, 'bulk_create', side_effect=OperationalError("database is locked"))
+
+
+class SpoolReplayTests(SpoolTestMixin, TestCase):
+    def test_claim_returns_the_spooled_rows(self):
+        records = self.summaries(2)
+        self.spool.append(records)
+        self.assertTrue(self.spool.pending())
+        claimed = self.spool.claim()
+        self.assertEqual([record_fields(record) for record in claimed], [record_fields(record) for record in records])
+        self.assertFalse(self.spool.pending())
+        self.assertIsNone(self.spool.claim())
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_claim_skips_a_truncated_line(self):
+        self.spool.append(self.summaries(1))
+        with open(self.spool.path, 'a', encoding='utf-8') as spool:
+            spool.write('{"user_id": "1", "summary_t')
+        with self.assertLogs('summarizer.persistence', 'ERROR'):
+            self.assertEqual(len(self.spool.claim()), 1)
+
+    def test_failed_write_is_spooled_and_replayed(self):
+        writer = SummaryWriter(self.spool, batch_size=2, write_behind=False)
+        with self.locked(), self.assertLogs('summarizer.persistence', 'ERROR') as logs:
+            writer.add(self.summaries(3))
+        self.assertIn("Database save failed: database is locked", logs.output[0])
+        self.assertEqual(Summary.objects.count(), 0)
+        self.assertEqual(writer.stats()['spooled'], 3)
+
+        self.assertEqual(writer.replay(), 3)
+        self.assertEqual(Summary.objects.count(), 3)
+        self.assertEqual(
+            sorted(str(text) for text in Summary.objects.values_list('summary_text', flat=True)),
+            sorted(['summary 0', 'summary 1', 'summary 2']),
+        )
+        self.assertEqual(writer.stats()['batches'], 2)
+        self.assertFalse(self.spool.pending())
+        self.assertEqual(writer.replay(), 0)
+
+    def test_write_behind_overflow_goes_to_the_spool(self):
+        writer = SummaryWriter(self.spool, max_pending=1, interval=60, write_behind=True)
+        with mock.patch.object(writer, '_ensure_thread'):
+            writer.add(self.summaries(3))
+        self.assertEqual(writer.stats()['pending'], 1)
+        self.assertEqual(len(self.spool.claim()), 2)
+        writer.flush()
+        self.assertEqual(Summary.objects.count(), 1)
+
+
+class SyncModeReplayTests(SpoolTestMixin, TransactionTestCase):
+    def test_next_successful_write_replays_the_spool(self):
+        writer = SummaryWriter(self.spool, write_behind=False)
+        with self.locked(), self.assertLogs('summarizer.persistence', 'ERROR'):
+            writer.add(self.summaries(2))
+        self.assertTrue(self.spool.pending())
+
+        writer.add(self.summaries(1, start=2))
+        writer.close()
+        self.assertFalse(self.spool.pending())
+        self.assertEqual(
+            sorted(str(text) for text in Summary.objects.values_list('summary_text', flat=True)),
+            ['summary 0', 'summary 1', 'summary 2'],
+        )
@@ -0,0 +1,84 @@
+import math
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from summarizer import generation
+from summarizer.prompts import (
+    HEADERS, OUTPUT_TOKENS_PER_WORD, SUMMARY_BUDGETS, estimate_tokens, fit_to_budget, make_prompt, prune,
+    single_pass_chars,
+)
+
+SENTENCES = [
+    "The river flooded the valley after a week of heavy rain.",
+    "Farmers in the valley lost crops to the flooded river.",
+    "The mayor's cat enjoys sleeping on warm windowsills.",
+    "Engineers say the river dam could not hold the rain.",
+    "Heavy rain and the flooded river closed valley roads.",
+    "A bakery downtown started selling cinnamon buns.",
+]
+
+
+class PruneTests(SimpleTestCase):
+    def test_boilerplate_and_repeats_are_dropped(self):
+        text = ("Accept all cookies\n\nThe river   flooded the valley. The river flooded the valley. Yes. Yes.\n"
+                "Share this article\n\n\n© 2024 Valley News")
+        self.assertEqual(prune(text), "The river flooded the valley. Yes. Yes.")
+
+    def test_long_lines_are_never_boilerplate(self):
+        line = "Readers who subscribe to the newsletter " + "get a weekly digest of every story " * 3
+        self.assertEqual(prune(line), line.strip())
+
+
+class FitToBudgetTests(SimpleTestCase):
+    def test_central_sentences_are_kept_in_order(self):
+        text = ' '.join(SENTENCES)
+        budget = sum(estimate_tokens(sentence) + 1 for sentence in SENTENCES[:3])
+        with self.assertLogs('summarizer.prompts', 'WARNING') as logs:
+            fitted = fit_to_budget(text, budget)
+        self.assertLessEqual(estimate_tokens(fitted), budget)
+        self.assertNotIn(SENTENCES[2], fitted)
+        self.assertNotIn(SENTENCES[5], fitted)
+        kept = [sentence for sentence in SENTENCES if sentence in fitted]
+        self.assertEqual(fitted, ' '.join(kept))
+        self.assertIn(f"dropped {len(SENTENCES) - len(kept)} of {len(SENTENCES)} sentences", logs.output[0])
+
+    def test_unsplittable_text_is_cut(self):
+        with self.assertLogs('summarizer.prompts', 'WARNING'):
+            self.assertEqual(fit_to_budget('x' * 100, 10), 'x' * 40)
+
+    def test_non_ascii_costs_more(self):
+        self.assertEqual(estimate_tokens('abcd' * 3), 3)
+        self.assertEqual(estimate_tokens('河' * 3), 2)
+
+
+class MakePromptTests(SimpleTestCase):
+    @override_settings(GEMINI_OUTPUT_TOKEN_RESERVE=1000)
+    def test_output_limit_is_the_word_budget_plus_the_reserve(self):
+        for summary_type, budget in SUMMARY_BUDGETS.items():
+            with self.subTest(summary_type=summary_type):
+                prompt = make_prompt(' '.join(SENTENCES), summary_type)
+                self.assertEqual(prompt.max_output_tokens, math.ceil(budget.words * OUTPUT_TOKENS_PER_WORD) + 1000)
+                self.assertTrue(prompt.text.startswith(HEADERS[summary_type]))
+
+    @override_settings(GEMINI_OUTPUT_TOKEN_RESERVE=0)
+    def test_reserve_can_be_turned_off(self):
+        self.assertEqual(make_prompt(SENTENCES[0], 'short').max_output_tokens, 120)
+
+    @override_settings(SUMMARY_SINGLE_PASS_CHARS=15000)
+    def test_single_pass_text_fits_the_budget(self):
+        self.assertEqual(single_pass_chars('short'), SUMMARY_BUDGETS['short'].input_tokens * 4)
+        self.assertEqual(single_pass_chars('long'), 15000)
+        text = ' '.join(f"Sentence number {n} of a long but ordinary report." for n in range(400))
+        text = text[:single_pass_chars('short')]
+        prompt = make_prompt(text, 'short')
+        self.assertEqual(prompt.text, HEADERS['short'] + prune(text))
+
+    @override_settings(SUMMARY_SINGLE_PASS_CHARS=15000)
+    def test_text_above_the_budget_is_map_reduced(self):
+        text = "An ordinary sentence about the weather. " * 325    # 13000 characters
+        with mock.patch.object(generation, 'generate_hierarchical', return_value='Reduced.') as hierarchical, \
+                mock.patch.object(generation, 'generate_summary', return_value='Whole.'):
+            self.assertEqual(generation.GeminiBackend().summarize(text, 'short'), 'Reduced.')
+            self.assertEqual(generation.GeminiBackend().summarize(text, 'long'), 'Whole.')
+        hierarchical.assert_called_once_with(text, 'short')
@@ -0,0 +1,84 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from summarizer.models import RateLimitBucket
+from summarizer.ratelimit import DatabaseBucketStore, LocalBucketStore, RateLimited, RateLimiter, build_limiter
+
+
+class DatabaseBucketStoreTests(TestCase):
+    def setUp(self):
+        self.store = DatabaseBucketStore()
+
+    def age(self, key, seconds):
+        bucket = RateLimitBucket.objects.get(key=key)
+        bucket.updated_at -= seconds
+        bucket.save()
+
+    def test_first_take_creates_the_bucket(self):
+        self.assertEqual(self.store.take('user:1', 30, 100, 10), 0.0)
+        self.assertEqual(RateLimitBucket.objects.get(key='user:1').tokens, 70)
+
+    def test_take_beyond_capacity_returns_the_wait(self):
+        self.store.take('user:1', 80, 100, 10)
+        self.assertAlmostEqual(self.store.take('user:1', 50, 100, 10), 3.0, delta=0.1)
+        # A refused take spends nothing
+        self.assertEqual(RateLimitBucket.objects.get(key='user:1').tokens, 20)
+
+    def test_bucket_refills_with_time_up_to_capacity(self):
+        self.store.take('user:1', 100, 100, 10)
+        self.age('user:1', 5)
+        self.assertEqual(self.store.take('user:1', 50, 100, 10), 0.0)
+        self.assertAlmostEqual(RateLimitBucket.objects.get(key='user:1').tokens, 0, delta=1)
+        self.age('user:1', 3600)
+        self.assertEqual(self.store.take('user:1', 100, 100, 10), 0.0)
+        self.assertGreater(self.store.take('user:1', 10, 100, 10), 0)
+
+    def test_refund_is_capped_at_capacity(self):
+        self.store.take('user:1', 30, 100, 10)
+        self.store.refund('user:1', 50, 100)
+        self.assertEqual(RateLimitBucket.objects.get(key='user:1').tokens, 100)
+
+    def test_limiter_refunds_the_user_when_the_global_bucket_refuses(self):
+        limiter = RateLimiter(self.store, user_capacity=100, user_rate=10, global_capacity=50, global_rate=1)
+        limiter.acquire(1, 40)
+        with self.assertRaises(RateLimited) as raised:
+            limiter.acquire(2, 40)
+        self.assertEqual(raised.exception.scope, 'global')
+        self.assertEqual(RateLimitBucket.objects.get(key='user:2').tokens, 100)
+        self.assertEqual(limiter.stats(), {'admitted': 1, 'rejected': 1})
+
+    def test_request_bigger_than_a_bucket_costs_the_whole_bucket(self):
+        limiter = RateLimiter(self.store, user_capacity=100, user_rate=10, global_capacity=0, global_rate=0)
+        limiter.acquire(1, 1000)
+        self.assertEqual(RateLimitBucket.objects.get(key='user:1').tokens, 0)
+        with self.assertRaises(RateLimited):
+            limiter.acquire(1, 1)
+
+
+
+class LocalBucketStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        clock = mock.patch('summarizer.ratelimit.time.time', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.store = LocalBucketStore()
+
+    def test_take_refill_and_refund(self):
+        self.assertEqual(self.store.take('user:1', 80, 100, 10), 0.0)
+        self.assertAlmostEqual(self.store.take('user:1', 50, 100, 10), 3.0)
+        self.now += 3
+        self.assertEqual(self.store.take('user:1', 50, 100, 10), 0.0)
+        self.store.refund('user:1', 500, 100)
+        self.assertEqual(self.store.take('user:1', 100, 100, 10), 0.0)
+
+
+class BuildLimiterTests(SimpleTestCase):
+    def test_store_follows_the_setting(self):
+        with override_settings(RATE_LIMIT_BACKEND='local'):
+            self.assertIsInstance(build_limiter().store, LocalBucketStore)
+        with override_settings(RATE_LIMIT_BACKEND='database'):
+            self.assertIsInstance(build_limiter().store, DatabaseBucketStore)
+        with override_settings(RATE_LIMIT_BACKEND='redis'), self.assertRaises(ValueError):
+            build_limiter()
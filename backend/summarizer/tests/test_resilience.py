@@ -0,0 +1,128 @@
+from django.test import SimpleTestCase
+
+from summarizer.resilience import (
+    CLOSED, HALF_OPEN, OPEN, AdaptiveLimiter, CallGuard, CircuitBreaker, CircuitOpen, Overloaded,
+)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30.0)
+
+    def trip(self):
+        for _ in range(3):
+            self.breaker.before_call()
+            self.breaker.record_failure()
+
+    def expire(self):
+        self.breaker.opened_at -= self.breaker.reset_timeout
+
+    def test_opens_after_threshold_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, OPEN)
+        with self.assertRaises(CircuitOpen) as raised:
+            self.breaker.before_call()
+        self.assertGreater(raised.exception.retry_after, 29)
+        self.assertEqual(self.breaker.stats()['rejected'], 1)
+
+    def test_success_resets_the_failure_count(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_half_open_admits_one_probe(self):
+        self.trip()
+        self.expire()
+        self.breaker.before_call()
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        with self.assertRaises(CircuitOpen):
+            self.breaker.before_call()
+
+    def test_successful_probe_closes(self):
+        self.trip()
+        self.expire()
+        self.breaker.before_call()
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.breaker.before_call()
+
+    def test_failed_probe_reopens(self):
+        self.trip()
+        self.expire()
+        self.breaker.before_call()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertEqual(self.breaker.stats()['times_opened'], 2)
+        with self.assertRaises(CircuitOpen):
+            self.breaker.before_call()
+
+    def test_cancelled_probe_frees_the_slot(self):
+        self.trip()
+        self.expire()
+        self.breaker.before_call()
+        self.breaker.cancel()
+        self.breaker.before_call()
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+
+
+
+class AdaptiveLimiterTests(SimpleTestCase):
+    def setUp(self):
+        self.limiter = AdaptiveLimiter(initial=2, minimum=1, maximum=4, latency_target=1.0, queue_timeout=0)
+
+    def test_full_limiter_refuses(self):
+        self.limiter.acquire()
+        self.limiter.acquire()
+        with self.assertRaises(Overloaded):
+            self.limiter.acquire()
+        self.limiter.release()
+        self.limiter.acquire()
+        self.assertEqual(self.limiter.stats(), {'limit': 2, 'in_flight': 2, 'rejected': 1})
+
+    def test_fast_calls_grow_the_limit_and_slow_ones_shrink_it(self):
+        for _ in range(20):
+            self.limiter.acquire()
+            self.limiter.release(latency=0.1)
+        self.assertEqual(self.limiter.stats()['limit'], 4)
+        self.limiter.acquire()
+        self.limiter.release(latency=5.0)
+        self.assertEqual(self.limiter.stats()['limit'], 2)    # 4 * 0.7
+        # One decrease per latency window
+        self.limiter.acquire()
+        self.limiter.release(failed=True, latency=0.1)
+        self.assertEqual(self.limiter.stats()['limit'], 2)
+
+
+class CallGuardTests(SimpleTestCase):
+    def setUp(self):
+        self.guard = CallGuard(
+            CircuitBreaker(failure_threshold=2, reset_timeout=30.0),
+            AdaptiveLimiter(initial=1, queue_timeout=0),
+            is_failure=lambda exc: isinstance(exc, ConnectionError),
+        )
+
+    def fail(self, error):
+        with self.assertRaises(type(error)), self.guard.call():
+            raise error
+
+    def test_only_upstream_failures_open_the_breaker(self):
+        for _ in range(3):
+            self.fail(ValueError("blocked by the content filter"))
+        self.assertEqual(self.guard.breaker.state, CLOSED)
+        self.fail(ConnectionError())
+        self.fail(ConnectionError())
+        self.assertEqual(self.guard.breaker.state, OPEN)
+        with self.assertRaises(CircuitOpen), self.guard.call():
+            pass
+        self.assertEqual(self.guard.limiter.stats()['in_flight'], 0)
+
+    def test_overloaded_call_releases_the_probe(self):
+        with self.guard.call():
+            with self.assertRaises(Overloaded), self.guard.call():
+                pass
+        self.assertEqual(self.guard.stats()['concurrency']['in_flight'], 0)
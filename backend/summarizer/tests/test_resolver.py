@@ -0,0 +1,80 @@
+import asyncio
+import socket
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from summarizer.resolver import DnsCache, open_connection
+
+ADDRESS_INFO = [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('192.0.2.7', 0))]
+
+
+class DnsCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        clock = mock.patch('summarizer.resolver.time.monotonic', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.cache = DnsCache(ttl=300, negative_ttl=30, max_entries=2)
+
+    def getaddrinfo(self, **kwargs):
+        return mock.patch('summarizer.resolver.socket.getaddrinfo', **kwargs)
+
+    def test_addresses_are_cached_for_the_ttl(self):
+        with self.getaddrinfo(return_value=ADDRESS_INFO) as getaddrinfo:
+            self.assertEqual(self.cache.resolve('Example.COM.'), [(socket.AF_INET, ('192.0.2.7', 0))])
+            self.now += 299
+            self.cache.resolve('example.com')
+            self.assertEqual(getaddrinfo.call_count, 1)
+            self.now += 2
+            self.cache.resolve('example.com')
+            self.assertEqual(getaddrinfo.call_count, 2)
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+
+    def test_failures_are_cached_for_the_negative_ttl(self):
+        error = socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+        with self.getaddrinfo(side_effect=error) as getaddrinfo:
+            for _ in range(3):
+                with self.assertRaises(socket.gaierror):
+                    self.cache.resolve('typo.example')
+            self.assertEqual(getaddrinfo.call_count, 1)
+            self.now += 31
+            with self.assertRaises(socket.gaierror):
+                self.cache.resolve('typo.example')
+            self.assertEqual(getaddrinfo.call_count, 2)
+        self.assertEqual(self.cache.stats()['negative_hits'], 2)
+
+    def test_async_lookups_share_the_cache(self):
+        with self.getaddrinfo(return_value=ADDRESS_INFO):
+            self.cache.resolve('example.com')
+        with mock.patch.object(asyncio.AbstractEventLoop, 'getaddrinfo') as getaddrinfo:
+            addresses = asyncio.run(self.cache.aresolve('example.com'))
+        getaddrinfo.assert_not_called()
+        self.assertEqual(addresses, [(socket.AF_INET, ('192.0.2.7', 0))])
+
+    def test_least_recently_used_hosts_are_evicted(self):
+        with self.getaddrinfo(return_value=ADDRESS_INFO) as getaddrinfo:
+            for host in ('a.example', 'b.example', 'a.example', 'c.example', 'a.example', 'b.example'):
+                self.cache.resolve(host)
+        self.assertEqual([call.args[0] for call in getaddrinfo.call_args_list],
+                         ['a.example', 'b.example', 'c.example', 'b.example'])
+
+
+class OpenConnectionTests(SimpleTestCase):
+    def test_next_address_is_tried_after_a_failure(self):
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        listener.listen()
+        self.addCleanup(listener.close)
+        closed = socket.socket()
+        closed.bind(('127.0.0.1', 0))
+        closed_port = closed.getsockname()[1]
+        closed.close()
+
+        port = listener.getsockname()[1]
+        with self.assertRaises(ConnectionRefusedError):
+            open_connection([(socket.AF_INET, ('127.0.0.1', 0))], closed_port)
+        sock = open_connection([(socket.AF_INET, ('127.0.0.2', 0)), (socket.AF_INET, ('127.0.0.1', 0))], port)
+        self.addCleanup(sock.close)
+        self.assertEqual(sock.getpeername(), ('127.0.0.1', port))
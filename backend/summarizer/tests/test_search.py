@@ -0,0 +1,76 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from summarizer.models import Summary
+from summarizer.search import FTS_TABLE, query_terms, search_summaries
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('reader')
+        self.other = User.objects.create_user('other')
+
+    def summary(self, original_text, summary_text, user=None, **fields):
+        return Summary.objects.create(
+            user=user or self.user, original_text=original_text, summary_text=summary_text, **fields
+        )
+
+    def search(self, query, **kwargs):
+        return [row.pk for row in search_summaries(self.user, query_terms(query), 10, **kwargs)]
+
+    def test_query_terms(self):
+        self.assertEqual(query_terms('The "Budget" AND tax*'), ['budget', 'tax'])
+        self.assertEqual(query_terms('the'), ['the'])
+
+    def test_insert_is_indexed_and_ranked(self):
+        once = self.summary('The council met on Tuesday.', 'A council meeting about the budget.')
+        twice = self.summary('Budget, budget and budget again.', 'The budget was approved.')
+        self.summary('Budget news', 'budget', user=self.other)
+        self.assertEqual(self.search('budget'), [twice.pk, once.pk])
+        self.assertEqual(self.search('council budget'), [once.pk])
+        self.assertEqual(self.search('budgets'), [twice.pk, once.pk])    # stemmed
+
+    def test_update_reindexes(self):
+        summary = self.summary('Harvest report', 'The harvest was late.')
+        summary.summary_text = 'Rainfall was low.'
+        summary.original_text = 'Weather report'
+        summary.save()
+        self.assertEqual(self.search('harvest'), [])
+        self.assertEqual(self.search('rainfall'), [summary.pk])
+
+    def test_only_completed_summaries_are_indexed(self):
+        job = self.summary('Election results', '', status=Summary.STATUS_QUEUED, is_complete=False)
+        self.assertEqual(self.search('election'), [])
+        job.summary_text = 'Turnout was high.'
+        job.status = Summary.STATUS_COMPLETED
+        job.is_complete = True
+        job.save()
+        self.assertEqual(self.search('election'), [job.pk])
+
+    def test_delete_removes_from_index(self):
+        summary = self.summary('Bridge repairs', 'The bridge reopens soon.')
+        summary.delete()
+        self.assertEqual(self.search('bridge'), [])
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT count(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH 'bridge'")
+                self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_summary_type_filter(self):
+        self.summary('Storm warning', 'A storm is coming.', summary_type='short')
+        long = self.summary('Storm warning', 'A storm is coming.', summary_type='long')
+        self.assertEqual(self.search('storm', summary_type='long'), [long.pk])
+
+    def test_endpoint(self):
+        summary = self.summary('Library hours', 'The library opens late on Fridays.')
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/summaries/search/', {'q': 'library'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data['results']], [summary.pk])
+        self.assertIsNone(response.data['next_offset'])
+        self.assertEqual(client.get('/api/summaries/search/', {'q': '!!'}).status_code, 400)
+
+
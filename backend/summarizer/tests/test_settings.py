@@ -0,0 +1,51 @@
+import importlib.util
+import os
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from smartsum import settings as project_settings
+
+
+def load_settings(**environ):
+    """A fresh copy of smartsum.settings evaluated with environ set"""
+    spec = importlib.util.spec_from_file_location('settings_under_test', project_settings.__file__)
+    module = importlib.util.module_from_spec(spec)
+    with mock.patch.dict(os.environ, environ):
+        spec.loader.exec_module(module)
+    return module
+
+
+class DatabaseProfileTests(SimpleTestCase):
+    def test_sqlite_profile(self):
+        settings = load_settings(DB_ENGINE='sqlite', SQLITE_JOURNAL_MODE='WAL', SQLITE_SYNCHRONOUS='NORMAL')
+        options = settings.DATABASES['default']['OPTIONS']
+        self.assertEqual(options['transaction_mode'], 'IMMEDIATE')
+        self.assertIn('PRAGMA journal_mode=WAL', options['init_command'])
+        self.assertIn('PRAGMA synchronous=NORMAL', options['init_command'])
+        self.assertEqual(settings.RATE_LIMIT_BACKEND, 'local')
+
+    def test_pooled_postgres_profile(self):
+        settings = load_settings(DB_ENGINE='postgres', DB_POOL='true', DB_POOL_MAX_SIZE='4')
+        database = settings.DATABASES['default']
+        self.assertEqual(database['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual(database['CONN_MAX_AGE'], 0)
+        self.assertEqual(database['OPTIONS']['pool']['max_size'], 4)
+        self.assertEqual(settings.RATE_LIMIT_BACKEND, 'database')
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ImproperlyConfigured):
+            load_settings(DB_ENGINE='mysql')
+
+
+class SqliteConnectionTests(TestCase):
+    def test_pragmas_are_applied(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("SQLite profile")
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)    # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertGreater(cursor.fetchone()[0], 0)
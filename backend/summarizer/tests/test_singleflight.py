@@ -0,0 +1,165 @@
+import asyncio
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from summarizer.ratelimit import RateLimited
+from summarizer.singleflight import FlightTimeout, SharedLock, SingleFlight
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out waiting for condition")
+        time.sleep(0.005)
+
+
+class Caller(threading.Thread):
+    """Runs flight.do(key, fn) and keeps the result or the exception"""
+
+    def __init__(self, flight, key, fn):
+        super().__init__(daemon=True)
+        self.flight = flight
+        self.key = key
+        self.fn = fn
+        self.result = None
+        self.error = None
+
+    def run(self):
+        try:
+            self.result = self.flight.do(self.key, self.fn)
+        except Exception as e:
+            self.error = e
+
+
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.calls = 0
+
+    def blocking(self, outcomes):
+        """fn returning (or raising) the next of outcomes once release is set"""
+        def fn():
+            self.calls += 1
+            outcome = outcomes[self.calls - 1]
+            self.release.wait(5)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        return fn
+
+    def start(self, flight, fn, followers):
+        leader = Caller(flight, 'key', fn)
+        leader.start()
+        wait_until(lambda: self.calls == 1)
+        others = [Caller(flight, 'key', fn) for _ in range(followers)]
+        for caller in others:
+            caller.start()
+        wait_until(lambda: flight.stats()['followers'] == followers)
+        return leader, others
+
+    def test_followers_share_the_result(self):
+        flight = SingleFlight('test')
+        leader, followers = self.start(flight, self.blocking(['summary']), 3)
+        self.release.set()
+        for caller in [leader] + followers:
+            caller.join(5)
+            self.assertEqual(caller.result, 'summary')
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(flight.stats()['in_flight'], 0)
+
+    def test_leader_error_is_raised_to_followers(self):
+        flight = SingleFlight('test')
+        error = ValueError("upstream failed")
+        leader, followers = self.start(flight, self.blocking([error]), 2)
+        self.release.set()
+        for caller in [leader] + followers:
+            caller.join(5)
+            self.assertIs(caller.error, error)
+        self.assertEqual(self.calls, 1)
+
+    def test_personal_error_makes_a_follower_lead(self):
+        flight = SingleFlight('test', personal_errors=(RateLimited,))
+        leader, (follower,) = self.start(flight, self.blocking([RateLimited('user', 3.0), 'summary']), 1)
+        self.release.set()
+        leader.join(5)
+        follower.join(5)
+        self.assertIsInstance(leader.error, RateLimited)
+        self.assertIsNone(follower.error)
+        self.assertEqual(follower.result, 'summary')
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(flight.stats()['leaders'], 2)
+
+    def test_follower_times_out_without_cutting_the_leader_short(self):
+        flight = SingleFlight('test', timeout=0.05)
+        leader, (follower,) = self.start(flight, self.blocking(['summary']), 1)
+        follower.join(5)
+        self.assertIsInstance(follower.error, FlightTimeout)
+        self.assertTrue(leader.is_alive())
+        self.release.set()
+        leader.join(5)
+        self.assertEqual(leader.result, 'summary')
+        self.assertEqual(flight.stats()['timeouts'], 1)
+
+    def test_disabled_flight_runs_every_call(self):
+        flight = SingleFlight('test', enabled=False)
+        self.release.set()
+        fn = self.blocking(['a', 'b'])
+        self.assertEqual([flight.do('key', fn), flight.do('key', fn)], ['a', 'b'])
+
+    def test_shared_lock_passes_the_outcome_between_flights(self):
+        # Two flights stand in for two workers sharing a cache
+        first = SingleFlight('shared-test', shared=SharedLock())
+        second = SingleFlight('shared-test', shared=SharedLock())
+        error = ValueError("upstream failed")
+        leader = Caller(first, 'key', self.blocking([error]))
+        leader.start()
+        wait_until(lambda: self.calls == 1)
+        follower = Caller(second, 'key', self.blocking([error, 'not called']))
+        follower.start()
+        wait_until(lambda: second.stats()['shared_waits'] == 1)
+        self.release.set()
+        leader.join(5)
+        follower.join(5)
+        self.assertIs(leader.error, error)
+        self.assertIsInstance(follower.error, ValueError)
+        self.assertEqual(str(follower.error), "upstream failed")
+        self.assertEqual(self.calls, 1)
+
+    def test_async_followers_share_one_call(self):
+        flight = SingleFlight('test', personal_errors=(RateLimited,))
+        calls = []
+
+        async def summarize():
+            calls.append(1)
+            await asyncio.sleep(0.02)
+            if len(calls) == 1:
+                raise RateLimited('user', 1.0)
+            return 'summary'
+
+        async def run():
+            return await asyncio.gather(
+                *(flight.ado('key', summarize) for _ in range(3)), return_exceptions=True
+            )
+
+        leader, *followers = asyncio.run(run())
+        self.assertIsInstance(leader, RateLimited)
+        self.assertEqual(followers, ['summary', 'summary'])
+        self.assertEqual(len(calls), 2)
+
+    def test_async_follower_times_out(self):
+        flight = SingleFlight('test', timeout=0.05)
+
+        async def summarize():
+            await asyncio.sleep(0.2)
+            return 'summary'
+
+        async def run():
+            return await asyncio.gather(flight.ado('key', summarize), flight.ado('key', summarize),
+                                        return_exceptions=True)
+
+        leader, follower = asyncio.run(run())
+        self.assertEqual(leader, 'summary')
+        self.assertIsInstance(follower, FlightTimeout)
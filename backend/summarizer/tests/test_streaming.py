@@ -0,0 +1,77 @@
+import json
+import uuid
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from summarizer import views
+from summarizer.generation import summary_cache
+
+
+def events(response):
+    """(event, data) pairs of a server-sent events response"""
+    body = b''.join(response.streaming_content).decode('utf-8')
+    pairs = []
+    for block in body.strip().split('\n\n'):
+        event, data = block.split('\n')
+        pairs.append((event.removeprefix('event: '), json.loads(data.removeprefix('data: '))))
+    return pairs
+
+
+class SummaryStreamTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('reader')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # Distinct words per test, or the near-duplicate index reuses another test's summary
+        self.text = ' '.join(f"The river {uuid.uuid4().hex} flooded the valley." for _ in range(10))
+        writer = mock.patch.object(views, 'summary_writer')
+        self.writer = writer.start()
+        self.addCleanup(writer.stop)
+
+    def stream(self, pieces):
+        def stream_summary(text, summary_type):
+            for piece in pieces:
+                if isinstance(piece, Exception):
+                    raise piece
+                yield piece
+
+        with mock.patch.object(views, 'stream_summary', side_effect=stream_summary) as patched:
+            response = self.client.post(
+                '/api/summarize/', {'text': self.text, 'summary_type': 'medium', 'stream': True}, format='json'
+            )
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            return events(response), patched
+
+    def test_chunks_then_done(self):
+        received, _ = self.stream(['The valley ', 'flooded after ', 'heavy rain.'])
+        self.assertEqual([event for event, _ in received], ['chunk', 'chunk', 'chunk', 'done'])
+        self.assertEqual(''.join(data['text'] for _, data in received[:-1]), 'The valley flooded after heavy rain.')
+        self.assertEqual(received[-1][1]['backend'], 'gemini')
+        self.writer.add.assert_called_once()
+        self.assertEqual(summary_cache.get(self.text, 'medium'), 'The valley flooded after heavy rain.')
+
+    def test_error_after_chunks_is_an_error_event(self):
+        with self.assertLogs('summarizer.generation', 'ERROR'):
+            received, _ = self.stream(['The valley ', ValueError("stopped")])
+        self.assertEqual([event for event, _ in received], ['chunk', 'error'])
+        self.assertEqual(received[-1][1]['code'], 'empty_summary')
+        self.writer.add.assert_not_called()
+
+    def test_empty_summary_is_an_error(self):
+        with self.assertLogs('summarizer.generation', 'ERROR'):
+            received, _ = self.stream(['  '])
+        self.assertEqual(received[-1][0], 'error')
+        self.writer.add.assert_not_called()
+
+    def test_cached_summary_is_sent_in_one_chunk(self):
+        summary_cache.set(self.text, 'medium', 'A cached summary.')
+        received, stream_summary = self.stream([])
+        stream_summary.assert_not_called()
+        self.assertEqual(received, [
+            ('chunk', {'text': 'A cached summary.'}),
+            ('done', {'characters': 17, 'summary_type': 'medium', 'cached': True, 'backend': 'cache',
+                      'success': True}),
+        ])
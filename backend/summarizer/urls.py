@@ -1,12 +1,23 @@
 from django.urls import path
-from .views import SummarizeView, FetchUrlContentView
+from .views import (
+    SummarizeView, SummarizeBatchView, SummaryJobView, FetchUrlContentView, SummaryHistoryView, SummarySearchView,
+    SummaryDetailView,
+)
 from django.urls import path
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from .views import RegisterView
+from .async_views import AsyncSummarizeView, AsyncFetchUrlContentView
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('summarize/', SummarizeView.as_view(), name='summarize'),
+    path('summarize/batch/', SummarizeBatchView.as_view(), name='summarize-batch'),
+    path('summarize/<int:pk>/', SummaryJobView.as_view(), name='summarize-job'),
+    path('summaries/', SummaryHistoryView.as_view(), name='summary-history'),
+    path('summaries/search/', SummarySearchView.as_view(), name='summary-search'),
+    path('summaries/<int:pk>/', SummaryDetailView.as_view(), name='summary-detail'),
     path('fetch-url-content/', FetchUrlContentView.as_view(), name='fetch-url-content'),
+    path('async/summarize/', AsyncSummarizeView.as_view(), name='async-summarize'),
+    path('async/fetch-url-content/', AsyncFetchUrlContentView.as_view(), name='async-fetch-url-content'),
 ]
\ No newline at end of file
@@ -1,52 +1,89 @@
 # views.py
+import base64
+import binascii
+import hmac
+import json
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
 from urllib.parse import urlparse
 import socket
-from urllib3.util.retry import Retry
 
-import google.generativeai as genai
 import requests
-from bs4 import BeautifulSoup
 from django.conf import settings
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
-from google.api_core import retry
+from django.db import connections
+from django.db.models import Q
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
 from rest_framework import status
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from requests.adapters import HTTPAdapter
 
+from .extraction import SoupExtractor, get_extractor
+from .fetching import declared_length, decode_stream, get_fetcher
+from .authentication import user_cache
+from .backends import select_backend
+from .compression import text_compressor
+from .generation import (
+    SummaryResult, cached_result, gemini_guard, generation_error, remember, stream_summary, summarize,
+    summary_cache, summary_flight,
+)
+from .jobs import enqueue
+from .metrics import CONTENT_TYPE, Stopwatch, render as render_metrics, timed
 from .models import Summary
+from .nearduplicates import near_duplicates
+from .page_cache import canonicalize_url, page_cache, page_flight
+from .persistence import summary_writer
+from .ratelimit import RateLimited, admit, rate_limiter, retry_after_headers
+from .resolver import dns_cache
+from .search import query_terms, search_summaries
+from .serializers import SummaryDetailSerializer, SummaryListSerializer, SummarySearchSerializer
+from .singleflight import FlightTimeout
 
 logger = logging.getLogger(__name__)
 
-# Initialize Gemini AI with enhanced configuration
-try:
-    genai.configure(api_key=settings.GEMINI_API_KEY)
-    generation_config = {
-        "temperature": 0.3,
-        "top_p": 0.95,
-        "top_k": 40,
-        "max_output_tokens": 2048,
-    }
-    safety_settings = [
-        {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-        {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-        {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-        {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
-    ]
-    gemini_model = genai.GenerativeModel(
-        'gemini-2.5-flash',
-        generation_config=generation_config,
-        safety_settings=safety_settings
-    )
-except Exception as e:
-    logger.error(f"Failed to initialize Gemini: {str(e)}")
-    gemini_model = None
 
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def is_truthy(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+
+def wants_page_cache(request, options):
+    """Per-request opt-out: {"cache": false} or a Cache-Control: no-cache header"""
+    if 'no-cache' in request.headers.get('Cache-Control', '').lower():
+        return False
+    value = options.get("cache", True)
+    if isinstance(value, str):
+        return value.strip().lower() not in ('0', 'false', 'no', 'off')
+    return bool(value)
+
+
+def encode_cursor(summary):
+    """Opaque position after `summary` in newest-first history order"""
+    position = json.dumps([summary.created_at.isoformat(), summary.pk])
+    return base64.urlsafe_b64encode(position.encode('utf-8')).decode('ascii').rstrip('=')
 
 
+def decode_cursor(cursor):
+    """Return (created_at, id) from encode_cursor(), or raise ValueError"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, pk = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        created_at = datetime.fromisoformat(created_at)
+    except (TypeError, ValueError, UnicodeError, binascii.Error):
+        raise ValueError("Invalid cursor")
+    if not isinstance(pk, int) or created_at.tzinfo is None:
+        raise ValueError("Invalid cursor")
+    return created_at, pk
+
 
 class RegisterView(APIView):
     permission_classes = [AllowAny]
@@ -68,20 +105,21 @@ class RegisterView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        user = User.objects.create(
+        # Hashed at PASSWORD_HASH_ITERATIONS (see hashers.py); create() is
+        # the only write
+        User.objects.create(
             username=username,
             password=make_password(password),
             email=email
         )
-        user.save()
 
         return Response({"message": "User registered successfully"}, status=status.HTTP_201_CREATED)
 
 
 
-class SummarizeView(APIView):
-    permission_classes = [IsAuthenticated]
-    
+class SummaryInputMixin:
+    """Validation and persistence shared by the sync and async summarize views"""
+
     def validate_summary_type(self, summary_type):
         valid_types = ['short', 'medium', 'long']
         if summary_type not in valid_types:
@@ -91,69 +129,97 @@ class SummarizeView(APIView):
 
     def validate_content(self, text):
         """Validate content before sending to Gemini"""
+        max_chars = settings.SUMMARY_MAX_CONTENT_CHARS
         if not text or len(text.strip()) < 50:
             raise ValueError("Content too short (minimum 50 characters)")
-        if len(text) > 15000:
-            raise ValueError("Content too long (maximum 15,000 characters)")
+        if len(text) > max_chars:
+            raise ValueError(f"Content too long (maximum {max_chars:,} characters)")
         return text.strip()
 
-    @retry.Retry(
-        initial=1.0,
-        maximum=10.0,
-        multiplier=2.0,
-        deadline=30.0,
-        exceptions=(genai.types.StopCandidateException,)
-    )
-    def generate_summary(self, text, summary_type):
-        if not gemini_model:
-            raise ConnectionError("Gemini AI service not configured")
-            
-        # Enhanced prompt engineering
-        prompt = f"""
-        You are KipaSum, a professional AI-powered summarizer developed by Kidus Shimelis.
-        Please generate a {summary_type} summary of the provided content adhering to the following professional standards:
-
-1. Content Requirements:
-- Maintain all critical information and key concepts
-- Preserve original meaning and context
-- Retain technical terms and proper nouns
-- Keep numerical data and statistics
-
-2. Quality Standards:
-- Use clear, professional language
-- Ensure grammatical accuracy
-- Maintain logical flow and coherence
-- Be factually precise
-
-3. Format Specifications:
-- Length: {summary_type} (specify word count or sentence count)
-- Style: Professional/academic tone
-- Structure: Complete, well-formed sentences
-- Language: Match original text language
-
-4. Processing Instructions:
-- Exclude examples unless critical to understanding
-- Remove redundant information
-- Condense without oversimplifying
-- Prioritize information by importance
-
-Original Content:
-{text}
-
-Please provide the summary with these professional considerations in mind.
-        """
-        
+    def save_summary(self, user, text, summary, summary_type):
+        # Written in the background by the write-behind buffer
+        summary_writer.add([Summary(
+            user=user,
+            original_text=text[:5000],
+            summary_text=summary,
+            summary_type=summary_type,
+        )])
+
+
+class SummarizeView(SummaryInputMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def stream_response(self, user, text, summary_type, ready=None):
+        """Server-sent events: `chunk` events as text arrives, then `done` or `error`"""
+        response = StreamingHttpResponse(
+            self.stream_events(user, text, summary_type, ready),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # keep nginx from buffering the stream
+        return response
+
+    def stream_events(self, user, text, summary_type, ready=None):
+        """`ready` is a SummaryResult already available (cached or local);
+        it is sent as a single chunk instead of streaming from Gemini"""
+        if ready is not None:
+            self.save_summary(user, text, ready.summary, summary_type)
+            yield sse_event("chunk", {"text": ready.summary})
+            yield sse_event("done", {
+                "characters": len(ready.summary),
+                "summary_type": summary_type,
+                "cached": ready.cached,
+                "backend": ready.backend,
+                "success": True
+            })
+            return
+
+        parts = []
+        pieces = stream_summary(text, summary_type)
         try:
-            response = gemini_model.generate_content(prompt)
-            
-            # Validate response
-            if not response.text or len(response.text.strip()) < 10:
-                raise ValueError("Empty or invalid summary generated")
-                
-            return response.text.strip()
-        except Exception as e:
-            logger.error(f"Generation error: {str(e)}")
+            for piece in pieces:
+                parts.append(piece)
+                yield sse_event("chunk", {"text": piece})
+        except GeneratorExit:
+            # The server closes the iterator when the client goes away; stop
+            # pulling from Gemini and don't persist a truncated summary.
+            logger.info("Client disconnected during summary stream")
             raise
+        except Exception as e:
+            payload, _ = generation_error(e)
+            yield sse_event("error", payload)
+            return
+        finally:
+            pieces.close()
+
+        summary = ''.join(parts).strip()
+        if len(summary) < 10:
+            payload, _ = generation_error(ValueError("Empty or invalid summary generated"))
+            yield sse_event("error", payload)
+            return
+
+        remember(text, summary_type, summary)
+        self.save_summary(user, text, summary, summary_type)
+        yield sse_event("done", {
+            "characters": len(summary),
+            "summary_type": summary_type,
+            "cached": False,
+            "backend": "gemini",
+            "success": True
+        })
+
+    def ready_summary(self, text, summary_type):
+        """A SummaryResult that needs no Gemini stream (cache hit or local backend), or None"""
+        cached = cached_result(text, summary_type)
+        if cached is not None:
+            return cached
+        backend = select_backend(text, summary_type)
+        if backend.local:
+            try:
+                return SummaryResult(backend.summarize(text, summary_type), False, backend.name)
+            except ValueError:
+                pass  # too little text to extract from; stream from Gemini
+        return None
 
     def post(self, request):
         try:
@@ -170,67 +236,54 @@ Please provide the summary with these professional considerations in mind.
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Generate summary with enhanced error handling
-            try:
-                summary = self.generate_summary(text, summary_type)
-            except genai.types.StopCandidateException as e:
-                logger.error(f"Content filter triggered: {str(e)}")
-                return Response(
-                    {
-                        "error": "Content violation detected in generation",
-                        "code": "content_violation",
-                        "solutions": [
-                            "Try different content",
-                            "Reformulate your text",
-                            "Contact support if this persists"
-                        ]
-                    },
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            except ValueError as e:
-                logger.error(f"Empty summary generated: {str(e)}")
-                return Response(
-                    {
-                        "error": "Failed to generate meaningful summary",
-                        "code": "empty_summary",
-                        "solutions": [
-                            "Try different content",
-                            "Use a different summary length",
-                            "Break content into smaller sections"
-                        ]
-                    },
-                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
-                )
-            except Exception as e:
-                logger.error(f"Generation failed: {str(e)}")
+            # Job mode: return immediately and let the worker pool call Gemini.
+            # The job is charged up front so an overloaded server says so now
+            # rather than in a failed job later.
+            if is_truthy(request.data.get("async")):
+                try:
+                    admit(request.user, len(text))
+                except RateLimited as e:
+                    payload, error_status = generation_error(e)
+                    return Response(payload, status=error_status, headers=retry_after_headers(payload))
+                job = enqueue(request.user, text, summary_type)
                 return Response(
                     {
-                        "error": "AI service unavailable",
-                        "code": "service_unavailable",
-                        "solutions": [
-                            "Try again later",
-                            
-                        ]
+                        "job_id": job.pk,
+                        "status": job.status,
+                        "status_url": reverse('summarize-job', args=[job.pk]),
+                        "summary_type": summary_type,
+                        "success": True
                     },
-                    status=status.HTTP_503_SERVICE_UNAVAILABLE
+                    status=status.HTTP_202_ACCEPTED
                 )
 
-            # Save to database with error handling
+            # Admission is checked before the stream starts so a rejection
+            # is a plain 429 rather than an error event
+            if is_truthy(request.data.get("stream")):
+                ready = self.ready_summary(text, summary_type)
+                if ready is None:
+                    try:
+                        admit(request.user, len(text))
+                    except RateLimited as e:
+                        payload, error_status = generation_error(e)
+                        return Response(payload, status=error_status, headers=retry_after_headers(payload))
+                return self.stream_response(request.user, text, summary_type, ready)
+
+            # Generate summary with enhanced error handling
             try:
-                Summary.objects.create(
-                    user=request.user,
-                    original_text=text[:5000],
-                    summary_text=summary,
-                    summary_type=summary_type,
-                )
+                summary, cached, backend = summarize(text, summary_type, user=request.user)
             except Exception as e:
-                logger.error(f"Database save failed: {str(e)}")
-                # Continue even if save fails
+                payload, error_status = generation_error(e)
+                return Response(payload, status=error_status, headers=retry_after_headers(payload))
+
+            self.save_summary(request.user, text, summary, summary_type)
 
             return Response({
                 "summary": summary,
                 "characters": len(summary),
                 "summary_type": summary_type,
+                "cached": cached,
+                "backend": backend,
                 "success": True
             })
 
@@ -249,27 +302,182 @@ Please provide the summary with these professional considerations in mind.
             )
 
 
-class FetchUrlContentView(APIView):
+class SummaryJobView(APIView):
     permission_classes = [IsAuthenticated]
-    
-    def __init__(self):
-        super().__init__()
-        # Enhanced session configuration
-        self.session = requests.Session()
-        retries = Retry(
-            total=3,
-            backoff_factor=1,
-            status_forcelist=[400, 403, 408, 429, 500, 502, 503, 504]
+
+    def get(self, request, pk):
+        job = (
+            Summary.objects
+            .filter(pk=pk, user=request.user)
+            .only('id', 'status', 'is_complete', 'summary_text', 'summary_type',
+                  'error_code', 'error_message', 'created_at')
+            .first()
         )
-        adapter = HTTPAdapter(
-            max_retries=retries,
-            pool_connections=10,
-            pool_maxsize=10
+        if job is None:
+            return Response(
+                {"error": "Job not found", "code": "not_found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        data = {
+            "job_id": job.pk,
+            "status": job.status,
+            "is_complete": job.is_complete,
+            "summary_type": job.summary_type,
+            "created_at": job.created_at,
+        }
+        if job.status == Summary.STATUS_COMPLETED:
+            data["summary"] = job.summary_text
+            data["characters"] = len(job.summary_text)
+        elif job.status == Summary.STATUS_FAILED:
+            data["error"] = job.error_message
+            data["code"] = job.error_code
+        return Response(data)
+
+
+class SummaryHistoryView(APIView):
+    """The user's summaries, newest first, a page at a time.
+
+    Pages are addressed by a cursor on (created_at, id) rather than an
+    offset, so every page is one index range scan on
+    summary_user_history_idx no matter how deep it is. The text columns are
+    not loaded; fetch them per summary from SummaryDetailView.
+    """
+    permission_classes = [IsAuthenticated]
+    page_size = 20
+    max_page_size = 100
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', self.page_size))
+            if not 1 <= limit <= self.max_page_size:
+                raise ValueError
+        except ValueError:
+            return Response(
+                {"error": f"limit must be between 1 and {self.max_page_size}", "code": "invalid_input"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset = (
+            Summary.objects
+            .filter(user=request.user)
+            .only(*SummaryListSerializer.Meta.fields)
+            .order_by('-created_at', '-id')
         )
-        self.session.mount('http://', adapter)
-        self.session.mount('https://', adapter)
+        summary_type = request.query_params.get('summary_type')
+        if summary_type:
+            queryset = queryset.filter(summary_type=summary_type)
 
-    def validate_url(self, url):
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            try:
+                created_at, pk = decode_cursor(cursor)
+            except ValueError as e:
+                return Response(
+                    {"error": str(e), "code": "invalid_cursor"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+        # One extra row tells whether there is a next page
+        rows = list(queryset[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return Response({
+            "results": SummaryListSerializer(rows, many=True).data,
+            "next_cursor": encode_cursor(rows[-1]) if has_more else None,
+        })
+
+
+class SummarySearchView(APIView):
+    """Full-text search of the user's completed summaries, best match first.
+
+    Pages are addressed by offset: ranks change as summaries are added, so
+    there is no stable position to put in a cursor.
+    """
+    permission_classes = [IsAuthenticated]
+    page_size = 20
+    max_page_size = 100
+
+    def get(self, request):
+        terms = query_terms(request.query_params.get('q'))
+        if not terms:
+            return Response(
+                {"error": "q must contain at least one word", "code": "invalid_input"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = int(request.query_params.get('limit', self.page_size))
+            offset = int(request.query_params.get('offset', 0))
+            if not 1 <= limit <= self.max_page_size or offset < 0:
+                raise ValueError
+        except ValueError:
+            return Response(
+                {"error": f"limit must be between 1 and {self.max_page_size} and offset at least 0",
+                 "code": "invalid_input"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        rows = search_summaries(
+            request.user, terms, limit + 1, offset, request.query_params.get('summary_type') or None
+        )
+        return Response({
+            "results": SummarySearchSerializer(rows[:limit], many=True).data,
+            "next_offset": offset + limit if len(rows) > limit else None,
+        })
+
+
+class SummaryDetailView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        summary = Summary.objects.filter(pk=pk, user=request.user).first()
+        if summary is None:
+            return Response(
+                {"error": "Summary not found", "code": "not_found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(SummaryDetailSerializer(summary).data)
+
+
+class ContentFetchError(Exception):
+    """A URL could not be turned into text; carries the API error response"""
+
+    def __init__(self, payload, status_code):
+        super().__init__(payload.get("error"))
+        self.payload = payload
+        self.status_code = status_code
+
+    def __reduce__(self):
+        # Shared between workers by the page fetch single flight
+        return type(self), (self.payload, self.status_code)
+
+
+def fetch_timeout_error():
+    return ContentFetchError(
+        {
+            "error": "Website took too long to respond",
+            "code": "timeout",
+            "solutions": ["Try again later", "Check the URL"]
+        },
+        status.HTTP_408_REQUEST_TIMEOUT
+    )
+
+
+class UrlContentMixin:
+    """URL validation and HTML extraction shared by the URL fetching views"""
+
+    # Errors of the HTTP client that may surface while the body is parsed
+    transport_errors = (requests.exceptions.RequestException,)
+
+    request_headers = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+        "Accept": "text/html,application/xhtml+xml",
+        "Accept-Language": "en-US,en;q=0.5",
+    }
+
+    def validate_url_format(self, url):
+        """Check scheme and domain syntax; returns the domain to resolve"""
         try:
             result = urlparse(url)
             if not all([result.scheme, result.netloc]):
@@ -281,199 +489,471 @@ class FetchUrlContentView(APIView):
             domain = result.netloc.split(':')[0]
             if not all(part.isalnum() or part in ('-', '.') for part in domain.split('.')):
                 raise ValueError("Invalid domain name")
-            
-            # Verify DNS resolution
-            socket.getaddrinfo(domain, None)
+            return domain
+        except ValueError as e:
+            raise ValueError(f"URL validation failed: {str(e)}")
+
+    def validate_url(self, url):
+        domain = self.validate_url_format(url)
+        try:
+            # Verify DNS resolution; the fetch reuses the cached addresses
+            with timed('dns'):
+                dns_cache.resolve(domain)
             return True
-        except (ValueError, socket.gaierror) as e:
+        except socket.gaierror as e:
             raise ValueError(f"URL validation failed: {str(e)}")
 
     def extract_main_content(self, soup):
         """Enhanced content extraction with multiple fallbacks"""
-        # Try common article containers first
-        selectors = [
-            'article', 
-            'main', 
-            'div.article', 
-            'div.content', 
-            'div.post', 
-            'div.story',
-            'section.main-content'
-        ]
-        
-        for selector in selectors:
-            element = soup.select_one(selector)
-            if element:
-                return element.get_text(' ', strip=True)
-        
-        # Fallback to body text extraction
-        text_parts = []
-        for tag in ['p', 'div', 'section']:
-            elements = soup.find_all(tag)
-            for el in elements:
-                text = el.get_text(' ', strip=True)
-                if len(text.split()) > 10:  # Only include meaningful paragraphs
-                    text_parts.append(text)
-        
-        if text_parts:
-            return ' '.join(text_parts)
-        
-        # Final fallback to all text
-        return soup.get_text(' ', strip=True)
+        return SoupExtractor().extract_main_content(soup)
 
-    def post(self, request):
+    def parse_content(self, html):
+        return self.parse_stream([html])
+
+    def parse_stream(self, chunks):
+        # CONTENT_EXTRACTOR picks the engine; see summarizer/extraction.py.
+        # Nothing past SUMMARY_MAX_CONTENT_CHARS is kept, so stop there.
+        return get_extractor().extract_stream(
+            chunks, enough_chars=settings.SUMMARY_MAX_CONTENT_CHARS
+        )
+
+    @property
+    def fetcher(self):
+        # Shared per process so keep-alive connections survive between requests
+        return get_fetcher()
+
+    def cached_page(self, url, use_cache):
+        """Return (cache key, cached entry or None, fresh) for url"""
+        if not use_cache:
+            return None, None, False
+        key = canonicalize_url(url)
+        entry, fresh = page_cache.lookup(key)
+        return key, entry, fresh
+
+    def conditional_headers(self, entry):
+        if entry is None:
+            return self.request_headers
+        return {**self.request_headers, **entry.conditional_headers()}
+
+    def store_page(self, key, response_headers, content):
+        if key is not None:
+            page_cache.store(
+                key, content,
+                etag=response_headers.get('ETag'),
+                last_modified=response_headers.get('Last-Modified'),
+            )
+
+    def fetch_content(self, url, use_cache=True):
+        """Download url and return its main text, or raise ContentFetchError.
+
+        Extracted text is cached by canonical URL. Fresh entries skip the
+        network; stale ones are revalidated with If-None-Match /
+        If-Modified-Since so an unchanged page costs one 304 and no parse.
+        Requests for a URL that is already being downloaded wait for that
+        download (see singleflight.py).
+        """
         try:
-            url = request.data.get("url", "").strip()
-            
-            if not url:
-                return Response(
-                    {"error": "URL is required", "code": "missing_url"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+            self.validate_url_format(url)
+        except ValueError as e:
+            raise ContentFetchError(
+                {"error": str(e), "code": "invalid_url"},
+                status.HTTP_400_BAD_REQUEST
+            )
 
-            try:
-                self.validate_url(url)
-            except ValueError as e:
-                return Response(
-                    {"error": str(e), "code": "invalid_url"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+        key, entry, fresh = self.cached_page(url, use_cache)
+        if fresh:
+            return entry.content
 
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-                "Accept": "text/html,application/xhtml+xml",
-                "Accept-Language": "en-US,en;q=0.5",
-            }
-            
-            try:
-                response = self.session.get(
+        try:
+            return page_flight.do(canonicalize_url(url), lambda: self.download_content(url, key, entry))
+        except FlightTimeout:
+            raise fetch_timeout_error()
+
+    def download_content(self, url, key, entry):
+        """fetch_content() after a page cache miss; entry is the stale entry, if any"""
+        try:
+            self.validate_url(url)
+        except ValueError as e:
+            raise ContentFetchError(
+                {"error": str(e), "code": "invalid_url"},
+                status.HTTP_400_BAD_REQUEST
+            )
+
+        response = None
+        # Connecting, headers and waiting for body chunks; parsing is timed
+        # separately as the chunks are fed to the extractor
+        fetch_time = Stopwatch('fetch')
+        try:
+            # stream=True: only the headers are read here, so the type and
+            # size checks run before any of the body is downloaded
+            with fetch_time:
+                response = self.fetcher.get(
                     url,
-                    headers=headers,
+                    headers=self.conditional_headers(entry),
                     timeout=(3.05, 10),
                     allow_redirects=True,
-                    verify=True
+                    verify=True,
+                    stream=True
                 )
                 response.raise_for_status()
-                
-                content_type = response.headers.get('Content-Type', '')
-                if 'text/html' not in content_type:
-                    return Response(
-                        {
-                            "error": "URL does not return HTML content",
-                            "code": "non_html_content"
-                        },
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                    
-            except requests.exceptions.SSLError:
-                return Response(
-                    {
-                        "error": "SSL verification failed",
-                        "code": "ssl_error",
-                        "solutions": ["Try a different URL"]
-                    },
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            except requests.exceptions.Timeout:
-                return Response(
+
+            if response.status_code == 304 and entry is not None:
+                page_cache.refresh(key)
+                return entry.content
+
+            self.check_response_headers(response.headers)
+            chunks = decode_stream(
+                fetch_time.iterate(response.iter_content(chunk_size=settings.FETCH_CHUNK_BYTES)),
+                response.headers.get('Content-Type', ''),
+                settings.FETCH_MAX_BYTES
+            )
+            content = self.extract_page_stream(chunks)
+
+        except requests.exceptions.SSLError:
+            raise ContentFetchError(
+                {
+                    "error": "SSL verification failed",
+                    "code": "ssl_error",
+                    "solutions": ["Try a different URL"]
+                },
+                status.HTTP_400_BAD_REQUEST
+            )
+        except requests.exceptions.Timeout:
+            raise fetch_timeout_error()
+        except requests.exceptions.TooManyRedirects:
+            raise ContentFetchError(
+                {
+                    "error": "Too many redirects",
+                    "code": "redirect_loop",
+                    "solutions": ["Try a different URL"]
+                },
+                status.HTTP_400_BAD_REQUEST
+            )
+        except requests.exceptions.HTTPError as e:
+            status_code = e.response.status_code
+            if status_code == 403:
+                raise ContentFetchError(
                     {
-                        "error": "Website took too long to respond",
-                        "code": "timeout",
-                        "solutions": ["Try again later", "Check the URL"]
+                        "error": "Access forbidden (403)",
+                        "code": "forbidden",
+                        "solutions": [
+                            "Try a different URL",
+                            "The website may block automated requests"
+                        ]
                     },
-                    status=status.HTTP_408_REQUEST_TIMEOUT
+                    status.HTTP_400_BAD_REQUEST
                 )
-            except requests.exceptions.TooManyRedirects:
+            raise ContentFetchError(
+                {
+                    "error": f"HTTP error {status_code}",
+                    "code": f"http_{status_code}",
+                    "solutions": ["Try a different URL"]
+                },
+                status.HTTP_400_BAD_REQUEST
+            )
+        except requests.exceptions.RequestException as e:
+            logger.error(f"URL fetch failed: {str(e)}")
+            raise ContentFetchError(
+                {
+                    "error": "Could not fetch URL content",
+                    "code": "fetch_failed",
+                    "solutions": ["Try a different URL", "Check your connection"]
+                },
+                status.HTTP_400_BAD_REQUEST
+            )
+        finally:
+            fetch_time.done()
+            if response is not None:
+                response.close()
+
+        self.store_page(key, response.headers, content)
+        return content
+
+    def check_response_headers(self, headers):
+        """Reject non-HTML and oversized responses before reading the body"""
+        content_type = headers.get('Content-Type', '')
+        if 'text/html' not in content_type:
+            raise ContentFetchError(
+                {
+                    "error": "URL does not return HTML content",
+                    "code": "non_html_content"
+                },
+                status.HTTP_400_BAD_REQUEST
+            )
+
+        length = declared_length(headers)
+        if length is not None and length > settings.FETCH_MAX_BYTES:
+            raise ContentFetchError(
+                {
+                    "error": "Page is too large to process",
+                    "code": "content_too_large",
+                    "solutions": ["Try a different URL"]
+                },
+                status.HTTP_400_BAD_REQUEST
+            )
+
+    def extract_page_content(self, html):
+        """Parse downloaded HTML into main text, or raise ContentFetchError"""
+        return self.extract_page_stream([html])
+
+    def extract_page_stream(self, chunks):
+        """Like extract_page_content, for HTML arriving as decoded text chunks"""
+        try:
+            content = self.parse_stream(chunks)
+        except self.transport_errors:
+            # Raised while reading the body; handled by the download method
+            raise
+        except Exception as e:
+            raise self.parse_error(e)
+
+        return self.checked_content(content)
+
+    def parse_error(self, e):
+        """ContentFetchError for a page the extractor failed on"""
+        logger.error(f"Content parsing failed: {str(e)}")
+        return ContentFetchError(
+            {
+                "error": "Failed to parse page content",
+                "code": "parse_error",
+                "solutions": ["Try a different URL"]
+            },
+            status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+    def checked_content(self, content):
+        """Extracted text capped to size, or ContentFetchError if there is too little"""
+        if not content or len(content.strip()) < 50:
+            raise ContentFetchError(
+                {
+                    "error": "No readable content found on page",
+                    "code": "no_content",
+                    "solutions": [
+                        "Try a different URL",
+                        "The page may require JavaScript"
+                    ]
+                }, 
+                status.HTTP_400_BAD_REQUEST
+            )
+
+        return content[:settings.SUMMARY_MAX_CONTENT_CHARS]  # Limit content size
+
+
+class FetchUrlContentView(UrlContentMixin, APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        try:
+            url = request.data.get("url", "").strip()
+            
+            if not url:
                 return Response(
-                    {
-                        "error": "Too many redirects",
-                        "code": "redirect_loop",
-                        "solutions": ["Try a different URL"]
-                    },
+                    {"error": "URL is required", "code": "missing_url"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            except requests.exceptions.HTTPError as e:
-                status_code = e.response.status_code
-                if status_code == 403:
-                    return Response(
-                        {
-                            "error": "Access forbidden (403)",
-                            "code": "forbidden",
-                            "solutions": [
-                                "Try a different URL",
-                                "The website may block automated requests"
-                            ]
-                        },
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
+
+            try:
+                content = self.fetch_content(url, use_cache=wants_page_cache(request, request.data))
+            except ContentFetchError as e:
+                return Response(e.payload, status=e.status_code)
+
+            return Response({
+                "content": content,
+                "source_url": url,
+                "success": True
+            })
+
+        except Exception as e:
+            logger.error(f"Unexpected error in URL fetch: {str(e)}", exc_info=True)
+            return Response(
+                {
+                    "error": "Internal server error",
+                    "code": "server_error",
+                    "solutions": ["Try again later", "Contact support"]
+                }, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class SummarizeBatchView(SummaryInputMixin, UrlContentMixin, APIView):
+    """Summarize many texts and/or URLs in one request.
+
+    Items are fetched and summarized concurrently (SUMMARY_BATCH_CONCURRENCY)
+    and every item gets its own result or error; one bad item never fails
+    the batch. Successful summaries are saved with a single bulk_create.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def process_item(self, item):
+        """Return (result, unsaved Summary or None) for one batch item"""
+        if not isinstance(item, dict):
+            return {"error": "Each item must be an object", "code": "invalid_input", "success": False}, None
+
+        text = str(item.get("text") or "").strip()
+        url = str(item.get("url") or "").strip()
+        summary_type = str(item.get("summary_type") or "medium").strip().lower()
+
+        try:
+            self.validate_summary_type(summary_type)
+            if bool(text) == bool(url):
+                raise ValueError("Provide exactly one of text or url")
+        except ValueError as e:
+            return {"error": str(e), "code": "invalid_input", "success": False}, None
+
+        try:
+            if url:
+                try:
+                    text = self.fetch_content(url, use_cache=wants_page_cache(self.request, item))
+                except ContentFetchError as e:
+                    return {**e.payload, "source_url": url, "success": False}, None
+
+            try:
+                text = self.validate_content(text)
+            except ValueError as e:
+                return {"error": str(e), "code": "invalid_input", "success": False}, None
+
+            try:
+                summary, cached, backend = summarize(text, summary_type, user=self.request.user)
+            except Exception as e:
+                payload, _ = generation_error(e)
+                return {**payload, "success": False}, None
+        except Exception as e:
+            logger.error(f"Unexpected error in batch item: {str(e)}", exc_info=True)
+            return {"error": "Internal server error", "code": "server_error", "success": False}, None
+
+        result = {
+            "summary": summary,
+            "characters": len(summary),
+            "summary_type": summary_type,
+            "cached": cached,
+            "backend": backend,
+            "success": True
+        }
+        if url:
+            result["source_url"] = url
+        record = Summary(
+            user=self.request.user,
+            original_text=text[:5000],
+            summary_text=summary,
+            summary_type=summary_type,
+            source_url=url or None,
+        )
+        return result, record
+
+    def run_item(self, item):
+        try:
+            return self.process_item(item)
+        finally:
+            # Pool threads end with the request; their connections would leak
+            connections.close_all()
+
+    def run_items(self, items):
+        """Yield (index, result, record) as items finish"""
+        workers = min(settings.SUMMARY_BATCH_CONCURRENCY, len(items))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='summary-batch') as pool:
+            futures = {pool.submit(self.run_item, item): index for index, item in enumerate(items)}
+            for future in as_completed(futures):
+                result, record = future.result()
+                yield futures[future], result, record
+
+    def save_records(self, records):
+        summary_writer.add(records)
+
+    def stream_results(self, items):
+        records = []
+        succeeded = 0
+        for index, result, record in self.run_items(items):
+            if record is not None:
+                records.append(record)
+                succeeded += 1
+            yield json.dumps({"index": index, **result}) + "\n"
+        self.save_records(records)
+        yield json.dumps({"done": True, "succeeded": succeeded, "failed": len(items) - succeeded}) + "\n"
+
+    def post(self, request):
+        try:
+            items = request.data.get("items")
+            max_items = settings.SUMMARY_BATCH_MAX_ITEMS
+            if not isinstance(items, list) or not items:
                 return Response(
-                    {
-                        "error": f"HTTP error {status_code}",
-                        "code": f"http_{status_code}",
-                        "solutions": ["Try a different URL"]
-                    },
+                    {"error": "items must be a non-empty list", "code": "invalid_input"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            except requests.exceptions.RequestException as e:
-                logger.error(f"URL fetch failed: {str(e)}")
+            if len(items) > max_items:
                 return Response(
-                    {
-                        "error": "Could not fetch URL content",
-                        "code": "fetch_failed",
-                        "solutions": ["Try a different URL", "Check your connection"]
-                    },
+                    {"error": f"Too many items (maximum {max_items})", "code": "invalid_input"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            try:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # Clean up the document
-                for element in soup(['script', 'style', 'nav', 'footer', 
-                                   'iframe', 'img', 'button', 'form',
-                                   'header', 'aside', 'svg', 'link',
-                                   'meta', 'noscript']):
-                    element.decompose()
-                
-                content = self.extract_main_content(soup)
-                
-                if not content or len(content.strip()) < 50:
-                    return Response(
-                        {
-                            "error": "No readable content found on page",
-                            "code": "no_content",
-                            "solutions": [
-                                "Try a different URL",
-                                "The page may require JavaScript"
-                            ]
-                        }, 
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                return Response({
-                    "content": content[:15000],  # Limit content size
-                    "source_url": url,
-                    "success": True
-                })
-                
-            except Exception as e:
-                logger.error(f"Content parsing failed: {str(e)}")
-                return Response(
-                    {
-                        "error": "Failed to parse page content",
-                        "code": "parse_error",
-                        "solutions": ["Try a different URL"]
-                    },
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            # Newline-delimited JSON, one line per item in completion order
+            if is_truthy(request.data.get("stream")):
+                return StreamingHttpResponse(
+                    self.stream_results(items),
+                    content_type='application/x-ndjson'
                 )
 
+            results = [None] * len(items)
+            records = []
+            for index, result, record in self.run_items(items):
+                results[index] = {"index": index, **result}
+                if record is not None:
+                    records.append(record)
+            self.save_records(records)
+
+            return Response({
+                "results": results,
+                "succeeded": len(records),
+                "failed": len(items) - len(records),
+                "success": True
+            })
+
         except Exception as e:
-            logger.error(f"Unexpected error in URL fetch: {str(e)}", exc_info=True)
+            logger.error(f"Unexpected error in batch: {str(e)}", exc_info=True)
             return Response(
                 {
                     "error": "Internal server error",
                     "code": "server_error",
-                    "solutions": ["Try again later", "Contact support"]
-                }, 
+                    "solutions": ["Try again later"]
+                },
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+
+class MetricsView(APIView):
+    """Prometheus scrape endpoint for this process; see metrics.py"""
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        token = getattr(settings, 'METRICS_TOKEN', '')
+        if not token and not settings.DEBUG:
+            # Open metrics are for development only
+            return Response(
+                {"error": "Metrics need METRICS_TOKEN when DEBUG is off", "code": "forbidden"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        # Compared as bytes: compare_digest refuses non-ASCII str. Header
+        # values arrive decoded as latin-1, which gives back the raw bytes.
+        if token and not hmac.compare_digest(
+            request.headers.get('Authorization', '').encode('latin-1', errors='replace'),
+            f"Bearer {token}".encode('utf-8')
+        ):
+            return Response(
+                {"error": "Invalid metrics token", "code": "forbidden"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        sources = {
+            'summary_cache': summary_cache.stats(),
+            'page_cache': page_cache.stats(),
+            'dns_cache': dns_cache.stats(),
+            'rate_limit': rate_limiter.stats(),
+            'gemini': gemini_guard.stats(),
+            'fetch_pool': get_fetcher().metrics(),
+            'summary_writer': summary_writer.stats(),
+            'text_compression': text_compressor.stats(),
+            'near_duplicates': near_duplicates.stats(),
+            'summary_flight': summary_flight.stats(),
+            'page_flight': page_flight.stats(),
+            'auth_users': user_cache.stats(),
+        }
+        return HttpResponse(render_metrics(sources), content_type=CONTENT_TYPE)